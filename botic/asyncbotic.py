@@ -0,0 +1,150 @@
+"""asyncio runner: one event loop drives every process of a config
+
+Traders based on AsyncBaseTrader run natively on the loop. Sync traders keep working through
+SyncTraderAdapter, their blocking calls run on a thread pool.
+"""
+import os
+import sys
+import asyncio
+import traceback
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from .util import getsetting
+from .botic import BoticProcess, load_config
+from .metrics import METRICS
+from .clock import async_sleep
+from .trader.asyncbase import AsyncBaseTrader, SyncTraderAdapter
+
+class AsyncBotic:
+    """Run the processes of a config as asyncio tasks on one event loop
+
+    Args:
+        config_path (str): The path to the yaml configuration file
+        names (list): Optional list of section names to run. All sections are run by default.
+        supervise (bool): If True, a tick that raises is logged and retried with backoff instead
+            of stopping every process
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, config_path: str, do_print=True, names=None, supervise=False) -> None:
+        self.config_path = config_path
+        self.global_config, self.sections = load_config(config_path, do_print=do_print)
+        self.names = names
+        self.supervise = supervise
+        self.tick_threads = getsetting(self.global_config, 'general', 'tick_threads')
+        self.restart_max_backoff = getsetting(
+            self.global_config, 'general', 'restart_max_backoff')
+        self.executor = None
+        self.processes = {}
+        self.traders = {}
+        self.ticks = {}
+        self.metrics_file = getsetting(self.global_config, 'general', 'metrics_file')
+        self.metrics_interval = getsetting(self.global_config, 'general', 'metrics_interval')
+        self.fast_forward = getsetting(self.global_config, 'general', 'backtest_fast_forward')
+        for name, config in self.sections.items():
+            if self.names is not None and not name in self.names:
+                continue
+            print('Create process:', name)
+            self.processes[name] = BoticProcess(name, config)
+
+    def run(self) -> None:
+        """Entry point to start the bots"""
+        asyncio.run(self.run_async())
+
+    async def run_async(self) -> None:
+        """Run every process until one fails (or forever when supervising)"""
+        if self.tick_threads > 0:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.tick_threads, thread_name_prefix='botic-tick')
+        for name, obj in self.processes.items():
+            if isinstance(obj.trader, AsyncBaseTrader):
+                self.traders[name] = obj.trader
+            else:
+                self.traders[name] = SyncTraderAdapter(obj.trader, self.executor)
+        tasks = [self._run_process(name) for name in self.processes]
+        if self.metrics_file:
+            tasks.append(self._dump_metrics())
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for obj in self.processes.values():
+                lock = getattr(obj.trader, 'lock', None)
+                if lock is not None and lock.is_locked:
+                    lock.release()
+            # Only loaded (and aiohttp only imported) when an async CoinbasePro is in use
+            module = sys.modules.get('botic.exchange.asynccoinbasepro')
+            if module is not None:
+                await module.close_sessions()
+            if self.executor:
+                self.executor.shutdown(wait=False)
+
+    async def _run_process(self, name: str) -> None:
+        """Initialize a trader and tick it every sleep_seconds (fixed rate, missed slots are
+        skipped)
+        """
+        # pylint: disable=protected-access
+        obj = self.processes[name]
+        trader = self.traders[name]
+        backoff = 0.0
+        while not await self._supervised(obj, trader._init_async):
+            backoff = min(self.restart_max_backoff, max(1.0, backoff * 2))
+            trader.logit('ERROR: init failed, retrying in {:.0f} seconds'.format(backoff))
+            await asyncio.sleep(backoff)
+        self.ticks[name] = 0
+        # Backtests run on the virtual time of their exchange: sleeping only yields to the loop
+        clock = trader.clock
+        due = clock.time()
+        backoff = 0.0
+        while 1:
+            lag = clock.time() - due
+            if os.path.exists(obj.pause_file):
+                trader.logit('PAUSE')
+            else:
+                if self.ticks[name] > 0 and lag >= obj.sleep_seconds * 0.25 and \
+                        not clock.virtual:
+                    trader.logit(
+                        'WARNING: Lost time: tick started {:.2f} seconds late, sleep_seconds is '
+                        '{}'.format(lag, obj.sleep_seconds))
+                self.ticks[name] += 1
+                if await self._supervised(obj, trader.run_trading_algorithm):
+                    backoff = 0.0
+                    if clock.virtual and self.fast_forward:
+                        thresholds = trader.price_thresholds()
+                        if thresholds is not None:
+                            trader.exchange.fast_forward(*thresholds)
+                else:
+                    backoff = min(self.restart_max_backoff, max(1.0, backoff * 2))
+                    trader.logit('ERROR: tick failed, retrying in {:.0f} seconds'.format(backoff))
+                    await async_sleep(clock, backoff)
+            due += obj.sleep_seconds
+            now = clock.time()
+            if due < now:
+                due += obj.sleep_seconds * ((now - due) // obj.sleep_seconds + 1)
+            await async_sleep(clock, due - now)
+
+    async def _dump_metrics(self) -> None:
+        """Write API metrics and tick counts to metrics_file every metrics_interval seconds"""
+        while 1:
+            await asyncio.sleep(self.metrics_interval)
+            try:
+                METRICS.dump(self.metrics_file, {'ticks': self.ticks})
+            except OSError as err:
+                print('WARNING: failed to write metrics file {}: {}'.format(
+                    self.metrics_file, err))
+
+    async def _supervised(self, obj: BoticProcess,
+                          func: t.Callable[[], t.Awaitable[None]]) -> bool:
+        """Await func(). When supervising, an exception is logged instead of propagating.
+
+        Returns:
+            bool: True if func succeeded
+        """
+        if not self.supervise:
+            await func()
+            return True
+        try:
+            await func()
+        except Exception:
+            for line in traceback.format_exc().strip().split('\n'):
+                obj.trader.logit('ERROR: {}'.format(line))
+            return False
+        return True
@@ -9,6 +9,7 @@ import typing as t
 from datetime import datetime
 from abc import ABCMeta
 from filelock import FileLock
+from .clock import WALL_CLOCK
 
 os.environ['TZ'] = 'UTC'
 time.tzset()
@@ -32,6 +33,9 @@ class BaseBot(metaclass=ABCMeta):
     # pylint: disable=no-self-use
     # pylint: disable=bare-except
     # pylint: disable=no-member
+    # Clock to sleep on and to measure time with, see clock.py
+    clock = WALL_CLOCK
+
     def __init__(self, config) -> None:
         self.config = config
 
@@ -2,9 +2,17 @@
 import os
 import time
 import importlib
-from random import uniform
+import typing as t
+import traceback
+from concurrent.futures import ThreadPoolExecutor, Future
 import yaml
-from .util import configure
+from .util import configure, getsetting
+from .scheduler import Scheduler, Job
+from .clock import VirtualClock
+from .control import ControlServer
+from .metrics import METRICS
+from .exchange.hub import HUB
+from .exchange.retry import breaker_stats
 
 os.environ['TZ'] = 'UTC'
 time.tzset()
@@ -44,78 +52,319 @@ class BoticProcess:
         # Write config vars to trader object
         configure(self.process_name, self.trader, do_print=False)
 
+def load_config(config_path: str, do_print=True) -> t.Tuple[dict, t.Dict[str, dict]]:
+    """Load a yaml config and insert the global section values into every process section.
+
+    Args:
+        config_path (str): The path to the yaml configuration file
+
+    Returns:
+        tuple: (global_config, {process_name: config})
+
+    Raises:
+        DuplicateConfigurationError
+    """
+    with open(config_path) as config_stream:
+        config = list(yaml.safe_load_all(config_stream))
+    global_config = None
+    for item in config:
+        if 'global' in item.keys():
+            global_config = item['global']
+            break
+    if not global_config:
+        print('WARNING: No global config section found')
+    sections = {}
+    for section in config:
+        for name, section_config in section.items():
+            if name == 'global':
+                continue
+            if global_config:
+                for k,v in global_config.items():
+                    if not k in section_config:
+                        if do_print:
+                            print('Insert global config:', k)
+                        section_config[k] = v
+            if name in sections:
+                raise DuplicateConfigurationError('Duplicate config name: {}'.format(name))
+            sections[name] = section_config
+    return (global_config or {}, sections)
+
 class Botic:
-    """Wrapper to Botic class to configure each global + yaml section"""
+    """Wrapper to Botic class to configure each global + yaml section
+
+    Args:
+        config_path (str): The path to the yaml configuration file
+        names (list): Optional list of section names to run. All sections are run by default.
+        supervise (bool): If True, a process that raises is restarted in place with backoff
+            instead of stopping every process
+    """
     # pylint: disable=too-few-public-methods
     # pylint: disable=no-member
-    def __init__(self, config_path: str, do_print=True) -> None:
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, config_path: str, do_print=True, names=None, supervise=False) -> None:
         self.processes = {}
-        with open(config_path) as config_stream:
-            self.config = list(yaml.safe_load_all(config_stream))
+        self.scheduler = Scheduler()
+        self.config_path = config_path
+        self.global_config, self.sections = load_config(config_path, do_print=do_print)
+        self.names = names
+        self.executor = None
+        self.tick_threads = getsetting(self.global_config, 'general', 'tick_threads')
+        self.price_watch_seconds = getsetting(
+            self.global_config, 'general', 'price_watch_seconds')
+        self.thresholds = {}
+        self.fast_forward = False
+        self.supervise = supervise
+        self.restart_max_backoff = getsetting(
+            self.global_config, 'general', 'restart_max_backoff')
+        self.restarts = {}
+        self._backoff = {}
+        self.paused = set()
+        self.control_socket = getsetting(self.global_config, 'general', 'control_socket')
+        self.control = None
+        self.metrics_file = getsetting(self.global_config, 'general', 'metrics_file')
+        self.metrics_interval = getsetting(self.global_config, 'general', 'metrics_interval')
         self._setup_processes()
 
     def _setup_processes(self) -> None:
-        global_config = None
-        for item in self.config:
-            if 'global' in item.keys():
-                global_config = item['global']
-                break
-        if not global_config:
-            print('WARNING: No global config section found')
-        for section in self.config:
-            for name, config in section.items():
-                if name == 'global':
-                    continue
-                print('Create process:', name)
-                if global_config:
-                    for k,v in global_config.items():
-                        if not k in config:
-                            print('Insert global config:', k)
-                            config[k] = v
-                proc = BoticProcess(name, config)
-                if name in self.processes:
-                    raise DuplicateConfigurationError('Duplicate config name: {}'.format(name))
-                self.processes[name] = proc
+        for name, config in self.sections.items():
+            if self.names is not None and not name in self.names:
+                continue
+            print('Create process:', name)
+            self.processes[name] = BoticProcess(name, config)
 
     def run(self) -> None:
         """Entry point to start the bots"""
-        run_timer = {}
-        first = True
-        for name, obj in self.processes.items():
-            run_timer[name] = time.time() - (obj.sleep_seconds+1)
-            obj.trader._init()
-            time.sleep(uniform(0.2, 1.5))
-        while 1:
-            min_time_distance = 200.00
-            for name, obj in self.processes.items():
-                time_diff = time.time() - run_timer[name]
-                sleep_diff = obj.sleep_seconds - time_diff
-                if sleep_diff < min_time_distance:
-                    min_time_distance = sleep_diff
-                if os.path.exists(obj.pause_file):
-                    obj.trader.logit('PAUSE')
-                    run_timer[name] = time.time()
-                    continue
-                if time_diff >= obj.sleep_seconds:
-                    if not first and time_diff >= obj.sleep_seconds * 1.25:
-                        obj.trader.logit(
-                            'WARNING: Lost time: took {} seconds, but sleep_seconds is {}'.format(
-                            time_diff, obj.sleep_seconds
-                        ))
-                        obj.trader.logit(
-                            'WARNING: Lost time: HINT: break config up into multiple processes'
-                        )
-                    #obj.trader.logit('Running: {}'.format(name))
-                    obj.trader.run_trading_algorithm()
-                    run_timer[name] = time.time()
-                    time.sleep(1)
-                #else:
-                #    obj.trader.logit('pausing({} < {}): {}'.format(
-                #        time.time() - run_timer[name], obj.sleep_seconds, name))
-                time.sleep(0.1)
-            min_time_distance = round(min_time_distance, 2)
-            if min_time_distance < 0:
-                min_time_distance = 1
-            time.sleep(min_time_distance)
-            first = False
+        for name in list(self.processes):
+            if self.supervise:
+                self._supervised(self.processes[name], self._start_process, name)
+            else:
+                self._start_process(name)
+        virtual = self._use_virtual_clock()
+        self.fast_forward = virtual and getsetting(
+            self.global_config, 'general', 'backtest_fast_forward')
+        if self.tick_threads > 0 and not virtual:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.tick_threads, thread_name_prefix='botic-tick')
+        if self.price_watch_seconds > 0:
+            self.scheduler.add('__price_watch__', self.price_watch_seconds, self._watch_prices)
+        if self.control_socket:
+            self.control = ControlServer(self, self.control_socket)
+            self.control.start()
+        if self.metrics_file and not virtual:
+            # On virtual time only the final dump is written
+            self.scheduler.add('__metrics__', self.metrics_interval, self._dump_metrics)
+        try:
+            self.scheduler.run_forever()
+        finally:
+            if self.metrics_file:
+                self._dump_metrics(None)
+            if self.control:
+                self.control.close()
+            if self.executor:
+                self.executor.shutdown(wait=False)
+            for obj in self.processes.values():
+                self._release_lock(obj)
+
+    def _use_virtual_clock(self) -> bool:
+        """When every process is backtesting, schedule on virtual time: sleep_seconds passes
+        instantly and ticks run back-to-back on one thread (threads would only skip ticks).
+
+        Returns:
+            bool: True if the scheduler switched to a virtual clock
+        """
+        clocks = []
+        for obj in self.processes.values():
+            clock = getattr(obj.trader, 'clock', None)
+            if clock is None or not clock.virtual:
+                return False
+            clocks.append(clock)
+        if not clocks:
+            return False
+        self.scheduler.set_clock(VirtualClock(lambda: max([i.time() for i in clocks])))
+        return True
+
+    def _start_process(self, name: str, exchange=None) -> None:
+        """Initialize the trader of a process and schedule its ticks"""
+        obj = self.processes[name]
+        obj.trader._init(exchange=exchange)
+        self.scheduler.add(name, obj.sleep_seconds, self._tick)
+
+    @staticmethod
+    def _release_lock(obj: BoticProcess) -> None:
+        lock = getattr(obj.trader, 'lock', None)
+        if lock is not None and lock.is_locked:
+            lock.release()
+
+    def _supervised(self, obj: BoticProcess, func: t.Callable, *args) -> bool:
+        """Call func(*args). When supervising, an exception schedules a restart of the process
+        with exponential backoff instead of propagating.
+
+        Returns:
+            bool: True if func succeeded
+        """
+        if not self.supervise:
+            func(*args)
+            return True
+        name = obj.process_name
+        try:
+            func(*args)
+        except Exception as err:
+            backoff = self._backoff.get(name, (0.0, 0.0))[0]
+            backoff = min(self.restart_max_backoff, max(1.0, backoff * 2))
+            self._backoff[name] = (backoff, self.scheduler.clock.time())
+            self.thresholds[name] = None
+            for line in traceback.format_exc().strip().split('\n'):
+                obj.trader.logit('ERROR: {}'.format(line))
+            obj.trader.logit('ERROR: process failed ({}), restarting in {:.0f} seconds'.format(
+                err, backoff))
+            # Replace the tick job, the restart job turns back into a tick job on success
+            self.scheduler.add(name, obj.sleep_seconds, self._restart_process,
+                first_due=self.scheduler.clock.time() + backoff)
+            return False
+        # Reset the backoff once the process has been healthy for a while
+        if name in self._backoff and \
+                self.scheduler.clock.time() - self._backoff[name][1] > self.restart_max_backoff:
+            del self._backoff[name]
+        return True
 
+    def _restart_process(self, job: Job) -> None:
+        """Rebuild a failed process from its config section while the others keep running. The
+        exchange object (and its sessions and caches) is reused when it exists and the section
+        still trades the same pair on the same exchange and account.
+        """
+        name = job.name
+        old = self.processes[name]
+        section = self.sections[name]
+        exchange = getattr(old.trader, 'exchange', None)
+        if old.config['exchange'] != section['exchange'] or \
+                old.config['trader'].get('pair') != section['trader'].get('pair'):
+            exchange = None
+        self.restarts[name] = self.restarts.get(name, 0) + 1
+        old.trader.logit('Restarting process (restart #{})'.format(self.restarts[name]))
+        self._rebuild_process(old, exchange)
+
+    def _reload_process(self, job: Job) -> None:
+        """Rebuild a process from its reloaded config section. The exchange is built anew, so
+        changes of exchange_module, credentials or pair take effect.
+        """
+        old = self.processes[job.name]
+        old.trader.logit('Reloading process')
+        self._rebuild_process(old, None)
+
+    def _rebuild_process(self, old: BoticProcess, exchange) -> None:
+        """Replace old with a new process from its config section, on exchange if given"""
+        name = old.process_name
+        self._release_lock(old)
+
+        def rebuild():
+            self.processes[name] = BoticProcess(name, self.sections[name], do_print=False)
+            self._start_process(name, exchange=exchange)
+        self._supervised(old, rebuild)
+
+    def reload_process(self, name: str) -> None:
+        """Re-read the config file and restart one process with its new section. Called from the
+        control socket thread: waits for a tick in progress before the restart is scheduled.
+        """
+        _, sections = load_config(self.config_path, do_print=False)
+        if not name in sections:
+            raise KeyError('Process not found in config: {}'.format(name))
+        obj = self.processes[name]
+        old_job = self.scheduler.jobs.get(name)
+        # Stop new ticks from being dispatched, then let a running tick finish
+        self.scheduler.add(name, obj.sleep_seconds, self._reload_process,
+            first_due=self.scheduler.clock.time() + 86400)
+        if old_job is not None and old_job.pending is not None:
+            try:
+                old_job.pending.result()
+            except Exception:
+                pass
+        self.sections[name] = sections[name]
+        self.scheduler.wake(name)
+
+    def status(self, name: str) -> dict:
+        """Return scheduler stats and in-memory trader state for a process"""
+        obj = self.processes[name]
+        job = self.scheduler.jobs.get(name)
+        return {
+            'paused': name in self.paused,
+            'restarts': self.restarts.get(name, 0),
+            'thresholds': self.thresholds.get(name),
+            'scheduler': job.stats() if job else None,
+            'trader': obj.trader.state(),
+        }
+
+    def _dump_metrics(self, _job: t.Optional[Job]) -> None:
+        """Write API metrics, scheduler, hub and circuit breaker stats to metrics_file"""
+        try:
+            METRICS.dump(self.metrics_file, {
+                'scheduler': self.scheduler.stats(),
+                'hub': HUB.stats(),
+                'breakers': breaker_stats(),
+            })
+        except OSError as err:
+            print('WARNING: failed to write metrics file {}: {}'.format(self.metrics_file, err))
+
+    def _tick(self, job: Job) -> t.Optional[Future]:
+        """Run one trader tick for the process named by job. With tick_threads set, the tick is
+        submitted to the thread pool and the scheduler makes sure a process never runs two ticks
+        at once.
+        """
+        obj = self.processes[job.name]
+        # The control socket replaces polling for the pause file
+        if job.name in self.paused or (not self.control and os.path.exists(obj.pause_file)):
+            obj.trader.logit('PAUSE')
+            return None
+        # Lag is meaningless on virtual time, the next tick is always run right away
+        if job.ticks > 1 and job.lag >= obj.sleep_seconds * 0.25 and \
+                not self.scheduler.clock.virtual:
+            obj.trader.logit(
+                'WARNING: Lost time: tick started {:.2f} seconds late, sleep_seconds is {}'.format(
+                job.lag, obj.sleep_seconds
+            ))
+            obj.trader.logit(
+                'WARNING: Lost time: HINT: break config up into multiple processes (see boticw)'
+            )
+        if self.executor:
+            return self.executor.submit(self._supervised, obj, self._run_trader, obj)
+        self._supervised(obj, self._run_trader, obj)
+        return None
+
+    def _run_trader(self, obj: BoticProcess) -> None:
+        obj.trader.run_trading_algorithm()
+        if self.price_watch_seconds > 0 or self.fast_forward:
+            thresholds = obj.trader.price_thresholds()
+            self.thresholds[obj.process_name] = thresholds
+            if self.fast_forward and thresholds is not None:
+                obj.trader.exchange.fast_forward(*thresholds)
+
+    def _watch_prices(self, _job: Job) -> None:
+        """Wake processes whose price thresholds (see BaseTrader.price_thresholds) were crossed.
+        Prices are fetched once per exchange module and pair.
+        """
+        prices = {}
+        for name, obj in self.processes.items():
+            thresholds = self.thresholds.get(name)
+            if not thresholds:
+                continue
+            low, high, not_after = thresholds
+            exchange = obj.trader.exchange
+            if not_after is not None and exchange.get_time() >= not_after:
+                self.thresholds[name] = None
+                self.scheduler.wake(name)
+                continue
+            if low is None and high is None:
+                continue
+            key = (obj.exchange_module, obj.trader.pair)
+            if not key in prices:
+                try:
+                    prices[key] = exchange.watch_price()
+                except Exception as err:
+                    print('WARNING: price watcher failed for {}: {}'.format(key, err))
+                    prices[key] = None
+            price = prices[key]
+            if price is None:
+                continue
+            if (low is not None and price <= low) or (high is not None and price >= high):
+                obj.trader.logit('WAKE: price:{} low:{} high:{}'.format(price, low, high))
+                self.thresholds[name] = None
+                self.scheduler.wake(name)
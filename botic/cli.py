@@ -3,8 +3,10 @@
 import os
 import sys
 import time
-from shlex import quote
+import traceback
 from .botic import Botic
+from .shard import ShardSupervisor
+from .asyncbotic import AsyncBotic
 
 os.environ['TZ'] = 'UTC'
 time.tzset()
@@ -15,16 +17,28 @@ def usage():
     sys.exit(1)
 
 def main_persist():
-    """Run botic in a infinite loop"""
+    """Run botic with in-process supervision. A failed process is restarted in place with backoff
+    while the other processes keep running. If Botic itself fails (e.g. a bad config), it is
+    rebuilt in the same interpreter.
+    """
     if len(sys.argv) != 2:
         usage()
-    try:
-        while 1:
-            os.system('botic {}'.format(quote(sys.argv[1])))
-            time.sleep(60)
-
-    except KeyboardInterrupt:
-        print('Exiting...')
+    backoff = 1
+    while 1:
+        started = time.time()
+        try:
+            bot = Botic(sys.argv[1], supervise=True)
+            bot.run()
+        except KeyboardInterrupt:
+            print('Exiting...')
+            break
+        except Exception as err:
+            traceback.print_exc()
+            if time.time() - started > 300:
+                backoff = 1
+            print('ERROR: botic failed ({}), restarting in {} seconds'.format(err, backoff))
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 60)
 
 def main() -> None:
     """Run botic"""
@@ -37,6 +51,29 @@ def main() -> None:
     except KeyboardInterrupt:
         print('exit')
 
+def main_sharded() -> None:
+    """Run botic with the config sections split across worker processes"""
+    if len(sys.argv) not in (2, 3):
+        print('{} <config-file> [workers]'.format(sys.argv[0]))
+        sys.exit(1)
+    config_path = sys.argv[1]
+    workers = int(sys.argv[2]) if len(sys.argv) == 3 else 0
+    supervisor = ShardSupervisor(config_path, workers=workers)
+    try:
+        supervisor.run()
+    except KeyboardInterrupt:
+        print('exit')
+
+def main_async() -> None:
+    """Run botic with every process on one asyncio event loop"""
+    if len(sys.argv) != 2:
+        usage()
+    bot = AsyncBotic(sys.argv[1], supervise=True)
+    try:
+        bot.run()
+    except KeyboardInterrupt:
+        print('exit')
+
 def main_profile() -> None:
     """Run botic with cProfile"""
     import cProfile, pstats, io
@@ -0,0 +1,64 @@
+"""Wall and virtual clocks
+
+Everything that waits or measures time (the scheduler, the asyncio runner and traders) goes through
+a clock. Live exchanges use the wall clock. The Backtest exchanges own a VirtualClock driven by
+the historical time they replay: sleeping advances the virtual time instantly, so a backtest runs
+as fast as the CPU allows.
+"""
+import time
+import asyncio
+import threading
+import typing as t
+
+class WallClock:
+    """time.time() and time.sleep()"""
+    virtual = False
+
+    def time(self) -> float:
+        """Current epoch time"""
+        # pylint: disable=no-self-use
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        """Block for seconds"""
+        # pylint: disable=no-self-use
+        if seconds > 0:
+            time.sleep(seconds)
+
+class VirtualClock:
+    """Simulated time that never blocks. The time is the latest of the source time (e.g.
+    Backtest.get_time) and the time reached by sleeping.
+
+    Args:
+        source (callable): Returns the simulated epoch time, optional
+    """
+    virtual = True
+
+    def __init__(self, source: t.Optional[t.Callable[[], float]] = None) -> None:
+        self.source = source
+        self._now = 0.0
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        """Current simulated time"""
+        if self.source is None:
+            return self._now
+        return max(self._now, self.source())
+
+    def sleep(self, seconds: float) -> None:
+        """Advance the simulated time by seconds, without blocking"""
+        with self._lock:
+            self._now = self.time() + max(0.0, seconds)
+
+async def async_sleep(clock, seconds: float) -> None:
+    """Sleep on clock from a coroutine. On a virtual clock the time jumps ahead and other tasks
+    get a turn.
+    """
+    if clock.virtual:
+        clock.sleep(seconds)
+        await asyncio.sleep(0)
+    else:
+        await asyncio.sleep(seconds)
+
+# Shared by everything that runs on real time
+WALL_CLOCK = WallClock()
@@ -0,0 +1,124 @@
+"""Unix domain socket control API for a running Botic process
+
+Requests and responses are single JSON lines. Example request:
+    {"command": "pause", "name": "btcbot"}
+
+Commands:
+    list            List process names
+    status          Scheduler lag/timing stats and in-memory trader state (name is optional)
+    pause <name>    Stop ticking a process until it is resumed
+    resume <name>   Resume a paused process
+    tick <name>     Run a tick as soon as possible
+    reload <name>   Re-read the config file and restart one process with its new section
+"""
+import os
+import sys
+import json
+import socket
+import threading
+import socketserver
+import typing as t
+
+class ControlError(Exception):
+    """Invalid control command"""
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Handle one JSON request per line"""
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line.decode('utf-8'))
+                result = self.server.control.handle(
+                    request.get('command', ''), request.get('name'))
+                response = {'ok': True, 'result': result}
+            except Exception as err:
+                response = {'ok': False, 'error': str(err)}
+            self.wfile.write(json.dumps(response, default=str).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class ControlServer:
+    """Serve the control API for a Botic instance on a Unix domain socket.
+
+    Args:
+        bot (Botic): The Botic instance to control
+        path (str): Path of the socket file. A stale file at this path is removed.
+    """
+    def __init__(self, bot, path: str) -> None:
+        self.bot = bot
+        self.path = path
+        if os.path.exists(path):
+            os.unlink(path)
+        self.server = _Server(path, _Handler)
+        self.server.control = self
+        self.thread = None
+
+    def start(self) -> None:
+        """Serve requests in a background thread"""
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name='botic-control', daemon=True)
+        self.thread.start()
+
+    def close(self) -> None:
+        """Stop serving and remove the socket file"""
+        self.server.shutdown()
+        self.server.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _get_name(self, name: t.Optional[str]) -> str:
+        if not name:
+            raise ControlError('Missing process name')
+        if not name in self.bot.processes:
+            raise ControlError('Unknown process name: {}'.format(name))
+        return name
+
+    def handle(self, command: str, name: t.Optional[str] = None) -> t.Any:
+        """Run a control command and return its JSON serializable result"""
+        # pylint: disable=too-many-return-statements
+        if command == 'list':
+            return list(self.bot.processes)
+        if command == 'status':
+            if name:
+                return self.bot.status(self._get_name(name))
+            return {name: self.bot.status(name) for name in list(self.bot.processes)}
+        if command == 'pause':
+            self.bot.paused.add(self._get_name(name))
+            return 'paused'
+        if command == 'resume':
+            self.bot.paused.discard(self._get_name(name))
+            return 'resumed'
+        if command == 'tick':
+            self.bot.scheduler.wake(self._get_name(name))
+            return 'woken'
+        if command == 'reload':
+            self.bot.reload_process(self._get_name(name))
+            return 'reloading'
+        raise ControlError('Unknown command: {}'.format(command))
+
+def send_command(path: str, command: str, name: t.Optional[str] = None) -> dict:
+    """Send one command to a control socket and return the decoded response"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps({'command': command, 'name': name}).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as sock_fd:
+            return json.loads(sock_fd.readline().decode('utf-8'))
+
+def main() -> None:
+    """CLI client for the control socket"""
+    if len(sys.argv) not in (3, 4):
+        print('{} <control-socket> <list|status|pause|resume|tick|reload> [name]'.format(
+            sys.argv[0]))
+        sys.exit(1)
+    name = sys.argv[3] if len(sys.argv) == 4 else None
+    response = send_command(sys.argv[1], sys.argv[2], name)
+    print(json.dumps(response, indent=2, default=str))
+    if not response.get('ok'):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
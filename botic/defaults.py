@@ -7,6 +7,44 @@ CONFIG_DEFAULTS = {
         ('key', str, ''),
         ('passphrase', str, ''),
         ('b64secret', str, ''),
+        ('api_url', str, 'https://api.pro.coinbase.com'),
+        # Max keep-alive connections of the HTTP session shared by every client in a process
+        ('http_pool_size', int, 10),
+        # Max age (seconds) of responses shared between bots in one process
+        ('hub_ttl_ticker', float, 1.0),
+        ('hub_ttl_fees', float, 60.0),
+        ('hub_ttl_accounts', float, 5.0),
+        ('hub_ttl_open_orders', float, 5.0),
+        # Seconds between background refreshes of the product catalog shared by all bots
+        ('catalog_refresh_seconds', float, 3600.0),
+        # Max age (seconds) of the cached wallet. It is cached per API key and is dropped
+        # whenever any bot using the key places, cancels or settles an order.
+        ('cache_ttl_wallet', float, 30.0),
+        # Token bucket limits (requests/second and burst) shared by all processes on the host.
+        # Public endpoints are limited per IP, private endpoints per API key.
+        ('rate_limit_public', float, 3.0),
+        ('rate_limit_public_burst', float, 6.0),
+        ('rate_limit_private', float, 5.0),
+        ('rate_limit_private_burst', float, 10.0),
+        ('rate_limit_dir', str, ''),
+        # Retries of transient API errors: max attempts and exponential backoff (with jitter)
+        ('retry_attempts', int, 4),
+        ('retry_backoff', float, 0.5),
+        ('retry_backoff_max', float, 8.0),
+        # Fail fast on an endpoint after N consecutive transient failures, for N seconds
+        ('circuit_threshold', int, 5),
+        ('circuit_reset_seconds', float, 30.0),
+        # Stream prices from the websocket ticker channel (one connection per process). REST is
+        # used when the last streamed price is older than ws_stale_seconds.
+        ('ws_enable', bool, False),
+        ('ws_url', str, 'wss://ws-feed.pro.coinbase.com'),
+        ('ws_stale_seconds', float, 5.0),
+        # Answer get_order() from fill/done events of the authenticated user channel instead of
+        # polling REST. An order in flight is waited on for up to ws_order_wait seconds per call.
+        ('ws_user_channel', bool, False),
+        ('ws_order_wait', float, 2.0),
+        # Candle CSV(.gz) replayed by the Backtest exchange (empty = bundled BTC-USD history)
+        ('backtest_candles', str, ''),
     ],
     'general': [
         ('sleep_seconds', float, 60),
@@ -14,6 +52,28 @@ CONFIG_DEFAULTS = {
         ('data_dir', str, 'data'),
         ('pause_file', str, 'bot.pause'),
         ('log_disabled', bool, False),
+        # Relative load of a section when sharding with boticw (0 = derive from sleep_seconds)
+        ('shard_weight', float, 0.0),
+        # Run trader ticks on a pool of N threads so exchange I/O overlaps (0 = run inline)
+        ('tick_threads', int, 0),
+        # Check prices every N seconds and wake traders whose price thresholds were crossed, so
+        # sleep_seconds becomes the max interval between ticks (0 = disabled)
+        ('price_watch_seconds', float, 0.0),
+        # On virtual time (backtests), skip the ticks between price thresholds of the trader (see
+        # BaseTrader.price_thresholds) instead of running every one of them
+        ('backtest_fast_forward', bool, True),
+        # Max delay before a supervised (boticp) process is restarted after a failure
+        ('restart_max_backoff', float, 300.0),
+        # List open orders once per tick (shared per API key) and only call get_order() for
+        # sells that are no longer open, instead of once per open sell
+        ('reconcile_orders', bool, False),
+        # Write API call metrics (see botic/metrics.py) as JSON to this file every
+        # metrics_interval seconds. '{pid}' in the path is replaced with the process id.
+        ('metrics_file', str, ''),
+        ('metrics_interval', float, 60.0),
+        # Unix socket path for boticctl (pause/resume/tick/status/reload). When set, it replaces
+        # polling for pause_file.
+        ('control_socket', str, ''),
     ],
     'trader': [
         ('pair', str, 'BTC-USD'),
@@ -0,0 +1,74 @@
+"""asyncio Backtest exchange module
+
+Backtesting never does I/O, so every coroutine runs the matching Backtest method directly on a
+wrapped Backtest instance.
+"""
+import typing as t
+from ..util import configure
+from .asyncbase import AsyncBaseExchange
+from .backtest import Backtest
+from .base import ProductInfo, Decimal
+
+class AsyncBacktest(AsyncBaseExchange):
+    """asyncio Backtest"""
+    # No API calls to measure, and the per-call overhead would slow down long backtests
+    instrument_methods = False
+
+    def __init__(self, config: dict) -> None:
+        super().__init__(config)
+        self.backtest = Backtest(config)
+        self.clock = self.backtest.clock
+
+    async def authenticate(self):
+        # Called after this object is configured, the wrapped exchange needs the same settings
+        configure(self.process_name, self.backtest, do_print=False)
+        return self.backtest.authenticate()
+
+    async def get_price(self) -> Decimal:
+        return self.backtest.get_price()
+
+    async def get_product_info(self) -> ProductInfo:
+        return self.backtest.get_product_info()
+
+    async def get_precisions(self) -> tuple:
+        return self.backtest.get_precisions()
+
+    async def get_usd_wallet(self) -> Decimal:
+        return self.backtest.get_usd_wallet()
+
+    async def get_open_sells(self) -> t.List[t.Mapping[str, Decimal]]:
+        return self.backtest.get_open_sells()
+
+    async def get_open_orders(self) -> t.Dict[str, dict]:
+        return self.backtest.get_open_orders()
+
+    async def get_fees(self) -> t.Tuple[Decimal, Decimal, Decimal]:
+        return self.backtest.get_fees()
+
+    async def buy_limit(self, price: Decimal, size: Decimal) -> dict:
+        return self.backtest.buy_limit(price, size)
+
+    async def buy_market(self, funds: Decimal) -> dict:
+        return self.backtest.buy_market(funds)
+
+    async def sell_limit(self, price: Decimal, size: Decimal) -> dict:
+        return self.backtest.sell_limit(price, size)
+
+    async def sell_market(self, size: Decimal) -> dict:
+        return self.backtest.sell_market(size)
+
+    async def cancel(self, order_id: str) -> bool:
+        return self.backtest.cancel(order_id)
+
+    async def get_order(self, order_id: str) -> dict:
+        return self.backtest.get_order(order_id)
+
+    async def get_hold_value(self) -> Decimal:
+        return self.backtest.get_hold_value()
+
+    def fast_forward(self, low: t.Optional[Decimal], high: t.Optional[Decimal],
+                     not_after: t.Optional[float]) -> None:
+        self.backtest.fast_forward(low, high, not_after)
+
+    def get_time(self) -> float:
+        return self.backtest.get_time()
@@ -0,0 +1,116 @@
+"""Template and base class for asyncio exchange modules
+
+Same interface as BaseExchange, but every method that may do I/O is a coroutine so one event loop
+can drive many traders concurrently.
+"""
+import time
+from decimal import Decimal
+import typing as t
+from abc import abstractmethod
+from ..basebot import BaseBot
+from ..metrics import instrument_class
+from .base import ProductInfo, INSTRUMENTED_METHODS
+
+class AsyncBaseExchange(BaseBot):
+    """Base class of abstract coroutines to implement for each asyncio exchange. See BaseExchange
+    for the description of each method.
+
+    Args:
+        config (dict): The process config
+
+    Attributes:
+        config (dict): Dict of parsed yaml file config_path
+    """
+    # Record calls and latency of the exchange methods in METRICS
+    instrument_methods = True
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        if cls.instrument_methods:
+            instrument_class(cls, INSTRUMENTED_METHODS)
+
+    def __init__(self, config: dict) -> None:
+        super().__init__(config)
+        self.client = None
+
+    @abstractmethod
+    async def authenticate(self):
+        """Authenticate/connect to the exchange using credentials from the config"""
+
+    @abstractmethod
+    async def get_price(self) -> Decimal:
+        """Get latest price of coin from exchange"""
+
+    @abstractmethod
+    async def get_product_info(self) -> ProductInfo:
+        """Get the ProductInfo of the configured pair"""
+
+    @abstractmethod
+    async def get_usd_wallet(self) -> Decimal:
+        """Get the value of USD wallet"""
+
+    @abstractmethod
+    async def get_open_sells(self) -> t.List[t.Mapping[str, Decimal]]:
+        """Query exchange for an active list of open sell orders"""
+
+    @abstractmethod
+    async def get_fees(self) -> t.Tuple[Decimal, Decimal, Decimal]:
+        """Get current maker and taker fees and USD volume"""
+
+    @abstractmethod
+    async def buy_limit(self, price: Decimal, size: Decimal) -> dict:
+        """Place a buy limit order"""
+
+    @abstractmethod
+    async def buy_market(self, funds: Decimal) -> dict:
+        """Place a buy market order"""
+
+    @abstractmethod
+    async def sell_limit(self, price: Decimal, size: Decimal) -> dict:
+        """Place a sell limit order"""
+
+    @abstractmethod
+    async def sell_market(self, size: Decimal) -> dict:
+        """Place a sell market order"""
+
+    @abstractmethod
+    async def cancel(self, order_id: str) -> bool:
+        """Cancel an order by it's ID"""
+
+    @abstractmethod
+    async def get_order(self, order_id: str) -> dict:
+        """Get order by ID"""
+
+    @abstractmethod
+    async def get_precisions(self) -> tuple:
+        """Get size and usd precisions/decimal places"""
+
+    @abstractmethod
+    async def get_hold_value(self) -> Decimal:
+        """Get value of outstanding sell orders without fees"""
+
+    async def get_open_orders(self) -> t.Optional[t.Dict[str, dict]]:
+        """Optional override: List every open order on the account, see BaseExchange"""
+        # pylint: disable=no-self-use
+        return None
+
+    async def watch_price(self) -> t.Optional[Decimal]:
+        """Optional override: Return the latest price without side effects, see BaseExchange"""
+        # pylint: disable=no-self-use
+        return None
+
+    def fast_forward(self, low: t.Optional[Decimal], high: t.Optional[Decimal],
+                     not_after: t.Optional[float]) -> None:
+        """Optional override: Jump ahead on the next get_price(), see BaseExchange. This never
+        does I/O, so it is not a coroutine.
+        """
+
+    def get_time(self) -> float:
+        """Optional override: Return the time based off of what the exchange sees. This never
+        does I/O, so it is not a coroutine.
+
+        Returns:
+            float: epoch timestamp
+        """
+        # pylint: disable=no-self-use
+        return time.time()
@@ -0,0 +1,349 @@
+"""asyncio CoinbasePro exchange module (requires aiohttp: pip install botic[async])
+
+Talks to the Coinbase Pro REST API directly with aiohttp. Rate limiting, retries, circuit breakers,
+the websocket feeds and the shared response caches are the same as in the CoinbasePro module.
+"""
+import hmac
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import typing as t
+import aiohttp
+from .exceptions import ExchangeError, ExchangeGetOrdersError, ExchangeAuthError
+from .exceptions import ExchangeBuyLimitError, ExchangeBuyMarketError, ExchangeSellLimitError
+from .exceptions import ExchangeSellMarketError, ExchangeProductInfoError, ExchangeCancelError
+from .exceptions import ExchangeFeesError, ExchangeWalletError
+from .asyncbase import AsyncBaseExchange
+from .base import ProductInfo, Decimal
+from ..metrics import METRICS
+from .hub import ASYNC_HUB
+from .ratelimit import get_bucket, key_bucket_name
+from .retry import RetryPolicy, get_breaker, is_transient_error, is_transient_response
+from .feed import get_ticker_feed, get_user_feed
+from .coinbasepro import PUBLIC_METHODS, ORDER_METHODS, _api_response_check
+
+def is_transient_async_error(err: Exception, idempotent: bool = True) -> bool:
+    """is_transient_error() for aiohttp and asyncio exceptions"""
+    if isinstance(err, aiohttp.ClientConnectorError):
+        # Failed to connect, the request was never sent
+        return True
+    if not idempotent:
+        return False
+    if isinstance(err, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+                        asyncio.TimeoutError)):
+        return True
+    return is_transient_error(err)
+
+class AsyncClient:
+    """Minimal Coinbase Pro REST client.
+
+    Args:
+        session (aiohttp.ClientSession): Shared keep-alive session
+        api_url (str): API URL
+        key (str): API key
+        b64secret (str): Base64 encoded API secret
+        passphrase (str): API passphrase
+    """
+    # pylint: disable=too-few-public-methods
+    def __init__(self, session: aiohttp.ClientSession, api_url: str, key: str, b64secret: str,
+                 passphrase: str) -> None:
+        self.session = session
+        self.api_url = api_url.rstrip('/')
+        self.key = key
+        self.secret = base64.b64decode(b64secret)
+        self.passphrase = passphrase
+
+    def _auth_headers(self, method: str, path: str, body: str) -> dict:
+        timestamp = str(time.time())
+        message = (timestamp + method.upper() + path + body).encode('utf-8')
+        signature = hmac.new(self.secret, message, hashlib.sha256).digest()
+        return {
+            'Content-Type': 'Application/JSON',
+            'CB-ACCESS-SIGN': base64.b64encode(signature).decode('utf-8'),
+            'CB-ACCESS-TIMESTAMP': timestamp,
+            'CB-ACCESS-KEY': self.key,
+            'CB-ACCESS-PASSPHRASE': self.passphrase,
+        }
+
+    async def request(self, method: str, path: str, params: t.Optional[dict] = None,
+                      data: t.Optional[dict] = None) -> t.Tuple[t.Any, t.Mapping[str, str]]:
+        """Send a signed request.
+
+        Returns:
+            tuple: (decoded JSON response, response headers)
+        """
+        if params:
+            path = '{}?{}'.format(path, '&'.join(
+                '{}={}'.format(key, val) for key, val in params.items()))
+        body = json.dumps(data) if data is not None else ''
+        async with self.session.request(method, self.api_url + path, data=body or None,
+                headers=self._auth_headers(method, path, body)) as response:
+            # Error pages are not always JSON, let the decode error surface as transient
+            return (await response.json(content_type=None), response.headers)
+
+_SESSIONS = {}
+_VERIFIED = set()
+
+def get_session(api_url: str, pool_size: int = 10) -> aiohttp.ClientSession:
+    """Return the keep-alive session for api_url on the running event loop"""
+    loop = asyncio.get_running_loop()
+    key = (id(loop), api_url)
+    session = _SESSIONS.get(key)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=pool_size),
+            timeout=aiohttp.ClientTimeout(total=30))
+        _SESSIONS[key] = session
+    return session
+
+async def close_sessions() -> None:
+    """Close every session of the running event loop"""
+    loop_id = id(asyncio.get_running_loop())
+    for key in [key for key in _SESSIONS if key[0] == loop_id]:
+        await _SESSIONS.pop(key).close()
+
+class AsyncCoinbasePro(AsyncBaseExchange):
+    """asyncio CoinbasePro exchange"""
+    # pylint: disable=too-many-instance-attributes
+    # pylint: disable=no-member
+    def __init__(self, config: dict) -> None:
+        self.usd_decimal_places = 2
+        self.size_decimal_places = 8
+        self._feed = None
+        self._user_feed = None
+        super().__init__(config)
+
+    async def _rate_limit(self, private: bool = True) -> float:
+        if private:
+            bucket = get_bucket(key_bucket_name(self.key, 'private'), self.rate_limit_private,
+                self.rate_limit_private_burst, self.rate_limit_dir)
+        else:
+            bucket = get_bucket('public', self.rate_limit_public, self.rate_limit_public_burst,
+                self.rate_limit_dir)
+        waited = await bucket.acquire_async()
+        METRICS.rate_limited('private' if private else 'public', waited)
+        return waited
+
+    async def _call(self, name: str, method: str, path: str, params: t.Optional[dict] = None,
+                    data: t.Optional[dict] = None) -> t.Tuple[t.Any, t.Mapping[str, str]]:
+        """Send a request with rate limiting, retries of transient errors and a circuit breaker
+        per endpoint. name is the endpoint name (the matching cbpro client method), so breakers
+        are shared with the CoinbasePro module.
+        """
+        idempotent = not name in ORDER_METHODS
+        policy = RetryPolicy(self.retry_attempts, self.retry_backoff, self.retry_backoff_max)
+        breaker = get_breaker(name, self.circuit_threshold, self.circuit_reset_seconds)
+        attempt = 0
+        while 1:
+            breaker.allow()
+            await self._rate_limit(private=not name in PUBLIC_METHODS)
+            start = time.time()
+            try:
+                response, headers = await self.client.request(method, path, params, data)
+            except Exception as err:
+                METRICS.record('api.' + name, time.time() - start, error=True)
+                if not is_transient_async_error(err):
+                    breaker.success()
+                    raise
+                breaker.failure()
+                if attempt + 1 >= policy.attempts or \
+                        not is_transient_async_error(err, idempotent):
+                    raise
+                error = err
+            else:
+                METRICS.record('api.' + name, time.time() - start,
+                    error=isinstance(response, dict) and 'message' in response)
+                if not is_transient_response(response):
+                    breaker.success()
+                    return (response, headers)
+                breaker.failure()
+                if attempt + 1 >= policy.attempts or \
+                        not is_transient_response(response, idempotent):
+                    return (response, headers)
+                error = response['message']
+            delay = policy.delay(attempt)
+            METRICS.retry('api.' + name)
+            print('WARNING: exchange client {} error, retry {} in {:.2f}s: {}'.format(
+                name, attempt + 1, delay, error))
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _request(self, name: str, method: str, path: str, exception_to_raise,
+                       params: t.Optional[dict] = None, data: t.Optional[dict] = None) -> t.Any:
+        response, _ = await self._call(name, method, path, params, data)
+        _api_response_check(response, exception_to_raise)
+        return response
+
+    async def _hub_request(self, key: tuple, ttl: float, name: str, path: str,
+                           exception_to_raise) -> t.Any:
+        async def fetch():
+            return await self._request(name, 'GET', path, exception_to_raise)
+        return await ASYNC_HUB.fetch(key, ttl, fetch)
+
+    def _invalidate_wallet(self) -> None:
+        ASYNC_HUB.invalidate(('wallet', self.key))
+        ASYNC_HUB.invalidate(('accounts', self.key))
+
+    def _get_user_feed(self):
+        if not self.ws_user_channel:
+            return None
+        if self._user_feed is None:
+            self._user_feed = get_user_feed(self.ws_url, self.key, self.b64secret, self.passphrase)
+        self._user_feed.subscribe(self.pair)
+        return self._user_feed
+
+    def _track_order(self, response: dict) -> None:
+        self._invalidate_wallet()
+        feed = self._get_user_feed()
+        if feed is not None:
+            feed.track(response)
+
+    async def authenticate(self) -> AsyncClient:
+        self.client = AsyncClient(get_session(self.api_url, self.http_pool_size), self.api_url,
+            self.key, self.b64secret, self.passphrase)
+        # Once per API key per process, the response also primes the wallet
+        if not (self.api_url, self.key) in _VERIFIED:
+            await ASYNC_HUB.fetch(('accounts', self.key), self.hub_ttl_accounts,
+                lambda: self._request('get_accounts', 'GET', '/accounts', ExchangeAuthError))
+            _VERIFIED.add((self.api_url, self.key))
+        return self.client
+
+    async def get_price(self) -> Decimal:
+        if self.ws_enable:
+            if self._feed is None:
+                self._feed = get_ticker_feed(self.ws_url)
+            self._feed.subscribe(self.pair)
+            price = self._feed.get_price(self.pair, self.ws_stale_seconds)
+            if price is not None:
+                return price
+        ticker = await self._hub_request(('ticker', self.api_url, self.pair),
+            self.hub_ttl_ticker, 'get_product_ticker', '/products/{}/ticker'.format(self.pair),
+            ExchangeError)
+        return Decimal(ticker['price'])
+
+    async def watch_price(self) -> Decimal:
+        return await self.get_price()
+
+    async def get_product_info(self) -> ProductInfo:
+        async def fetch():
+            products = await self._request('get_products', 'GET', '/products',
+                ExchangeProductInfoError)
+            return {product['id']: ProductInfo(product) for product in products}
+        products = await ASYNC_HUB.fetch(('products', self.api_url), self.catalog_refresh_seconds,
+            fetch)
+        product_info = products.get(self.pair)
+        assert product_info is not None, 'Product info must be set.'
+        return product_info
+
+    async def get_precisions(self) -> tuple:
+        product_info = await self.get_product_info()
+        self.size_decimal_places = product_info.size_decimal_places
+        self.usd_decimal_places = product_info.usd_decimal_places
+        return (self.size_decimal_places, self.usd_decimal_places)
+
+    async def get_usd_wallet(self) -> Decimal:
+        async def fetch():
+            accounts = await self._hub_request(('accounts', self.key), self.hub_ttl_accounts,
+                'get_accounts', '/accounts', ExchangeWalletError)
+            for account in accounts:
+                if account['currency'] == 'USD':
+                    return Decimal(account['available'])
+            raise ExchangeWalletError('USD wallet was not found.')
+        # Per API key, so an order of any bot sharing the key drops it for all of them
+        return await ASYNC_HUB.fetch(('wallet', self.key), self.cache_ttl_wallet, fetch)
+
+    async def _list_orders(self, params: dict) -> t.List[dict]:
+        """Fetch every page of the orders listing"""
+        orders = []
+        params = dict(params)
+        while 1:
+            page, headers = await self._call('get_orders', 'GET', '/orders', params)
+            _api_response_check(page, ExchangeGetOrdersError)
+            orders.extend(page)
+            if not page or not headers.get('cb-after'):
+                return orders
+            params['after'] = headers['cb-after']
+
+    async def get_open_sells(self) -> t.List[t.Mapping[str, Decimal]]:
+        open_sells = []
+        for order in await self._list_orders({'status': 'open', 'product_id': self.pair}):
+            if order['side'] == 'sell':
+                order['price'] = Decimal(order['price'])
+                order['size'] = Decimal(order['size'])
+                open_sells.append(order)
+        return open_sells
+
+    async def get_open_orders(self) -> t.Dict[str, dict]:
+        async def fetch():
+            orders = await self._list_orders({'status': 'open'})
+            return {order['id']: order for order in orders}
+        return await ASYNC_HUB.fetch(('open_orders', self.key), self.hub_ttl_open_orders, fetch)
+
+    async def get_fees(self) -> t.Tuple[Decimal, Decimal, Decimal]:
+        fees = await self._hub_request(('fees', self.key), self.hub_ttl_fees, '_send_message',
+            '/fees', ExchangeFeesError)
+        return (Decimal(fees['maker_fee_rate']), Decimal(fees['taker_fee_rate']),
+                Decimal(fees['usd_volume']))
+
+    async def _place(self, name: str, order: dict, exception_to_raise) -> dict:
+        order['product_id'] = self.pair
+        response = await self._request(name, 'POST', '/orders', exception_to_raise, data=order)
+        self._track_order(response)
+        return response
+
+    async def buy_limit(self, price: Decimal, size: Decimal) -> dict:
+        return await self._place('place_limit_order', {
+            'side': 'buy', 'type': 'limit',
+            'price': str(round(Decimal(price), self.usd_decimal_places)),
+            'size': str(round(Decimal(size), self.size_decimal_places)),
+        }, ExchangeBuyLimitError)
+
+    async def buy_market(self, funds: Decimal) -> dict:
+        funds = str(round(Decimal(funds), self.usd_decimal_places))
+        self.logit('buy_market: funds:{}'.format(funds))
+        return await self._place('place_market_order', {
+            'side': 'buy', 'type': 'market', 'funds': funds,
+        }, ExchangeBuyMarketError)
+
+    async def sell_limit(self, price: Decimal, size: Decimal) -> dict:
+        fixed_price = str(round(Decimal(price), self.usd_decimal_places))
+        fixed_size = str(round(Decimal(size), self.size_decimal_places))
+        self.logit('sell_limit: price:{} size:{}'.format(fixed_price, fixed_size))
+        return await self._place('place_limit_order', {
+            'side': 'sell', 'type': 'limit', 'price': fixed_price, 'size': fixed_size,
+        }, ExchangeSellLimitError)
+
+    async def sell_market(self, size: Decimal) -> dict:
+        fixed_size = str(round(Decimal(size), self.size_decimal_places))
+        self.logit('sell_market: size:{}'.format(fixed_size))
+        return await self._place('place_market_order', {
+            'side': 'sell', 'type': 'market', 'size': fixed_size,
+        }, ExchangeSellMarketError)
+
+    async def cancel(self, order_id: str) -> bool:
+        response = await self._request('cancel_order', 'DELETE', '/orders/{}'.format(order_id),
+            ExchangeCancelError)
+        self._invalidate_wallet()
+        return response
+
+    async def get_order(self, order_id: str) -> dict:
+        feed = self._get_user_feed()
+        if feed is not None:
+            # No waiting here, it would block the event loop
+            response = feed.get_order(order_id)
+            if response is not None:
+                if response.get('settled'):
+                    self._invalidate_wallet()
+                return response
+        response = await self._request('get_order', 'GET', '/orders/{}'.format(order_id),
+            ExchangeGetOrdersError)
+        if response.get('settled'):
+            self._invalidate_wallet()
+        if feed is not None:
+            feed.track(response)
+        return response
+
+    async def get_hold_value(self) -> Decimal:
+        return Decimal(-1)
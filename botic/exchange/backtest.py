@@ -6,16 +6,47 @@
 """
 import sys
 import time
+import heapq
 import typing as t
-import gzip
 import datetime
 import uuid
-import decimal
-from pkgutil import get_data
+from ..util import getconf
+from ..clock import VirtualClock
 from .base import BaseExchange, ProductInfo, Decimal
+from .candles import get_candle_store
+
+# TODO: Track volume and adjust fees according to;
+# https://help.coinbase.com/en/pro/trading-and-funding/trading-rules-and-fees/fees
+# Shared by every backtest, also read by the vectorized backtest
+MAKER_FEE = Decimal('0.0010')
+TAKER_FEE = Decimal('0.0020')
+START_WALLET = Decimal('10000.00')
+
+PRODUCT_INFO_CONFIG = {
+    'id':'BTC-USD',
+    'display_name':'BTC/USD',
+    'base_currency':'BTC',
+    'quote_currency':'USD',
+    'base_increment':Decimal('0.00000001'),
+    'quote_increment':Decimal('0.01000000'),
+    'base_min_size':Decimal('0.00100000'),
+    'base_max_size':Decimal('280.00000000'),
+    'min_market_funds':30,
+    'max_market_funds':1000000,
+    'status':'online',
+    'status_message':'',
+    'cancel_only':False,
+    'limit_only':False,
+    'post_only':False,
+    'trading_disabled':False,
+    'fx_stablecoin':False,
+    'margin_enabled':False,
+}
 
 class Backtest(BaseExchange):
     """Backtest"""
+    # No API calls to measure, and the per-call overhead would slow down long backtests
+    instrument_methods = False
     # pylint: disable=too-many-instance-attributes
     # pylint: disable=no-member
     def __init__(self, config: dict) -> None:
@@ -23,149 +54,117 @@ class Backtest(BaseExchange):
         self.usd_decimal_places = 2
         self.size_decimal_places = 8
         self._last_call = time.time()
-        self._wallet = Decimal('10000.00')
+        self._wallet = START_WALLET
         self._coins = Decimal('0.0')
+        # Every order ever placed. Open sells are also in _open_sells and, by price, in
+        # _sell_book: a min-heap of (price, seq, order_id). Cancelled orders leave stale heap
+        # entries that are skipped when they reach the top, or dropped by _compact_sell_book().
         self._orders = {}
+        self._open_sells = {}
+        self._sell_book = []
+        self._sell_seq = 0
         self._last_price = None
-        self._maker_fee = Decimal('0.0010')
-        self._taker_fee = Decimal('0.0020')
+        self._maker_fee = MAKER_FEE
+        self._taker_fee = TAKER_FEE
         self._adjusted_time = 0.0
+        # Sleeping (scheduler, traders) advances the replayed time instead of waiting
+        self.clock = VirtualClock(self.get_time)
 
-        # TODO: Track volume and adjust fees according to;
-        # https://help.coinbase.com/en/pro/trading-and-funding/trading-rules-and-fees/fees
-        self._product_info_config = {
-            'id':'BTC-USD',
-            'display_name':'BTC/USD',
-            'base_currency':'BTC',
-            'quote_currency':'USD',
-            'base_increment':Decimal('0.00000001'),
-            'quote_increment':Decimal('0.01000000'),
-            'base_min_size':Decimal('0.00100000'),
-            'base_max_size':Decimal('280.00000000'),
-            'min_market_funds':30,
-            'max_market_funds':1000000,
-            'status':'online',
-            'status_message':'',
-            'cancel_only':False,
-            'limit_only':False,
-            'post_only':False,
-            'trading_disabled':False,
-            'fx_stablecoin':False,
-            'margin_enabled':False,
-        }
+        self._product_info_config = PRODUCT_INFO_CONFIG
+        self._product_info = ProductInfo(self._product_info_config)
         #if self.pair != 'BTC-USD':
         #    raise Exception('Currently only handles BTC-USD')
-        gdata = get_data('botic', 'data/historical-btc.csv.gz')
-        self._data = gzip.decompress(gdata).decode("utf-8").split('\n')
-        self._data_pos = 1
-        self._data_buf = []
-        self._data_buf_idx = 0
-        #"timestamp","low","high","open","close","volume"
-
-    def _prepare_candle(self):
-        """
-        Convert data frame/candle to a list with filled in points between:
-            open -> low/high -> close
-        Currently tries something like:
-            open -> (open+low)/2 -> (open+low+high)/3 -> high -> (close+low+high)/3 -> close
-        """
-        try:
-            data = self._data[self._data_pos].replace('"', '').split(',')
-            tstamp, low, high, x_open, x_close, volume  = [Decimal(i) for i in data]
-        except decimal.InvalidOperation:
-            self.logit('Backtest has ended. No more data.')
-            sys.exit(0)
-
-        if float(tstamp) < self._adjusted_time:
-            raise Exception('Time went backwards: tstamp:{} was:{}'.format(
-                tstamp, self._adjusted_time))
-
-        self._adjusted_time = float(tstamp)
-        # for a check of date
-        self._time2datetime()
-        #self.adjusted_time = datetime.datetime.fromtimestamp(tstamp)
-        self._data_pos += 1
-        self._data_buf = []
-        open_low = round((x_open+low)/2, 2)
-        open_low_high = round((x_open+low+high)/3, 2)
-        close_low_high = round((x_close+low+high)/3, 2)
-        self._data_buf.append(x_open)
-        if not open_low in self._data_buf:
-            self._data_buf.append(open_low)
-        if not open_low_high in self._data_buf:
-            self._data_buf.append(open_low_high)
-        if not high in self._data_buf:
-            self._data_buf.append(high)
-        if not close_low_high in self._data_buf:
-            self._data_buf.append(close_low_high)
-        if not x_close in self._data_buf:
-            self._data_buf.append(x_close)
-        self._data_buf_idx = 0
+        # Parsed once per process, a tick only moves the position in the precomputed price path
+        candles = getconf(config, 'exchange', 'backtest_candles', str, '')
+        self._candles = get_candle_store(candles or None)
+        self._path_pos = 0
+        self._fast_forward = None
 
     def authenticate(self):
         return None
 
+    def fast_forward(self, low: t.Optional[Decimal], high: t.Optional[Decimal],
+                     not_after: t.Optional[float]) -> None:
+        """Skip the price path points where nothing can happen on the next get_price(). The
+        skipped points can not fill a sell as long as high is at most the lowest open sell.
+        """
+        self._fast_forward = (low, high, not_after)
+
     def get_price(self) -> Decimal:
-        if not self._data_buf:
-            self._prepare_candle()
-        price = self._data_buf[self._data_buf_idx]
-        self._data_buf_idx += 1
-        if self._data_buf_idx >= len(self._data_buf):
-            self._prepare_candle()
-        self._last_price = Decimal(price)
+        if self._fast_forward is not None:
+            self._path_pos = self._candles.next_event(self._path_pos, *self._fast_forward)
+            self._fast_forward = None
+        pos = self._path_pos
+        self._path_pos += 1
+        if self._path_pos >= len(self._candles.path):
+            self.logit('Backtest has ended. No more data.')
+            sys.exit(0)
+        # The clock is at the candle of the next point, i.e. it moves on after a candle's close
+        self._adjusted_time = float(
+            self._candles.timestamp[self._candles.path_candle[self._path_pos]])
+        self._last_price = self._candles.price(pos)
         self._settle_trades()
         #self._adjusted_time += 1
         return self._last_price
 
     def _settle_trades(self):
-        """Settle trades
+        """Settle trades. Only the open sells priced at or below the latest price are touched.
         TODO: settle limit buys
         """
-        for order_id, val in self._orders.items():
-            if val['side'] == 'sell' and val['status'] == 'open':
-                price = Decimal(val['price'])
-                size = Decimal(val['size'])
-                # Sell was filled if latest price is >=
-                if price <= self._last_price:
-                    val['status'] = 'done'
-                    val['done_at'] = self._time2datetime().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-                    val['done_reason'] = 'filled'
-                    usd_used = size*price
-                    fees = round(usd_used * self._maker_fee, 12)
-                    executed_value = usd_used - fees
-                    self._wallet += executed_value
-                    val['executed_value'] = str(executed_value)
-                    val['fill_fees'] = str(fees)
-                    val['settled'] = True
-                    self._coins -= Decimal(size)
-                    assert self._coins > Decimal(0.0)
-                    print('exchange-settled: {} last_price:{} -> order:{} / {}'.format(
-                        val['id'], self._last_price, price, size))
+        book = self._sell_book
+        # Sell was filled if latest price is >=
+        while book and book[0][0] <= self._last_price:
+            price, _, order_id = heapq.heappop(book)
+            val = self._open_sells.pop(order_id, None)
+            if val is None:
+                # Cancelled
+                continue
+            size = Decimal(val['size'])
+            val['status'] = 'done'
+            val['done_at'] = self._time2datetime().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            val['done_reason'] = 'filled'
+            usd_used = size*price
+            fees = round(usd_used * self._maker_fee, 12)
+            executed_value = usd_used - fees
+            self._wallet += executed_value
+            val['executed_value'] = str(executed_value)
+            val['fill_fees'] = str(fees)
+            val['settled'] = True
+            self._coins -= Decimal(size)
+            # Zero when the last open sell fills
+            assert self._coins >= Decimal(0.0)
+            print('exchange-settled: {} last_price:{} -> order:{} / {}'.format(
+                val['id'], self._last_price, price, size))
 
     def get_precisions(self) -> ProductInfo:
-        product_info = self.get_product_info()
-        base_increment = '%.12f' % (product_info.base_increment)
-        quote_increment = '%.12f' % (product_info.quote_increment)
-        self.size_decimal_places = base_increment.split('1')[0].count('0')
-        self.usd_decimal_places = quote_increment.split('1')[0].count('0')
+        self.size_decimal_places = self._product_info.size_decimal_places
+        self.usd_decimal_places = self._product_info.usd_decimal_places
         return (self.size_decimal_places, self.usd_decimal_places)
 
     def get_product_info(self) -> ProductInfo:
-        product_info = ProductInfo(self._product_info_config)
-        return product_info
+        return self._product_info
 
     def get_usd_wallet(self) -> Decimal:
         return self._wallet
 
+    def _compact_sell_book(self) -> None:
+        """Rebuild the sell book from the open sells, dropping the entries of cancelled orders"""
+        open_sells = self._open_sells
+        self._sell_book = [entry for entry in self._sell_book if entry[2] in open_sells]
+        heapq.heapify(self._sell_book)
+
     def get_open_sells(self) -> t.List[t.Mapping[str, Decimal]]:
         sells = []
-        for _, val in self._orders.items():
-            if val['side'] == 'sell' and val['status'] == 'open':
-                val['price'] = Decimal(val['price'])
-                val['size'] = Decimal(val['size'])
-                sells.append(val)
+        for _, val in self._open_sells.items():
+            val['price'] = Decimal(val['price'])
+            val['size'] = Decimal(val['size'])
+            sells.append(val)
         return sells
 
+    def get_open_orders(self) -> t.Dict[str, dict]:
+        # Buys are market orders that are done right away, only sells can be open
+        return dict(self._open_sells)
+
     def get_fees(self) -> t.Tuple[Decimal, Decimal, Decimal]:
         return (self._maker_fee, self._taker_fee, Decimal('1'))
 
@@ -232,6 +231,9 @@ class Backtest(BaseExchange):
             'type': 'limit'
         }
         self._orders[uid] = response
+        self._open_sells[uid] = response
+        self._sell_seq += 1
+        heapq.heappush(self._sell_book, (Decimal(fixed_price), self._sell_seq, uid))
         return response
 
     def sell_market(self, size: Decimal) -> dict:
@@ -270,6 +272,10 @@ class Backtest(BaseExchange):
         if self._orders[order_id]['status'] == 'open':
             self._orders[order_id]['status'] = 'cancel'
             self._orders[order_id]['settled'] = True
+            self._open_sells.pop(order_id, None)
+            # Stoplosses cancel sells above the price, which may never reach the top of the book
+            if len(self._sell_book) > 2 * len(self._open_sells):
+                self._compact_sell_book()
         return self._orders[order_id]
 
     def get_order(self, order_id: str) -> dict:
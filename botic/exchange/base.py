@@ -4,6 +4,16 @@ from decimal import Decimal
 import typing as t
 from abc import abstractmethod
 from ..basebot import BaseBot
+from ..metrics import instrument_class
+
+# Exchange methods recorded in METRICS (per exchange class)
+INSTRUMENTED_METHODS = ('get_price', 'watch_price', 'get_product_info', 'get_precisions',
+    'get_usd_wallet', 'get_open_sells', 'get_open_orders', 'get_fees', 'buy_limit', 'buy_market',
+    'sell_limit', 'sell_market', 'cancel', 'get_order', 'get_hold_value')
+
+def decimal_places(increment: Decimal) -> int:
+    """Return how many decimal places an increment allows (e.g. 0.01 -> 2)"""
+    return ('%.12f' % (increment)).split('1')[0].count('0')
 
 class ProductInfo: # pylint: disable=too-few-public-methods
     """Crypto product information class that stores some important information for making buy/sell
@@ -31,6 +41,8 @@ class ProductInfo: # pylint: disable=too-few-public-methods
         limit_only (bool): indicates whether this product only accepts limit orders.
         trading_disabled (bool): indicates whether trading is currently restricted on this product,
             this includes whether both new orders and order cancelations are restricted.
+        size_decimal_places (int): Decimal places allowed in an order size (from base_increment)
+        usd_decimal_places (int): Decimal places allowed in an order price (from quote_increment)
     """
     # pylint: disable=too-many-instance-attributes
     def __init__(self, product_info: dict) -> None:
@@ -72,6 +84,8 @@ class ProductInfo: # pylint: disable=too-few-public-methods
         self.trading_disabled = False
         self.fx_stablecoin = False
         self.margin_enabled = False
+        self.size_decimal_places = None
+        self.usd_decimal_places = None
         self.digest()
 
     def	digest(self) -> None:
@@ -85,6 +99,8 @@ class ProductInfo: # pylint: disable=too-few-public-methods
             except Exception as err:
                 # Fallback for missing self.config keys
                 setattr(self, key, val)
+        self.size_decimal_places = decimal_places(self.base_increment)
+        self.usd_decimal_places = decimal_places(self.quote_increment)
 
 class BaseExchange(BaseBot):
     """Base class of abstractmethods to implement for each exchange. It is important to note that
@@ -96,6 +112,14 @@ class BaseExchange(BaseBot):
     Attributes:
         config (dict): Dict of parsed yaml file config_path
     """
+    # Record calls and latency of the exchange methods in METRICS
+    instrument_methods = True
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        if cls.instrument_methods:
+            instrument_class(cls, INSTRUMENTED_METHODS)
+
     def __init__(self, config: dict) -> None:
         super().__init__(config)
         self.client = None
@@ -173,6 +197,20 @@ class BaseExchange(BaseBot):
             Example API: https://docs.pro.coinbase.com/#orders
         """
 
+    def get_open_orders(self) -> t.Optional[t.Dict[str, dict]]:
+        """Optional override: List every open order on the account (all pairs and sides) with
+        one request, so traders can reconcile their open orders in bulk and only call get_order()
+        for orders that are no longer open.
+
+        Returns:
+            dict: {order_id: order}, or None if the exchange does not support listing
+
+        Raises:
+            ExchangeGetOrdersError
+        """
+        # pylint: disable=no-self-use
+        return None
+
     @abstractmethod
     def get_fees(self) -> t.Tuple[Decimal, Decimal]:
         """Get current maker and taker fees and optionally USD volume
@@ -313,3 +351,21 @@ class BaseExchange(BaseBot):
         """
         # pylint: disable=no-self-use
         return time.time()
+
+    def fast_forward(self, low: t.Optional[Decimal], high: t.Optional[Decimal],
+                     not_after: t.Optional[float]) -> None:
+        """Optional override: Simulated exchanges can jump ahead on the next get_price() to the
+        first price <= low or >= high, or the time not_after (see BaseTrader.price_thresholds).
+        Live exchanges ignore it.
+        """
+
+    def watch_price(self) -> t.Optional[Decimal]:
+        """Optional override: Return the latest price without side effects, for the price watcher
+        that wakes traders when one of their price thresholds is crossed. This should be cheap
+        (e.g. shared or cached between bots).
+
+        Returns:
+            Decimal: The latest price, or None if the exchange does not support watching
+        """
+        # pylint: disable=no-self-use
+        return None
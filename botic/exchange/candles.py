@@ -0,0 +1,367 @@
+"""Columnar candle store for backtesting
+
+Candles are parsed once into NumPy arrays (timestamp, low, high, open, close, volume) and the
+intra-candle price path Backtest replays is precomputed as one array, so a backtest tick is an
+index increment instead of parsing a CSV line into Decimals. Prices are kept as integers in units
+of the quote increment (e.g. cents), which makes the path rounding exact.
+
+Stores can be saved in a binary format that is memory-mapped on load, so startup does not parse
+anything and concurrent backtests share the page cache. Layout (little endian):
+
+    header (64 bytes): magic "BOTICNDL", version (u16), decimals (u16), granularity (u32),
+                       pair (16 bytes, NUL padded), candles (u64), path points (u64),
+                       first timestamp (i64), last timestamp (i64)
+    columns:           timestamp, low, high, open, close (i64), volume (f64), one block each
+    path:              path points (i64), then the candle index of every point (i64)
+
+Convert the CSV layout with:
+
+    boticcandles convert historical-btc.csv.gz btc-usd.candles --pair BTC-USD
+"""
+import io
+import os
+import sys
+import gzip
+import struct
+import math
+import argparse
+import datetime
+import threading
+import typing as t
+from decimal import Decimal
+from pkgutil import get_data
+import numpy as np
+
+# Bundled with the package, see historicaldata.py for how it is generated
+DEFAULT_CANDLES = 'data/historical-btc.csv.gz'
+
+MAGIC = b'BOTICNDL'
+VERSION = 1
+HEADER = struct.Struct('<8sHHI16sQQqq')
+COLUMNS = (('timestamp', np.int64), ('low', np.int64), ('high', np.int64), ('open', np.int64),
+           ('close', np.int64), ('volume', np.float64))
+# Elements per block of each level of the path min/max index
+INDEX_FANOUT = 64
+# Larger than any price
+NO_HIGH = np.iinfo(np.int64).max
+
+def _div_round(num: np.ndarray, den: int) -> np.ndarray:
+    """Integer division rounded half to even, like round(Decimal, n)"""
+    quot, rem = np.divmod(num, den)
+    twice = rem * 2
+    return quot + ((twice > den) | ((twice == den) & (quot % 2 == 1)))
+
+class CandleStore:
+    """Candles as columnar arrays, plus the intra-candle price path:
+        open -> (open+low)/2 -> (open+low+high)/3 -> high -> (close+low+high)/3 -> close
+    Points equal to an earlier point of the same candle are skipped.
+
+    Args:
+        timestamp (np.ndarray): Candle start times (int64 epoch seconds)
+        low, high, open, close (np.ndarray): Prices (int64, in units of 10**-decimals)
+        volume (np.ndarray): Volumes (float64)
+        decimals (int): Quote decimal places of the prices
+        path, path_candle (np.ndarray): Precomputed price path (built from the candles when not
+            given)
+        pair (str): Product id, if known
+        granularity (int): Seconds per candle, if known
+
+    Attributes:
+        path (np.ndarray): Price path points (int64, in units of 10**-decimals)
+        path_candle (np.ndarray): Candle index of each path point
+    """
+    # pylint: disable=too-many-instance-attributes,too-many-arguments,redefined-builtin
+    def __init__(self, timestamp: np.ndarray, low: np.ndarray, high: np.ndarray,
+                 open: np.ndarray, close: np.ndarray, volume: np.ndarray,
+                 decimals: int = 2, path: t.Optional[np.ndarray] = None,
+                 path_candle: t.Optional[np.ndarray] = None, pair: str = '',
+                 granularity: int = 0) -> None:
+        self.timestamp = timestamp
+        self.low = low
+        self.high = high
+        self.open = open
+        self.close = close
+        self.volume = volume
+        self.decimals = decimals
+        self.pair = pair
+        self.granularity = granularity
+        self._index = None
+        if path is not None:
+            # Already validated when it was saved
+            self.path, self.path_candle = path, path_candle
+            return
+        if len(timestamp) > 1 and np.any(np.diff(timestamp) < 0):
+            idx = int(np.argmax(np.diff(timestamp) < 0)) + 1
+            raise Exception('Time went backwards: tstamp:{} was:{}'.format(
+                timestamp[idx], timestamp[idx - 1]))
+        self.path, self.path_candle = self._build_path()
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def _build_path(self) -> t.Tuple[np.ndarray, np.ndarray]:
+        points = np.stack([
+            self.open,
+            _div_round(self.open + self.low, 2),
+            _div_round(self.open + self.low + self.high, 3),
+            self.high,
+            _div_round(self.close + self.low + self.high, 3),
+            self.close,
+        ], axis=1)
+        keep = np.ones(points.shape, dtype=bool)
+        for col in range(1, points.shape[1]):
+            for prev in range(col):
+                keep[:, col] &= points[:, col] != points[:, prev]
+        path = points[keep]
+        path_candle = np.repeat(np.arange(len(points), dtype=np.int64), keep.sum(axis=1))
+        return path, path_candle
+
+    def _build_index(self) -> t.List[t.Tuple[np.ndarray, np.ndarray]]:
+        """Block min/max levels over the path, each INDEX_FANOUT times smaller than the last"""
+        levels = []
+        mins = maxs = self.path
+        while len(mins) > INDEX_FANOUT:
+            pad = (-len(mins)) % INDEX_FANOUT
+            if pad:
+                mins = np.concatenate([mins, np.full(pad, NO_HIGH, dtype=np.int64)])
+                maxs = np.concatenate([maxs, np.full(pad, -1, dtype=np.int64)])
+            mins = mins.reshape(-1, INDEX_FANOUT).min(axis=1)
+            maxs = maxs.reshape(-1, INDEX_FANOUT).max(axis=1)
+            levels.append((mins, maxs))
+        return levels
+
+    def find_cross(self, start: int, low: int, high: int,
+                   end: t.Optional[int] = None) -> t.Optional[int]:
+        """First path point at or after start that is <= low or >= high (integer prices of this
+        store, use -1/NO_HIGH for no bound). Walks up the min/max index until a block crosses and
+        back down, so long inert stretches cost a few small array scans.
+
+        Returns:
+            int: The path index, or None if no point before end crosses
+        """
+        # pylint: disable=too-many-locals
+        end = len(self.path) if end is None else min(end, len(self.path))
+        if start >= end:
+            return None
+        if self._index is None:
+            self._index = self._build_index()
+        levels = [(self.path, self.path)] + self._index
+
+        def first_hit(level, lo, hi):
+            mins, maxs = levels[level]
+            hits = np.flatnonzero((mins[lo:hi] <= low) | (maxs[lo:hi] >= high))
+            return lo + int(hits[0]) if len(hits) else None
+
+        pos = start
+        level = 0
+        while 1:
+            size = len(levels[level][0])
+            block_end = min(size, (pos // INDEX_FANOUT + 1) * INDEX_FANOUT)
+            found = first_hit(level, pos, block_end)
+            if found is not None:
+                break
+            if block_end >= size or level == len(levels) - 1:
+                return None
+            pos = block_end // INDEX_FANOUT
+            level += 1
+        while level > 0:
+            level -= 1
+            child = found * INDEX_FANOUT
+            found = first_hit(level, child, min(child + INDEX_FANOUT, len(levels[level][0])))
+        return found if found < end else None
+
+    def next_event(self, pos: int, low: t.Optional[Decimal], high: t.Optional[Decimal],
+                   not_after: t.Optional[float]) -> int:
+        """First path point at or after pos with a price <= low or >= high, or where Backtest's
+        time reaches not_after (the time of a point is the candle of the point after it). Any
+        bound can be None.
+
+        Returns:
+            int: The path index, the last point when nothing happens before the end
+        """
+        last = len(self.path) - 1
+        low_value = -1 if low is None else math.floor(Decimal(low).scaleb(self.decimals))
+        high_value = NO_HIGH if high is None else math.ceil(Decimal(high).scaleb(self.decimals))
+        if not_after is not None:
+            candle = int(np.searchsorted(self.timestamp, not_after, side='left'))
+            point = int(np.searchsorted(self.path_candle, candle, side='left'))
+            last = max(pos, min(last, point - 1))
+        found = self.find_cross(pos, low_value, high_value, end=last)
+        return last if found is None else found
+
+    def to_decimal(self, value: int) -> Decimal:
+        """Convert an integer price of this store to a Decimal"""
+        return Decimal(int(value)).scaleb(-self.decimals)
+
+    def price(self, pos: int) -> Decimal:
+        """Path point pos as a Decimal"""
+        return self.to_decimal(self.path[pos])
+
+    @classmethod
+    def from_csv(cls, csv_text: str, decimals: t.Optional[int] = None) -> 'CandleStore':
+        """Parse the historical CSV layout:
+            "timestamp","low","high","open","close","volume"
+
+        Args:
+            csv_text (str): The CSV
+            decimals (int): Quote decimal places of the prices. Default: the most decimal places
+                of any price in the CSV.
+
+        Raises:
+            ValueError: A price has more decimal places than decimals
+        """
+        text = np.loadtxt(io.StringIO(csv_text.replace('"', '')), delimiter=',', skiprows=1,
+                          dtype=str, ndmin=2)
+        csv_decimals = price_decimals(text[:, 1:5])
+        if decimals is None:
+            decimals = csv_decimals
+        elif csv_decimals > decimals:
+            raise ValueError('Prices have {} decimal places, more than decimals={}'.format(
+                csv_decimals, decimals))
+        rows = text.astype(np.float64)
+        scale = 10 ** decimals
+        prices = [np.rint(rows[:, col] * scale).astype(np.int64) for col in (1, 2, 3, 4)]
+        return cls(rows[:, 0].astype(np.int64), *prices, rows[:, 5], decimals=decimals)
+
+    @classmethod
+    def from_file(cls, path: str, decimals: t.Optional[int] = None) -> 'CandleStore':
+        """Load a CSV file, gzipped when path ends with .gz"""
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt') as csv_fd:
+            return cls.from_csv(csv_fd.read(), decimals=decimals)
+
+    def save(self, path: str, pair: t.Optional[str] = None,
+             granularity: t.Optional[int] = None) -> None:
+        """Write the binary format (see the module docstring) to path"""
+        pair = self.pair if pair is None else pair
+        if granularity is None:
+            granularity = self.granularity or self.infer_granularity()
+        count = len(self)
+        header = HEADER.pack(MAGIC, VERSION, self.decimals, granularity,
+            pair.encode('utf-8')[:16], count, len(self.path),
+            int(self.timestamp[0]) if count else 0, int(self.timestamp[-1]) if count else 0)
+        with open(path + '-tmp', 'wb') as out_fd:
+            out_fd.write(header)
+            for name, dtype in COLUMNS:
+                out_fd.write(np.ascontiguousarray(getattr(self, name), dtype=dtype).tobytes())
+            out_fd.write(np.ascontiguousarray(self.path, dtype=np.int64).tobytes())
+            out_fd.write(np.ascontiguousarray(self.path_candle, dtype=np.int64).tobytes())
+        os.rename(path + '-tmp', path)
+
+    @classmethod
+    def load(cls, path: str) -> 'CandleStore':
+        """Memory-map a file in the binary format. Nothing is copied: the arrays are read-only
+        views of the file.
+        """
+        with open(path, 'rb') as in_fd:
+            header = read_header(in_fd.read(HEADER.size))
+        arrays = {}
+        offset = HEADER.size
+        sizes = [(name, dtype, header['candles']) for name, dtype in COLUMNS]
+        sizes += [('path', np.int64, header['path_points']),
+                  ('path_candle', np.int64, header['path_points'])]
+        for name, dtype, count in sizes:
+            if count:
+                # Plain ndarray views index faster than memmap objects
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=offset,
+                                         shape=(count,)).view(np.ndarray)
+            else:
+                arrays[name] = np.zeros(0, dtype=dtype)
+            offset += count * np.dtype(dtype).itemsize
+        return cls(decimals=header['decimals'], pair=header['pair'],
+                   granularity=header['granularity'], **arrays)
+
+    def infer_granularity(self) -> int:
+        """Most common interval between candles, in seconds"""
+        if len(self) < 2:
+            return 0
+        values, counts = np.unique(np.diff(self.timestamp), return_counts=True)
+        return int(values[np.argmax(counts)])
+
+def price_decimals(values: np.ndarray) -> int:
+    """Most decimal places of the price strings in values, ignoring trailing zeros"""
+    decimals = 0
+    for value in np.unique(values):
+        decimals = max(decimals, -Decimal(value).normalize().as_tuple().exponent)
+    return decimals
+
+def read_header(data: bytes) -> dict:
+    """Parse the header of the binary format"""
+    if len(data) < HEADER.size or data[:len(MAGIC)] != MAGIC:
+        raise ValueError('Not a botic candle file')
+    (_, version, decimals, granularity, pair, candles, path_points, start,
+     end) = HEADER.unpack(data[:HEADER.size])
+    if version != VERSION:
+        raise ValueError('Unsupported candle file version: {}'.format(version))
+    return {
+        'version': version, 'decimals': decimals, 'granularity': granularity,
+        'pair': pair.rstrip(b'\0').decode('utf-8'), 'candles': candles,
+        'path_points': path_points, 'start': start, 'end': end,
+    }
+
+def is_binary(path: str) -> bool:
+    """True if path is in the binary candle format"""
+    with open(path, 'rb') as in_fd:
+        return in_fd.read(len(MAGIC)) == MAGIC
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+def get_candle_store(path: t.Optional[str] = None) -> CandleStore:
+    """Return the process-wide CandleStore of path (the bundled BTC-USD history by default),
+    loading it on first use. Every backtest in the process shares the arrays. path is either a
+    binary candle file (memory-mapped) or a CSV(.gz).
+    """
+    with _STORES_LOCK:
+        store = _STORES.get(path)
+        if store is None:
+            if path is None:
+                gdata = get_data('botic', DEFAULT_CANDLES)
+                store = CandleStore.from_csv(gzip.decompress(gdata).decode('utf-8'))
+            elif is_binary(path):
+                store = CandleStore.load(path)
+            else:
+                store = CandleStore.from_file(path)
+            _STORES[path] = store
+        return store
+
+def _fmt_time(tstamp: int) -> str:
+    return datetime.datetime.utcfromtimestamp(tstamp).strftime('%Y-%m-%d %H:%M:%S')
+
+def main() -> None:
+    """Convert candle CSV files to the binary format and show file headers"""
+    parser = argparse.ArgumentParser(description='Botic candle files')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert = subparsers.add_parser('convert', help='Convert a candle CSV(.gz) to binary')
+    convert.add_argument('csv', help='"timestamp","low","high","open","close","volume" CSV')
+    convert.add_argument('output')
+    convert.add_argument('--pair', default='BTC-USD')
+    convert.add_argument('--granularity', type=int, default=0,
+        help='Seconds per candle (default: inferred from the timestamps)')
+    convert.add_argument('--decimals', type=int,
+        help='Quote decimal places (default: inferred from the prices)')
+    info = subparsers.add_parser('info', help='Show the header of a binary candle file')
+    info.add_argument('path')
+    args = parser.parse_args()
+    if args.command == 'convert':
+        try:
+            store = CandleStore.from_file(args.csv, decimals=args.decimals)
+        except ValueError as err:
+            print('ERROR: {}: {}'.format(args.csv, err))
+            sys.exit(1)
+        store.save(args.output, pair=args.pair, granularity=args.granularity or None)
+        path = args.output
+    else:
+        path = args.path
+    try:
+        with open(path, 'rb') as in_fd:
+            header = read_header(in_fd.read(HEADER.size))
+    except ValueError as err:
+        print('ERROR: {}: {}'.format(path, err))
+        sys.exit(1)
+    print('{}: {} {}s candles:{} path points:{} from {} to {} UTC'.format(
+        path, header['pair'], header['granularity'], header['candles'], header['path_points'],
+        _fmt_time(header['start']), _fmt_time(header['end'])))
+
+if __name__ == '__main__':
+    main()
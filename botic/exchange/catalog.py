@@ -0,0 +1,81 @@
+"""Product catalog shared by every exchange instance in the process
+
+The product list is fetched once, indexed by product id into digested ProductInfo objects and
+refreshed by a background thread, so looking up a pair is a dict lookup instead of an API call.
+"""
+import time
+import threading
+import typing as t
+from .base import ProductInfo
+
+class ProductCatalog:
+    """Indexed product list with background refresh.
+
+    Args:
+        fetch (callable): Returns the raw product list (a list of dicts with an 'id' key)
+        refresh_seconds (float): Seconds between background refreshes (0 = never refresh)
+        product_class (type): ProductInfo class used to digest each product
+    """
+    def __init__(self, fetch: t.Callable[[], t.List[dict]], refresh_seconds: float,
+                 product_class: type = ProductInfo) -> None:
+        self.fetch = fetch
+        self.refresh_seconds = refresh_seconds
+        self.product_class = product_class
+        self.products = {}
+        self.updated = 0.0
+        self.refreshes = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def load(self) -> None:
+        """Fetch and index the product list, replacing the current index"""
+        products = {}
+        for product in self.fetch():
+            products[product['id']] = self.product_class(product)
+        # Swap the whole index so readers never see a partial update
+        self.products = products
+        self.updated = time.time()
+        self.refreshes += 1
+
+    def get(self, product_id: str) -> t.Optional[ProductInfo]:
+        """Return the ProductInfo of product_id, loading the catalog on first use.
+
+        Returns:
+            ProductInfo: The product, or None if the exchange does not list it
+        """
+        if not self.updated:
+            with self._lock:
+                if not self.updated:
+                    self.load()
+                    self._start()
+        return self.products.get(product_id)
+
+    def _start(self) -> None:
+        if self.refresh_seconds <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._refresh_loop, name='botic-catalog', daemon=True)
+        self._thread.start()
+
+    def _refresh_loop(self) -> None:
+        while 1:
+            time.sleep(self.refresh_seconds)
+            try:
+                self.load()
+            except Exception as err:
+                # Keep serving the last good catalog
+                print('WARNING: product catalog refresh failed: {}'.format(err))
+
+_CATALOGS = {}
+_CATALOGS_LOCK = threading.Lock()
+
+def get_catalog(name: t.Hashable, fetch: t.Callable[[], t.List[dict]], refresh_seconds: float,
+                product_class: type = ProductInfo) -> ProductCatalog:
+    """Return the process-wide ProductCatalog for name (e.g. the exchange module name and API URL,
+    as sandbox and production list different products). fetch is only used by the instance that
+    creates the catalog.
+    """
+    with _CATALOGS_LOCK:
+        if not name in _CATALOGS:
+            _CATALOGS[name] = ProductCatalog(fetch, refresh_seconds, product_class)
+        return _CATALOGS[name]
@@ -0,0 +1,70 @@
+"""Registry of Coinbase Pro API clients shared by every exchange instance in the process
+
+Clients share one pooled keep-alive requests.Session per API URL, so requests reuse open TLS
+connections instead of each client (or each botictop lookup) opening its own. Authenticated
+clients are shared per API key and their credentials are checked once per process.
+"""
+import threading
+import typing as t
+import requests
+from requests.adapters import HTTPAdapter
+import cbpro
+
+DEFAULT_API_URL = 'https://api.pro.coinbase.com'
+
+_SESSIONS = {}
+_PUBLIC = {}
+_AUTHENTICATED = {}
+_VERIFIED = set()
+_LOCK = threading.RLock()
+
+def get_session(api_url: str = DEFAULT_API_URL, pool_size: int = 10) -> requests.Session:
+    """Return the shared keep-alive session for api_url"""
+    with _LOCK:
+        if not api_url in _SESSIONS:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _SESSIONS[api_url] = session
+        return _SESSIONS[api_url]
+
+def get_public_client(api_url: str = DEFAULT_API_URL, pool_size: int = 10) -> cbpro.PublicClient:
+    """Return the shared public client for api_url"""
+    with _LOCK:
+        if not api_url in _PUBLIC:
+            client = cbpro.PublicClient(api_url=api_url)
+            client.session = get_session(api_url, pool_size)
+            _PUBLIC[api_url] = client
+        return _PUBLIC[api_url]
+
+def get_authenticated_client(key: str, b64secret: str, passphrase: str,
+                             api_url: str = DEFAULT_API_URL, pool_size: int = 10,
+                             verify: t.Optional[t.Callable[[cbpro.AuthenticatedClient], None]] = None
+                             ) -> cbpro.AuthenticatedClient:
+    """Return the shared authenticated client for an API key.
+
+    Args:
+        key (str): API key
+        b64secret (str): Base64 encoded API secret
+        passphrase (str): API passphrase
+        api_url (str): API URL
+        pool_size (int): Max keep-alive connections of the shared session
+        verify (callable): Called with the client the first time a key is used in this process
+            and expected to raise if the credentials are invalid. A failed check is retried on
+            the next call.
+
+    Returns:
+        cbpro.AuthenticatedClient: The shared client
+    """
+    registry_key = (api_url, key, b64secret, passphrase)
+    with _LOCK:
+        client = _AUTHENTICATED.get(registry_key)
+        if client is None:
+            client = cbpro.AuthenticatedClient(key, b64secret, passphrase, api_url=api_url)
+            client.session = get_session(api_url, pool_size)
+            _AUTHENTICATED[registry_key] = client
+        if verify is not None and not registry_key in _VERIFIED:
+            verify(client)
+            _VERIFIED.add(registry_key)
+        return client
@@ -1,6 +1,5 @@
 """CoinbasePro exchange module"""
 import time
-from random import uniform
 import typing as t
 import cbpro
 from .exceptions import ExchangeError, ExchangeGetOrdersError, ExchangeAuthError
@@ -8,6 +7,22 @@ from .exceptions import ExchangeBuyLimitError, ExchangeBuyMarketError, ExchangeS
 from .exceptions import ExchangeSellMarketError, ExchangeProductInfoError, ExchangeCancelError
 from .exceptions import ExchangeFeesError, ExchangeWalletError
 from .base import BaseExchange, ProductInfo, Decimal
+from ..metrics import METRICS
+from .hub import HUB
+from .ratelimit import get_bucket, key_bucket_name
+from .feed import get_ticker_feed, get_user_feed
+from .catalog import get_catalog
+from .clients import get_authenticated_client
+from .retry import RetryPolicy, get_breaker, is_transient_error, is_transient_response
+
+# Client methods that hit public endpoints (rate limited per IP, not per API key)
+PUBLIC_METHODS = ('get_products', 'get_product_ticker', 'get_product_order_book',
+    'get_product_trades', 'get_product_historic_rates', 'get_product_24hr_stats',
+    'get_currencies', 'get_time')
+
+# Client methods that must not be repeated once the request may have reached the exchange
+ORDER_METHODS = ('place_limit_order', 'place_market_order', 'place_stop_order', 'place_order',
+    'buy', 'sell')
 
 def _api_response_check(response, exception_to_raise):
     """Raise exception_to_raise if API response contains 'message'. If response['message']
@@ -23,83 +38,204 @@ class CoinbasePro(BaseExchange):
     def __init__(self, config: dict) -> None:
         self.usd_decimal_places = 2
         self.size_decimal_places = 8
+        self._feed = None
+        self._user_feed = None
         super().__init__(config)
-        self._last_call = time.time()
-
-    def _rate_limit(self):
-        cur_time = time.time()
-        if cur_time - self._last_call < 3:
-            sleep_time = cur_time - self._last_call
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-            else:
-                time.sleep(2.1)
-        time.sleep(uniform(0.5, 1.5))
-        self._last_call = time.time()
+
+    def _rate_limit(self, private: bool = True) -> float:
+        """Wait for a token from the host-wide public or private (per API key) bucket.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        if private:
+            bucket = get_bucket(key_bucket_name(self.key, 'private'), self.rate_limit_private,
+                self.rate_limit_private_burst, self.rate_limit_dir)
+        else:
+            bucket = get_bucket('public', self.rate_limit_public, self.rate_limit_public_burst,
+                self.rate_limit_dir)
+        waited = bucket.acquire()
+        METRICS.rate_limited('private' if private else 'public', waited)
+        return waited
 
     def _wrap_client(self, method: str, *args, **kwargs):
-        self._rate_limit()
-        meth = getattr(self.client, method, None)
-        for error in range(12):
+        """Call a client method with rate limiting, retries of transient errors (exponential
+        backoff with jitter) and a per-endpoint circuit breaker.
+
+        Raises:
+            ExchangeCircuitOpenError: The endpoint has been failing, try again later
+        """
+        return self._wrap_call(method, getattr(self.client, method), *args, **kwargs)
+
+    def _wrap_call(self, method: str, meth: t.Callable, *args, **kwargs):
+        """_wrap_client() for any callable: method names the endpoint for rate limiting, retries,
+        the circuit breaker and metrics.
+        """
+        idempotent = not method in ORDER_METHODS
+        policy = RetryPolicy(self.retry_attempts, self.retry_backoff, self.retry_backoff_max)
+        breaker = get_breaker(method, self.circuit_threshold, self.circuit_reset_seconds)
+        attempt = 0
+        while 1:
+            breaker.allow()
+            self._rate_limit(private=not method in PUBLIC_METHODS)
+            # Transient errors count against the breaker even when the call can not be retried
+            start = time.time()
             try:
-                return meth(*args, **kwargs)
+                response = meth(*args, **kwargs)
             except Exception as err:
-                print('WARNING: exchange client error retry: {}'.format(err))
-                errors += 1
-                if error > 9:
+                METRICS.record('api.' + method, time.time() - start, error=True)
+                if not is_transient_error(err):
+                    # Not an exchange outage
+                    breaker.success()
+                    raise
+                breaker.failure()
+                if attempt + 1 >= policy.attempts or not is_transient_error(err, idempotent):
                     raise
-                time.sleep(5)
+                error = err
+            else:
+                METRICS.record('api.' + method, time.time() - start,
+                    error=isinstance(response, dict) and 'message' in response)
+                if not is_transient_response(response):
+                    breaker.success()
+                    return response
+                breaker.failure()
+                if attempt + 1 >= policy.attempts or \
+                        not is_transient_response(response, idempotent):
+                    # Let the caller raise its own exception for the error response
+                    return response
+                error = response['message']
+            delay = policy.delay(attempt)
+            METRICS.retry('api.' + method)
+            print('WARNING: exchange client {} error, retry {} in {:.2f}s: {}'.format(
+                method, attempt + 1, delay, error))
+            time.sleep(delay)
+            attempt += 1
+
+    def _hub_call(self, key: tuple, ttl: float, exception_to_raise, method: str, *args, **kwargs):
+        """Route a read-only API call through the shared market data hub so bots in this
+        process share responses and identical in-flight requests are coalesced.
+        """
+        def fetch():
+            response = self._wrap_client(method, *args, **kwargs)
+            _api_response_check(response, exception_to_raise)
+            return response
+        return HUB.fetch(key, ttl, fetch)
+
+    def _get_user_feed(self):
+        """Return the shared user channel feed subscribed to this pair, or None if disabled"""
+        if not self.ws_user_channel:
+            return None
+        if self._user_feed is None:
+            self._user_feed = get_user_feed(self.ws_url, self.key, self.b64secret, self.passphrase)
+        self._user_feed.subscribe(self.pair)
+        return self._user_feed
+
+    def _track_order(self, response: dict) -> None:
+        """Called with every order placement response"""
+        self._invalidate_wallet()
+        feed = self._get_user_feed()
+        if feed is not None:
+            feed.track(response)
 
     def authenticate(self) -> cbpro.AuthenticatedClient:
         key = self.config['exchange'].get('key')
         passphrase = self.config['exchange'].get('passphrase')
         b64secret = self.config['exchange'].get('b64secret')
-        self.client = cbpro.AuthenticatedClient(key, b64secret, passphrase)
-        test = self.client.get_accounts()
-        _api_response_check(test, ExchangeAuthError)
+
+        def verify(client):
+            # Once per API key per process. The response is not wasted, it primes the wallet.
+            test = HUB.fetch(('accounts', key), self.hub_ttl_accounts, client.get_accounts)
+            if 'message' in test:
+                HUB.invalidate(('accounts', key))
+            _api_response_check(test, ExchangeAuthError)
+        self.client = get_authenticated_client(key, b64secret, passphrase,
+            api_url=self.api_url, pool_size=self.http_pool_size, verify=verify)
         return self.client
 
     def get_price(self) -> Decimal:
-        ticker = self._wrap_client('get_product_ticker', product_id=self.pair)
-        _api_response_check(ticker, ExchangeError)
+        if self.ws_enable:
+            if self._feed is None:
+                self._feed = get_ticker_feed(self.ws_url)
+            self._feed.subscribe(self.pair)
+            price = self._feed.get_price(self.pair, self.ws_stale_seconds)
+            if price is not None:
+                return price
+        # Feed disabled, not connected yet or stale: fall back to REST
+        ticker = self._hub_call(('ticker', self.api_url, self.pair), self.hub_ttl_ticker,
+            ExchangeError, 'get_product_ticker', product_id=self.pair)
         price = Decimal(ticker['price'])
         return price
 
+    def watch_price(self) -> Decimal:
+        return self.get_price()
+
     def get_precisions(self) -> ProductInfo:
         product_info = self.get_product_info()
-        assert product_info is not None, 'Product info must be set.'
         # Set how many decimal places/precision price and size can have
-        base_increment = '%.12f' % (product_info.base_increment)
-        quote_increment = '%.12f' % (product_info.quote_increment)
-        self.size_decimal_places = base_increment.split('1')[0].count('0')
-        self.usd_decimal_places = quote_increment.split('1')[0].count('0')
+        self.size_decimal_places = product_info.size_decimal_places
+        self.usd_decimal_places = product_info.usd_decimal_places
         return (self.size_decimal_places, self.usd_decimal_places)
 
     def get_product_info(self) -> ProductInfo:
-        product_info = None
-        products = self._wrap_client('get_products')
-        _api_response_check(products, ExchangeProductInfoError)
-        for product in products:
-            if product['id'] == self.pair:
-                product_info = ProductInfo(product)
-                product_info.digest()
-                break
+        def fetch():
+            products = self._wrap_client('get_products')
+            _api_response_check(products, ExchangeProductInfoError)
+            return products
+        catalog = get_catalog(('coinbasepro', self.api_url), fetch, self.catalog_refresh_seconds)
+        product_info = catalog.get(self.pair)
         assert product_info is not None, 'Product info must be set.'
         return product_info
 
     def get_usd_wallet(self) -> Decimal:
-        accounts = self._wrap_client('get_accounts')
-        _api_response_check(accounts, ExchangeWalletError)
-        for account in accounts:
-            if account['currency'] == 'USD':
-                wallet = Decimal(account['available'])
-                break
-        assert wallet is not None, 'USD wallet was not found.'
-        return wallet
+        def fetch():
+            accounts = self._hub_call(('accounts', self.key), self.hub_ttl_accounts,
+                ExchangeWalletError, 'get_accounts')
+            wallet = None
+            for account in accounts:
+                if account['currency'] == 'USD':
+                    wallet = Decimal(account['available'])
+                    break
+            assert wallet is not None, 'USD wallet was not found.'
+            return wallet
+        # Per API key, so an order of any bot sharing the key drops it for all of them
+        return HUB.fetch(('wallet', self.key), self.cache_ttl_wallet, fetch)
+
+    def _invalidate_wallet(self) -> None:
+        """Drop the cached wallet and accounts of this API key after an order changed the
+        balance
+        """
+        HUB.invalidate(('wallet', self.key))
+        HUB.invalidate(('accounts', self.key))
+
+    def _get_orders_page(self, params: dict) -> t.Union[dict, t.Tuple[t.List[dict], str]]:
+        """Fetch one page of the orders listing. cbpro's get_orders() fetches the next pages
+        lazily, outside of _wrap_client().
+
+        Returns:
+            tuple: (orders, cursor of the next page or None), or the error response (dict)
+        """
+        client = self.client
+        response = client.session.get(client.url + '/orders', params=params, auth=client.auth,
+            timeout=30)
+        page = response.json()
+        if isinstance(page, dict):
+            return page
+        return (page, response.headers.get('cb-after'))
+
+    def _list_orders(self, **params) -> t.List[dict]:
+        """Fetch every page of the orders listing, each page is one wrapped API call"""
+        orders = []
+        while 1:
+            response = self._wrap_call('get_orders', self._get_orders_page, dict(params))
+            _api_response_check(response, ExchangeGetOrdersError)
+            page, after = response
+            orders.extend(page)
+            if not page or not after:
+                return orders
+            params['after'] = after
 
     def get_open_sells(self) -> t.List[t.Mapping[str, Decimal]]:
-        orders = self._wrap_client('get_orders')
-        _api_response_check(orders, ExchangeGetOrdersError)
+        orders = self._list_orders()
         open_sells = []
         for order in orders:
             if order['side'] == 'sell' and order['product_id'] == self.pair:
@@ -108,12 +244,19 @@ class CoinbasePro(BaseExchange):
                 open_sells.append(order)
         return open_sells
 
+    def get_open_orders(self) -> t.Dict[str, dict]:
+        def fetch():
+            orders = self._list_orders(status='open')
+            return {order['id']: order for order in orders}
+        # Shared by every bot using this API key
+        return HUB.fetch(('open_orders', self.key), self.hub_ttl_open_orders, fetch)
+
     def get_fees(self) -> t.Tuple[Decimal, Decimal, Decimal]:
         """pypi cbpro version doesn't have my get_fees() patch, so manually query it"""
         # pylint: disable=protected-access
         #fees = self.client._send_message('get', '/fees')
-        fees = self._wrap_client('_send_message', 'get', '/fees')
-        _api_response_check(fees, ExchangeFeesError)
+        fees = self._hub_call(('fees', self.key), self.hub_ttl_fees, ExchangeFeesError,
+            '_send_message', 'get', '/fees')
         maker_fee = Decimal(fees['maker_fee_rate'])
         taker_fee = Decimal(fees['taker_fee_rate'])
         usd_volume = Decimal(fees['usd_volume'])
@@ -129,6 +272,7 @@ class CoinbasePro(BaseExchange):
             price=fixed_price,
         )
         _api_response_check(response, ExchangeBuyLimitError)
+        self._track_order(response)
         return response
 
     def buy_market(self, funds: Decimal) -> dict:
@@ -140,6 +284,7 @@ class CoinbasePro(BaseExchange):
             funds=funds,
         )
         _api_response_check(response, ExchangeBuyMarketError)
+        self._track_order(response)
         return response
 
     def sell_limit(self, price: Decimal, size: Decimal) -> dict:
@@ -153,6 +298,7 @@ class CoinbasePro(BaseExchange):
             size=fixed_size,
         )
         _api_response_check(response, ExchangeSellLimitError)
+        self._track_order(response)
         return response
 
     def sell_market(self, size: Decimal) -> dict:
@@ -164,16 +310,30 @@ class CoinbasePro(BaseExchange):
             size=fixed_size,
         )
         _api_response_check(response, ExchangeSellMarketError)
+        self._track_order(response)
         return response
 
     def cancel(self, order_id: str) -> bool:
         response = self._wrap_client('cancel_order', order_id)
         _api_response_check(response, ExchangeCancelError)
+        self._invalidate_wallet()
         return response
 
     def get_order(self, order_id: str) -> dict:
+        # Answer from the user channel order-state cache when possible, REST is the fallback
+        feed = self._get_user_feed()
+        if feed is not None:
+            response = feed.get_order(order_id, self.ws_order_wait)
+            if response is not None:
+                if response.get('settled'):
+                    self._invalidate_wallet()
+                return response
         response = self._wrap_client('get_order', order_id)
         _api_response_check(response, ExchangeGetOrdersError)
+        if response.get('settled'):
+            self._invalidate_wallet()
+        if feed is not None:
+            feed.track(response)
         return response
 
     def get_hold_value(self) -> Decimal:
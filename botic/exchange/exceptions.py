@@ -35,3 +35,6 @@ class ExchangeFeesError(Exception):
 
 class ExchangeWalletError(Exception):
     """Exchange get accounts failed"""
+
+class ExchangeCircuitOpenError(ExchangeError):
+    """Exchange endpoint is failing, calls fail fast until it recovers"""
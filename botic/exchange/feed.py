@@ -0,0 +1,320 @@
+"""Streaming market data from the Coinbase Pro websocket feed
+
+One connection per feed URL is shared by every exchange instance in the process. The connection
+is kept open by a background thread that reconnects (and re-subscribes) on errors.
+"""
+import time
+import json
+import hmac
+import base64
+import hashlib
+import threading
+import typing as t
+from abc import ABCMeta, abstractmethod
+from decimal import Decimal
+import websocket
+
+class WebsocketFeed(metaclass=ABCMeta):
+    """Base class for a shared, self-reconnecting websocket subscription.
+
+    Subclasses implement _subscribe_message() and _handle().
+
+    Args:
+        url (str): Websocket feed URL
+    """
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.product_ids = set()
+        self.connected = False
+        self.last_message = 0.0
+        self.reconnects = 0
+        self._lock = threading.Lock()
+        self._ws = None
+        self._thread = None
+        self._running = False
+
+    @abstractmethod
+    def _subscribe_message(self, product_ids: t.List[str]) -> dict:
+        """Return the subscribe message for product_ids"""
+
+    @abstractmethod
+    def _handle(self, message: dict) -> None:
+        """Handle one message received from the feed"""
+
+    def _on_connect(self) -> None:
+        """Optional override: called on every (re)connect before subscribing. Messages may have
+        been missed while disconnected.
+        """
+
+    def subscribe(self, product_id: str) -> None:
+        """Add a product to the subscription, starting the feed thread if needed"""
+        with self._lock:
+            if product_id in self.product_ids:
+                return
+            self.product_ids.add(product_id)
+            ws_conn = self._ws if self.connected else None
+        if ws_conn is not None:
+            try:
+                ws_conn.send(json.dumps(self._subscribe_message([product_id])))
+            except websocket.WebSocketException:
+                pass
+        self.start()
+
+    def start(self) -> None:
+        """Start the background feed thread"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name='botic-feed-{}'.format(type(self).__name__), daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop the feed thread and close the connection"""
+        self._running = False
+        ws_conn = self._ws
+        if ws_conn is not None:
+            try:
+                ws_conn.close()
+            except websocket.WebSocketException:
+                pass
+        if self._thread is not None:
+            self._thread.join(5)
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while self._running:
+            try:
+                self._ws = websocket.create_connection(self.url, timeout=30)
+                self._on_connect()
+                with self._lock:
+                    product_ids = sorted(self.product_ids)
+                self._ws.send(json.dumps(self._subscribe_message(product_ids)))
+                self.connected = True
+                backoff = 1.0
+                while self._running:
+                    raw = self._ws.recv()
+                    if not raw:
+                        break
+                    self.last_message = time.time()
+                    message = json.loads(raw)
+                    if message.get('type') == 'error':
+                        print('WARNING: {} {} error message: {}'.format(
+                            type(self).__name__, self.url, message))
+                    self._handle(message)
+            except Exception as err:
+                if self._running:
+                    print('WARNING: {} {} error: {}'.format(type(self).__name__, self.url, err))
+            finally:
+                self.connected = False
+                if self._ws is not None:
+                    try:
+                        self._ws.close()
+                    except Exception:
+                        pass
+                    self._ws = None
+            if self._running:
+                self.reconnects += 1
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60.0)
+
+class TickerFeed(WebsocketFeed):
+    """Last trade price per product from the ticker channel"""
+    def __init__(self, url: str) -> None:
+        super().__init__(url)
+        self._prices = {}
+
+    def _subscribe_message(self, product_ids: t.List[str]) -> dict:
+        # Heartbeats keep the connection alive for products that rarely trade
+        return {'type': 'subscribe', 'product_ids': product_ids,
+                'channels': ['ticker', 'heartbeat']}
+
+    def _handle(self, message: dict) -> None:
+        if message.get('type') == 'ticker' and 'price' in message:
+            self._prices[message['product_id']] = (Decimal(message['price']), time.time())
+
+    def get_price(self, product_id: str, max_age: float) -> t.Optional[Decimal]:
+        """Return the last price of product_id if it was received within max_age seconds and the
+        feed is connected, otherwise None (the caller should fall back to REST).
+        """
+        if not self.connected:
+            return None
+        entry = self._prices.get(product_id)
+        if entry is None or time.time() - entry[1] > max_age:
+            return None
+        return entry[0]
+
+class UserFeed(WebsocketFeed):
+    """Order state of one API key from the authenticated user channel.
+
+    Received, open, match and done events update a local order-state cache so order status can be
+    answered without polling. The cache is cleared on reconnect since events may have been missed.
+
+    Args:
+        url (str): Websocket feed URL
+        key (str): API key
+        b64secret (str): Base64 encoded API secret
+        passphrase (str): API passphrase
+    """
+    # Done orders are dropped from the cache after this many seconds
+    done_ttl = 3600.0
+
+    def __init__(self, url: str, key: str, b64secret: str, passphrase: str) -> None:
+        super().__init__(url)
+        self.key = key
+        self.b64secret = b64secret
+        self.passphrase = passphrase
+        self.subscribed = set()
+        self._orders = {}
+        self._cond = threading.Condition()
+
+    def _subscribe_message(self, product_ids: t.List[str]) -> dict:
+        timestamp = str(time.time())
+        message = (timestamp + 'GET' + '/users/self/verify').encode('utf-8')
+        digest = hmac.new(base64.b64decode(self.b64secret), message, hashlib.sha256).digest()
+        return {'type': 'subscribe', 'product_ids': product_ids, 'channels': ['user'],
+                'key': self.key, 'passphrase': self.passphrase, 'timestamp': timestamp,
+                'signature': base64.b64encode(digest).decode('utf-8')}
+
+    def _on_connect(self) -> None:
+        with self._cond:
+            self._orders.clear()
+            self.subscribed = set()
+
+    def _handle(self, message: dict) -> None:
+        # pylint: disable=too-many-branches
+        msg_type = message.get('type')
+        if msg_type == 'subscriptions':
+            with self._cond:
+                for channel in message.get('channels', []):
+                    if channel.get('name') == 'user':
+                        self.subscribed = set(channel.get('product_ids', []))
+            return
+        if not msg_type in ('received', 'open', 'match', 'done'):
+            return
+        if msg_type == 'match':
+            # Either side of the trade can be ours, the user id field is only set for our side
+            if message.get('maker_order_id') in self._orders or message.get('maker_user_id'):
+                order_id = message.get('maker_order_id')
+            else:
+                order_id = message.get('taker_order_id')
+        else:
+            order_id = message.get('order_id')
+        if not order_id:
+            return
+        with self._cond:
+            state = self._orders.setdefault(order_id, {
+                'id': order_id, 'product_id': message.get('product_id'),
+                'side': message.get('side'), 'status': 'pending', 'settled': False,
+                'filled_size': '0', 'executed_value': '0', 'final': None, 'done_at': None,
+            })
+            if msg_type == 'received':
+                for key in ('side', 'price', 'size', 'funds', 'order_type'):
+                    if key in message:
+                        state[key] = message[key]
+                # The received time is when the exchange accepted the order
+                if 'time' in message:
+                    state.setdefault('created_at', message['time'])
+                if state['status'] == 'pending':
+                    state['status'] = 'received'
+            elif msg_type == 'open':
+                if state['status'] != 'done':
+                    state['status'] = 'open'
+            elif msg_type == 'match':
+                size = Decimal(message['size'])
+                state['filled_size'] = str(Decimal(state['filled_size']) + size)
+                state['executed_value'] = str(
+                    Decimal(state['executed_value']) + size * Decimal(message['price']))
+            elif msg_type == 'done':
+                state['status'] = 'done'
+                state['done_reason'] = message.get('reason')
+                state['done_at'] = time.time()
+                self._prune()
+            self._cond.notify_all()
+
+    def _prune(self) -> None:
+        expire = time.time() - self.done_ttl
+        for order_id in [order_id for order_id, state in self._orders.items()
+                         if state['done_at'] is not None and state['done_at'] < expire]:
+            del self._orders[order_id]
+
+    def track(self, order: dict) -> None:
+        """Seed the cache with an order status from the REST API (an order placement response or
+        a get_order() response). Settled orders are cached as final. Unsettled orders are only
+        seeded while their product is subscribed, so no later event can be missed, and never
+        replace state that came from the feed.
+        """
+        if not self.connected or not 'id' in order or 'message' in order:
+            return
+        with self._cond:
+            state = self._orders.get(order['id'])
+            if state is not None and 'created_at' in order:
+                state.setdefault('created_at', order['created_at'])
+            if order.get('settled'):
+                if state is None:
+                    state = self._orders[order['id']] = {
+                        'id': order['id'], 'status': 'done', 'done_at': time.time()}
+                state['final'] = order
+            elif state is None and order.get('product_id') in self.subscribed:
+                self._orders[order['id']] = {
+                    'id': order['id'], 'product_id': order.get('product_id'),
+                    'side': order.get('side'), 'status': order.get('status', 'pending'),
+                    'settled': False, 'filled_size': order.get('filled_size', '0'),
+                    'executed_value': order.get('executed_value', '0'),
+                    'final': None, 'done_at': None,
+                }
+                if 'created_at' in order:
+                    self._orders[order['id']]['created_at'] = order['created_at']
+            self._cond.notify_all()
+
+    def get_order(self, order_id: str, wait: float = 0.0) -> t.Optional[dict]:
+        """Return the cached status of order_id.
+
+        An order that is still in flight (received but not open or done) is waited on for up to
+        wait seconds.
+
+        Returns:
+            dict: The final REST response for settled orders, or a status snapshot of an order
+                that is not done yet. None if the order is unknown, done but not settled yet (the
+                caller should fetch it once from REST and track() the response), its creation time
+                is not known yet (e.g. the received message was missed) or the feed is
+                disconnected.
+        """
+        if not self.connected:
+            return None
+        with self._cond:
+            state = self._orders.get(order_id)
+            if state is None:
+                return None
+            if state['final'] is None and not state['status'] in ('open', 'done') and wait > 0:
+                self._cond.wait_for(
+                    lambda: self._orders.get(order_id, {}).get('status') in ('open', 'done'),
+                    timeout=wait)
+                state = self._orders.get(order_id)
+                if state is None:
+                    return None
+            if state['final'] is not None:
+                return state['final']
+            if state['status'] == 'done' or not 'created_at' in state:
+                return None
+            return {key: val for key, val in state.items() if not key in ('final', 'done_at')}
+
+_FEEDS = {}
+_FEEDS_LOCK = threading.Lock()
+
+def get_ticker_feed(url: str) -> TickerFeed:
+    """Return the process-wide TickerFeed for url"""
+    with _FEEDS_LOCK:
+        key = ('ticker', url)
+        if not key in _FEEDS:
+            _FEEDS[key] = TickerFeed(url)
+        return _FEEDS[key]
+
+def get_user_feed(url: str, key: str, b64secret: str, passphrase: str) -> UserFeed:
+    """Return the process-wide UserFeed for url and API key"""
+    with _FEEDS_LOCK:
+        feed_key = ('user', url, key)
+        if not feed_key in _FEEDS:
+            _FEEDS[feed_key] = UserFeed(url, key, b64secret, passphrase)
+        return _FEEDS[feed_key]
@@ -0,0 +1,148 @@
+"""In-process market data hub shared by every exchange instance
+
+Bots running in the same Botic process ask the exchange for the same global or account-wide data
+(products, fees, accounts, tickers for a shared pair). The hub caches those responses per resource
+with a TTL and coalesces identical in-flight requests so N bots cost one API call.
+"""
+import time
+import asyncio
+import threading
+import typing as t
+
+class _Call: # pylint: disable=too-few-public-methods
+    """An in-flight fetch that other callers can wait on"""
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class MarketDataHub:
+    """TTL cache with request coalescing.
+
+    Cached values are shared between callers and must be treated as read-only.
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def fetch(self, key: t.Hashable, ttl: float, func: t.Callable[[], t.Any]) -> t.Any:
+        """Return the cached value for key if it is younger than ttl seconds, otherwise call
+        func(). If another thread is already fetching key, wait for its result instead of making
+        a second call. Exceptions raised by func are passed to every waiter and never cached.
+
+        Args:
+            key (hashable): Resource key, e.g. ('ticker', 'BTC-USD')
+            ttl (float): Max age of a cached value in seconds. 0 disables caching but still
+                coalesces concurrent requests.
+            func (callable): Fetches the value
+
+        Returns:
+            any: The (possibly cached) value
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] < ttl:
+                self.hits += 1
+                return entry[1]
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._inflight[key] = call
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = func()
+        except BaseException as err:
+            # Also KeyboardInterrupt/SystemExit: waiters must not take None for a result
+            call.error = err
+            raise
+        else:
+            with self._lock:
+                self._entries[key] = (time.time(), call.value)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.event.set()
+        return call.value
+
+    def invalidate(self, key: t.Optional[t.Hashable] = None) -> None:
+        """Drop a cached value, or every cached value when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        """Return cache hit/miss counters"""
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+        }
+
+class AsyncMarketDataHub:
+    """MarketDataHub for coroutines running on one event loop: concurrent fetches of the same key
+    await a single in-flight request.
+    """
+    def __init__(self) -> None:
+        self._entries = {}
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def fetch(self, key: t.Hashable, ttl: float,
+                    func: t.Callable[[], t.Awaitable[t.Any]]) -> t.Any:
+        """See MarketDataHub.fetch(), func is a coroutine function"""
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[0] < ttl:
+            self.hits += 1
+            return entry[1]
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # shield() so a cancelled waiter does not cancel the shared request
+            return await asyncio.shield(future)
+        self.misses += 1
+        future = asyncio.ensure_future(func())
+        self._inflight[key] = future
+        try:
+            value = await asyncio.shield(future)
+        finally:
+            del self._inflight[key]
+        self._entries[key] = (time.time(), value)
+        return value
+
+    def invalidate(self, key: t.Optional[t.Hashable] = None) -> None:
+        """Drop a cached value, or every cached value when key is None"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        """Return cache hit/miss counters"""
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+        }
+
+# Shared by every exchange instance in the process
+HUB = MarketDataHub()
+# Shared by every asyncio exchange instance in the process (one event loop)
+ASYNC_HUB = AsyncMarketDataHub()
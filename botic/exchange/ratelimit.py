@@ -0,0 +1,111 @@
+"""Token bucket rate limiter shared by every process on the host
+
+The bucket state (available tokens and the time they were last refilled) lives in a small file
+that is updated under an exclusive flock(), so separate botic processes using the same API key
+draw from the same budget.
+"""
+import os
+import time
+import struct
+import fcntl
+import asyncio
+import hashlib
+import tempfile
+import threading
+import typing as t
+
+_STATE = struct.Struct('dd')
+
+class TokenBucket:
+    """Cross-process token bucket.
+
+    Args:
+        path (str): Path of the shared state file (created if missing)
+        rate (float): Tokens added per second
+        burst (float): Bucket capacity, the number of calls that can go out back-to-back
+    """
+    def __init__(self, path: str, rate: float, burst: float) -> None:
+        self.path = path
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        # flock() does not exclude threads sharing one file descriptor
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    def _take(self, tokens: float) -> float:
+        """Take tokens if available.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise seconds to wait before retrying
+        """
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            data = os.pread(self._fd, _STATE.size, 0)
+            now = time.time()
+            if len(data) == _STATE.size:
+                available, stamp = _STATE.unpack(data)
+                available = min(self.burst, available + max(0.0, now - stamp) * self.rate)
+            else:
+                available = self.burst
+            if available >= tokens:
+                os.pwrite(self._fd, _STATE.pack(available - tokens, now), 0)
+                return 0.0
+            os.pwrite(self._fd, _STATE.pack(available, now), 0)
+            return (tokens - available) / self.rate
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until tokens are available and take them.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while 1:
+            with self._lock:
+                wait = self._take(tokens)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, tokens: float = 1.0) -> float:
+        """acquire() for asyncio callers: waits with asyncio.sleep() instead of blocking the
+        event loop.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while 1:
+            with self._lock:
+                wait = self._take(tokens)
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+_BUCKETS = {}
+_BUCKETS_LOCK = threading.Lock()
+
+def get_bucket(name: str, rate: float, burst: float,
+               directory: t.Optional[str] = None) -> TokenBucket:
+    """Return the process-wide TokenBucket for name, creating it if needed.
+
+    Args:
+        name (str): Bucket name, used in the state file name
+        rate (float): Tokens added per second
+        burst (float): Bucket capacity
+        directory (str): Where to keep the state file, defaults to the system temp directory
+    """
+    directory = directory or tempfile.gettempdir()
+    path = os.path.join(directory, 'botic-{}.bucket'.format(name))
+    with _BUCKETS_LOCK:
+        if not path in _BUCKETS:
+            _BUCKETS[path] = TokenBucket(path, rate, burst)
+        return _BUCKETS[path]
+
+def key_bucket_name(key: str, kind: str) -> str:
+    """Build a bucket name from an API key without putting the key in the file name"""
+    return '{}-{}'.format(kind, hashlib.sha1(key.encode('utf-8')).hexdigest()[:12])
@@ -0,0 +1,141 @@
+"""Retry policy and circuit breakers for exchange API calls
+
+Only errors known to be transient (connection problems, timeouts, unparsable gateway pages,
+rate limit and 5xx style error responses) are retried, with exponential backoff and full jitter so
+bots sharing an API key do not retry in lockstep. Each endpoint has a process-wide circuit breaker:
+after repeated transient failures calls fail fast until a trial call succeeds again.
+"""
+import time
+import random
+import threading
+import typing as t
+import requests
+from .exceptions import ExchangeCircuitOpenError
+
+# Error response messages that mean the request was not processed and can be retried
+TRANSIENT_MESSAGES = ('rate limit', 'internal server error', 'service unavailable',
+    'bad gateway', 'gateway timeout', 'timeout', 'try again')
+
+def is_transient_error(err: Exception, idempotent: bool = True) -> bool:
+    """Return True if err is worth retrying.
+
+    Args:
+        err (Exception): The exception raised by the client call
+        idempotent (bool): False for calls that must not be repeated if the request may have
+            reached the exchange (e.g. placing an order). Only errors raised before the request
+            was sent are retried for those.
+    """
+    if isinstance(err, requests.exceptions.ConnectTimeout):
+        return True
+    if not idempotent:
+        return False
+    if isinstance(err, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                        requests.exceptions.ChunkedEncodingError)):
+        return True
+    # HTML error pages from a gateway fail to decode as JSON
+    return isinstance(err, ValueError) and type(err).__name__ == 'JSONDecodeError'
+
+def is_transient_response(response: t.Any, idempotent: bool = True) -> bool:
+    """Return True if response is an error response worth retrying"""
+    if not isinstance(response, dict) or not 'message' in response:
+        return False
+    message = str(response['message']).lower()
+    if not idempotent:
+        # Rejected before processing
+        return 'rate limit' in message
+    return any(text in message for text in TRANSIENT_MESSAGES)
+
+class RetryPolicy:
+    """Exponential backoff with full jitter.
+
+    Args:
+        attempts (int): Max number of attempts (1 = no retries)
+        backoff (float): Base delay in seconds
+        backoff_max (float): Max delay in seconds
+    """
+    # pylint: disable=too-few-public-methods
+    def __init__(self, attempts: int, backoff: float, backoff_max: float) -> None:
+        self.attempts = max(1, attempts)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+
+    def delay(self, attempt: int) -> float:
+        """Return the seconds to wait before retry number attempt (starting at 0)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff * (2 ** attempt)))
+
+class CircuitBreaker:
+    """Fail fast after threshold consecutive transient failures.
+
+    The circuit opens for reset_seconds, then lets a single trial call through (half-open). A
+    success closes it, a failure opens it again.
+
+    Args:
+        name (str): Endpoint name used in errors
+        threshold (int): Consecutive failures that open the circuit (0 = never open)
+        reset_seconds (float): Seconds to fail fast before a trial call
+    """
+    def __init__(self, name: str, threshold: int, reset_seconds: float) -> None:
+        self.name = name
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """closed, open or half-open"""
+        if self.opened_at is None:
+            return 'closed'
+        if self._trial or time.time() - self.opened_at >= self.reset_seconds:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> None:
+        """Raise ExchangeCircuitOpenError unless a call may go out now"""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.reset_seconds - time.time()
+            if remaining <= 0 and not self._trial:
+                self._trial = True
+                return
+        raise ExchangeCircuitOpenError('Circuit open for {} ({:.1f} seconds left)'.format(
+            self.name, max(0.0, remaining)))
+
+    def success(self) -> None:
+        """Record a successful call"""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def failure(self) -> None:
+        """Record a transient failure"""
+        with self._lock:
+            self.failures += 1
+            if self._trial or (self.opened_at is None and 0 < self.threshold <= self.failures):
+                self.trips += 1
+                self.opened_at = time.time()
+                self._trial = False
+
+    def stats(self) -> dict:
+        """Return the breaker state and counters"""
+        return {'state': self.state, 'failures': self.failures, 'trips': self.trips}
+
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+def get_breaker(name: str, threshold: int, reset_seconds: float) -> CircuitBreaker:
+    """Return the process-wide CircuitBreaker for an endpoint"""
+    with _BREAKERS_LOCK:
+        if not name in _BREAKERS:
+            _BREAKERS[name] = CircuitBreaker(name, threshold, reset_seconds)
+        return _BREAKERS[name]
+
+def breaker_stats() -> t.Dict[str, dict]:
+    """Return the stats of every circuit breaker in the process"""
+    with _BREAKERS_LOCK:
+        return {name: breaker.stats() for name, breaker in _BREAKERS.items()}
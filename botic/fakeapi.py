@@ -0,0 +1,472 @@
+"""Local fake of the Coinbase Pro REST API for offline and load testing
+
+Implements the endpoints used by the CoinbasePro exchange module (products, ticker, accounts,
+orders, fees and cancel) in memory. Prices replay a path built from a historical candle CSV (the
+same intra-candle path as Backtest) or follow a random walk. Latency, error injection and rate
+limits are configurable. Point bots at it with:
+
+    exchange:
+        api_url: http://127.0.0.1:8780
+        b64secret: <any base64 string>
+
+Every API key gets its own wallet. Signatures are not verified.
+"""
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import typing as t
+from decimal import Decimal
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .exchange.candles import CandleStore
+
+def load_price_path(csv_path: str) -> t.List[Decimal]:
+    """Build the Backtest intra-candle price path of a historical candle CSV(.gz)"""
+    store = CandleStore.from_file(csv_path)
+    return [store.to_decimal(price) for price in store.path]
+
+def random_walk(start: Decimal, steps: int, seed: int = 0) -> t.List[Decimal]:
+    """Build a random walk price path (+/- 0.1% per step)"""
+    rand = random.Random(seed)
+    path = [start]
+    for _ in range(steps - 1):
+        path.append(round(path[-1] * Decimal(1 + rand.uniform(-0.001, 0.001)), 2))
+    return path
+
+def _now() -> str:
+    return datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+class ApiError(Exception):
+    """Error response with an HTTP status"""
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+class FakeExchange:
+    """In-memory exchange state shared by the request handlers.
+
+    Args:
+        path (list): Price path, replayed in a loop
+        step_seconds (float): Wall clock seconds per price path step
+        products (list): Product ids. Each product replays the path from a different offset.
+        wallet (Decimal): Starting USD balance of every API key
+        maker_fee (Decimal): Maker fee rate
+        taker_fee (Decimal): Taker fee rate
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, path: t.List[Decimal], step_seconds: float = 1.0,
+                 products: t.Sequence[str] = ('BTC-USD',), wallet: Decimal = Decimal('10000'),
+                 maker_fee: Decimal = Decimal('0.004'),
+                 taker_fee: Decimal = Decimal('0.006')) -> None:
+        self.path = path
+        self.step_seconds = step_seconds
+        self.products = list(products)
+        self.wallet = wallet
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.started = time.time()
+        self.accounts = {}
+        self.orders = {}
+        self._settled_step = {}
+        self._lock = threading.RLock()
+
+    def _step(self) -> int:
+        return int((time.time() - self.started) / self.step_seconds)
+
+    def _price_at(self, product_id: str, step: int) -> Decimal:
+        offset = self.products.index(product_id) * 997
+        return self.path[(step + offset) % len(self.path)]
+
+    def price(self, product_id: str) -> Decimal:
+        """Current price of product_id"""
+        if not product_id in self.products:
+            raise ApiError(404, 'NotFound')
+        return self._price_at(product_id, self._step())
+
+    def _account(self, key: str) -> dict:
+        if not key:
+            raise ApiError(401, 'invalid signature')
+        if not key in self.accounts:
+            self.accounts[key] = {'USD': {'balance': self.wallet, 'hold': Decimal(0)}}
+            for product_id in self.products:
+                self.accounts[key][product_id.split('-')[0]] = {
+                    'balance': Decimal(0), 'hold': Decimal(0)}
+        return self.accounts[key]
+
+    def settle(self) -> None:
+        """Fill open limit orders whose price was reached since the last settlement. An order only
+        fills on price steps after the one it was placed in.
+        """
+        with self._lock:
+            step = self._step()
+            for order in self.orders.values():
+                if order['status'] != 'open':
+                    continue
+                product_id = order['product_id']
+                first = max(self._settled_step.get(product_id, step), order['step'] + 1)
+                prices = [self._price_at(product_id, i)
+                          for i in range(max(first, step - 10000), step + 1)]
+                if not prices:
+                    continue
+                price = Decimal(order['price'])
+                if (order['side'] == 'sell' and max(prices) >= price) or \
+                        (order['side'] == 'buy' and min(prices) <= price):
+                    self._fill(order, price, self.maker_fee)
+            for product_id in self.products:
+                self._settled_step[product_id] = step
+
+    def _fill(self, order: dict, price: Decimal, fee_rate: Decimal) -> None:
+        account = self.accounts[order['key']]
+        base = order['product_id'].split('-')[0]
+        size = Decimal(order['size'])
+        value = size * price
+        fees = round(value * fee_rate, 12)
+        if order['side'] == 'sell':
+            account[base]['hold'] -= size
+            account[base]['balance'] -= size
+            account['USD']['balance'] += value - fees
+        else:
+            account['USD']['hold'] -= Decimal(order.get('hold', 0))
+            account['USD']['balance'] -= value + fees
+            account[base]['balance'] += size
+        order.update({
+            'status': 'done', 'done_reason': 'filled', 'done_at': _now(), 'settled': True,
+            'filled_size': str(size), 'executed_value': str(value), 'fill_fees': str(fees),
+        })
+
+    def get_accounts(self, key: str) -> t.List[dict]:
+        with self._lock:
+            return [{
+                'id': '{}-{}'.format(currency, key[:8]), 'currency': currency,
+                'balance': str(val['balance']), 'hold': str(val['hold']),
+                'available': str(val['balance'] - val['hold']), 'profile_id': key,
+                'trading_enabled': True,
+            } for currency, val in self._account(key).items()]
+
+    def place_order(self, key: str, params: dict) -> dict:
+        """Place a limit or market order"""
+        # pylint: disable=too-many-locals
+        with self._lock:
+            account = self._account(key)
+            product_id = params.get('product_id')
+            price_now = self.price(product_id)
+            base = product_id.split('-')[0]
+            side = params.get('side')
+            order_type = params.get('type', 'limit')
+            if not side in ('buy', 'sell'):
+                raise ApiError(400, 'side must be buy or sell')
+            order = {
+                'id': str(uuid.uuid4()), 'key': key, 'product_id': product_id, 'side': side,
+                'type': order_type, 'created_at': _now(), 'status': 'pending', 'settled': False,
+                'filled_size': '0', 'executed_value': '0', 'fill_fees': '0',
+                'post_only': False, 'stp': 'dc', 'step': self._step(),
+            }
+            if order_type == 'market':
+                if side == 'buy':
+                    funds = Decimal(params['funds'])
+                    if funds > account['USD']['balance'] - account['USD']['hold']:
+                        raise ApiError(400, 'Insufficient funds')
+                    fees = round(funds * self.taker_fee, 12)
+                    size = round((funds - fees) / price_now, 8)
+                    order.update({'funds': str(funds - fees), 'specified_funds': str(funds)})
+                    account['USD']['balance'] -= funds
+                    account[base]['balance'] += size
+                    order.update({
+                        'status': 'done', 'done_reason': 'filled', 'done_at': _now(),
+                        'settled': True, 'filled_size': str(size),
+                        'executed_value': str(funds - fees), 'fill_fees': str(fees),
+                    })
+                else:
+                    size = Decimal(params['size'])
+                    if size > account[base]['balance'] - account[base]['hold']:
+                        raise ApiError(400, 'Insufficient funds')
+                    order['size'] = str(size)
+                    account[base]['hold'] += size
+                    self._fill(order, price_now, self.taker_fee)
+            else:
+                price = Decimal(params['price'])
+                size = Decimal(params['size'])
+                order.update({'price': str(price), 'size': str(size), 'time_in_force': 'GTC'})
+                if side == 'sell':
+                    if size > account[base]['balance'] - account[base]['hold']:
+                        raise ApiError(400, 'Insufficient funds')
+                    account[base]['hold'] += size
+                else:
+                    hold = price * size * (1 + self.taker_fee)
+                    if hold > account['USD']['balance'] - account['USD']['hold']:
+                        raise ApiError(400, 'Insufficient funds')
+                    order['hold'] = str(hold)
+                    account['USD']['hold'] += hold
+                order['status'] = 'open'
+            self.orders[order['id']] = order
+            return self._public(order)
+
+    @staticmethod
+    def _public(order: dict) -> dict:
+        return {key: val for key, val in order.items() if not key in ('key', 'hold', 'step')}
+
+    def _own_order(self, key: str, order_id: str) -> dict:
+        order = self.orders.get(order_id)
+        if order is None or order['key'] != key:
+            raise ApiError(404, 'NotFound')
+        return order
+
+    def get_order(self, key: str, order_id: str) -> dict:
+        with self._lock:
+            self.settle()
+            return self._public(self._own_order(key, order_id))
+
+    def list_orders(self, key: str, status: t.Optional[t.List[str]] = None,
+                    product_id: t.Optional[str] = None) -> t.List[dict]:
+        with self._lock:
+            self.settle()
+            statuses = status or ['open', 'pending', 'active']
+            return [self._public(order) for order in self.orders.values()
+                    if order['key'] == key and order['status'] in statuses and
+                    (product_id is None or order['product_id'] == product_id)]
+
+    def cancel(self, key: str, order_id: str) -> t.List[str]:
+        with self._lock:
+            self.settle()
+            order = self._own_order(key, order_id)
+            if order['status'] != 'open':
+                raise ApiError(400, 'Order already done')
+            account = self.accounts[key]
+            if order['side'] == 'sell':
+                account[order['product_id'].split('-')[0]]['hold'] -= Decimal(order['size'])
+            else:
+                account['USD']['hold'] -= Decimal(order['hold'])
+            # Canceled orders disappear from the API
+            del self.orders[order_id]
+            return [order_id]
+
+    def product_list(self) -> t.List[dict]:
+        return [{
+            'id': product_id, 'display_name': product_id.replace('-', '/'),
+            'base_currency': product_id.split('-')[0], 'quote_currency': product_id.split('-')[1],
+            'base_increment': '0.00000001', 'quote_increment': '0.01000000',
+            'base_min_size': '0.00100000', 'base_max_size': '280.00000000',
+            'min_market_funds': '5', 'max_market_funds': '1000000', 'status': 'online',
+            'status_message': '', 'cancel_only': False, 'limit_only': False, 'post_only': False,
+            'trading_disabled': False, 'fx_stablecoin': False, 'margin_enabled': False,
+        } for product_id in self.products]
+
+class _RateLimiter:
+    """Per API key (or per IP for public calls) token buckets"""
+    # pylint: disable=too-few-public-methods
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def allow(self, name: str) -> bool:
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            now = time.time()
+            tokens, stamp = self.buckets.get(name, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+            allowed = tokens >= 1
+            self.buckets[name] = (tokens - 1 if allowed else tokens, now)
+            return allowed
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args) -> None:
+        # pylint: disable=redefined-builtin
+        if self.server.api.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: t.Any) -> None:
+        data = json.dumps(body, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method: str) -> None:
+        api = self.server.api
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        url = urlparse(self.path)
+        key = self.headers.get('CB-ACCESS-KEY', '')
+        api.requests += 1
+        if api.latency > 0:
+            time.sleep(api.latency * random.uniform(0.5, 1.5))
+        private = not url.path.startswith('/products')
+        if not api.limiter(private).allow(key if private else self.client_address[0]):
+            api.rate_limited += 1
+            self._send(429, {'message': 'Rate limit exceeded'})
+            return
+        if random.random() < api.error_rate:
+            api.errors += 1
+            self._send(500, {'message': 'Internal server error'})
+            return
+        try:
+            self._send(200, api.route(method, url.path, parse_qs(url.query), key, body))
+        except ApiError as err:
+            self._send(err.status, {'message': str(err)})
+        except (KeyError, ValueError, ArithmeticError) as err:
+            self._send(400, {'message': 'Invalid request: {}'.format(err)})
+
+    def do_GET(self) -> None:
+        # pylint: disable=invalid-name
+        self._handle('GET')
+
+    def do_POST(self) -> None:
+        # pylint: disable=invalid-name
+        self._handle('POST')
+
+    def do_DELETE(self) -> None:
+        # pylint: disable=invalid-name
+        self._handle('DELETE')
+
+class FakeApiServer:
+    """Fake Coinbase Pro REST API.
+
+    Args:
+        exchange (FakeExchange): Exchange state
+        host (str): Address to bind
+        port (int): Port to bind, 0 picks a free port
+        latency (float): Average added latency per request in seconds
+        error_rate (float): Fraction of requests answered with a 500 error
+        rate_public (float): Public requests/second per IP (0 = unlimited)
+        rate_private (float): Private requests/second per API key (0 = unlimited)
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, exchange: FakeExchange, host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, error_rate: float = 0.0, rate_public: float = 0.0,
+                 rate_private: float = 0.0, verbose: bool = False) -> None:
+        self.exchange = exchange
+        self.latency = latency
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._limiters = (_RateLimiter(rate_public, rate_public * 2),
+                          _RateLimiter(rate_private, rate_private * 2))
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.api = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """http:// URL of the server"""
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def limiter(self, private: bool) -> _RateLimiter:
+        return self._limiters[1 if private else 0]
+
+    def start(self) -> None:
+        """Serve requests in a background thread"""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name='botic-fakeapi', daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop serving"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def route(self, method: str, path: str, query: dict, key: str, body: bytes) -> t.Any:
+        """Dispatch a request and return the response body"""
+        # pylint: disable=too-many-return-statements
+        exchange = self.exchange
+        path = path.rstrip('/')
+        if method == 'GET' and path == '/products':
+            return exchange.product_list()
+        match = re.match(r'^/products/([^/]+)/ticker$', path)
+        if method == 'GET' and match:
+            price = exchange.price(match.group(1))
+            return {'trade_id': exchange._step(), 'price': str(price), 'size': '0.01',
+                    'bid': str(price - Decimal('0.01')), 'ask': str(price),
+                    'volume': '1000', 'time': _now()}
+        if method == 'GET' and path == '/accounts':
+            return exchange.get_accounts(key)
+        match = re.match(r'^/accounts/([^/]+)$', path)
+        if method == 'GET' and match:
+            for account in exchange.get_accounts(key):
+                if account['id'] == match.group(1):
+                    return account
+            raise ApiError(404, 'NotFound')
+        if method == 'GET' and path == '/fees':
+            exchange._account(key)
+            return {'maker_fee_rate': str(exchange.maker_fee),
+                    'taker_fee_rate': str(exchange.taker_fee), 'usd_volume': '0'}
+        if method == 'GET' and path == '/orders':
+            return exchange.list_orders(key, query.get('status'),
+                query.get('product_id', [None])[0])
+        if method == 'POST' and path == '/orders':
+            return exchange.place_order(key, json.loads(body.decode('utf-8') or '{}'))
+        match = re.match(r'^/orders/([^/]+)$', path)
+        if match and method == 'GET':
+            return exchange.get_order(key, match.group(1))
+        if match and method == 'DELETE':
+            return exchange.cancel(key, match.group(1))
+        raise ApiError(404, 'NotFound')
+
+def main() -> None:
+    """Run a fake Coinbase Pro API (and optionally a fake websocket feed with the same prices)"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8780)
+    parser.add_argument('--csv', help='Historical candle CSV(.gz) to replay, default: random walk')
+    parser.add_argument('--products', default='BTC-USD', help='Comma separated product ids')
+    parser.add_argument('--step-seconds', type=float, default=1.0,
+        help='Wall clock seconds per price path step')
+    parser.add_argument('--wallet', default='10000', help='Starting USD balance per API key')
+    parser.add_argument('--latency', type=float, default=0.0, help='Average latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+        help='Fraction of requests that fail with a 500 error')
+    parser.add_argument('--rate-public', type=float, default=0.0,
+        help='Public requests/second per IP (0 = unlimited)')
+    parser.add_argument('--rate-private', type=float, default=0.0,
+        help='Private requests/second per API key (0 = unlimited)')
+    parser.add_argument('--ws-port', type=int, default=0,
+        help='Also run a fake websocket ticker feed on this port')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    if args.csv:
+        path = load_price_path(args.csv)
+    else:
+        path = random_walk(Decimal('30000.00'), 100000)
+    exchange = FakeExchange(path, step_seconds=args.step_seconds,
+        products=args.products.split(','), wallet=Decimal(args.wallet))
+    server = FakeApiServer(exchange, host=args.host, port=args.port, latency=args.latency,
+        error_rate=args.error_rate, rate_public=args.rate_public,
+        rate_private=args.rate_private, verbose=args.verbose)
+    server.start()
+    print('Fake Coinbase Pro API listening on {} ({} price steps)'.format(server.url, len(path)))
+    feed = None
+    if args.ws_port:
+        # Imported here, the feed is optional
+        from .fakefeed import FakeFeedServer
+        feed = FakeFeedServer(host=args.host, port=args.ws_port, interval=args.step_seconds)
+        feed.start()
+        print('Fake websocket feed listening on {}'.format(feed.url))
+    try:
+        while 1:
+            if feed is not None:
+                for product_id in exchange.products:
+                    feed.set_price(product_id, exchange.price(product_id))
+            time.sleep(min(1.0, args.step_seconds))
+    except KeyboardInterrupt:
+        server.close()
+        if feed is not None:
+            feed.close()
+        sys.exit(0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""Local fake of the Coinbase Pro websocket feed for tests and offline runs
+
+Implements just enough of RFC 6455 (handshake, unfragmented text frames, ping and close) and of
+the feed protocol (subscribe, ticker and heartbeat channels) to exercise botic's feed clients.
+
+Example:
+    server = FakeFeedServer(prices={'BTC-USD': '30000.00'})
+    server.start()
+    # point ws_url at server.url
+    server.set_price('BTC-USD', '30100.00')
+"""
+import sys
+import json
+import time
+import base64
+import struct
+import hashlib
+import threading
+import socketserver
+import typing as t
+from datetime import datetime
+
+_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+def _recv_exact(sock, size: int) -> bytes:
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('connection closed')
+        data += chunk
+    return data
+
+def encode_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    """Encode an unmasked (server to client) frame"""
+    header = bytes([0x80 | opcode])
+    size = len(payload)
+    if size < 126:
+        header += bytes([size])
+    elif size < 65536:
+        header += bytes([126]) + struct.pack('!H', size)
+    else:
+        header += bytes([127]) + struct.pack('!Q', size)
+    return header + payload
+
+def read_frame(sock) -> t.Tuple[int, bytes]:
+    """Read one frame and return (opcode, payload) with the client mask removed"""
+    first, second = _recv_exact(sock, 2)
+    opcode = first & 0x0f
+    size = second & 0x7f
+    if size == 126:
+        size = struct.unpack('!H', _recv_exact(sock, 2))[0]
+    elif size == 127:
+        size = struct.unpack('!Q', _recv_exact(sock, 8))[0]
+    mask = _recv_exact(sock, 4) if second & 0x80 else None
+    payload = _recv_exact(sock, size)
+    if mask:
+        payload = bytes(byte ^ mask[idx % 4] for idx, byte in enumerate(payload))
+    return (opcode, payload)
+
+class _Client:
+    """A connected websocket client and its subscriptions"""
+    # pylint: disable=too-few-public-methods
+    def __init__(self, sock) -> None:
+        self.sock = sock
+        self.channels = set()
+        self.product_ids = set()
+        self.lock = threading.Lock()
+
+    def send(self, message: dict) -> None:
+        with self.lock:
+            self.sock.sendall(encode_frame(json.dumps(message).encode('utf-8')))
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        sock = self.request
+        request = b''
+        while not b'\r\n\r\n' in request:
+            chunk = sock.recv(4096)
+            if not chunk:
+                return
+            request += chunk
+        headers = {}
+        for line in request.decode('latin-1').split('\r\n')[1:]:
+            if ':' in line:
+                key, val = line.split(':', 1)
+                headers[key.strip().lower()] = val.strip()
+        accept = base64.b64encode(
+            hashlib.sha1((headers.get('sec-websocket-key', '') + _GUID).encode()).digest())
+        sock.sendall(
+            b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n'
+            b'Connection: Upgrade\r\nSec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+        client = _Client(sock)
+        self.server.feed.add_client(client)
+        try:
+            while 1:
+                opcode, payload = read_frame(sock)
+                if opcode == 0x8:
+                    with client.lock:
+                        sock.sendall(encode_frame(payload[:2], opcode=0x8))
+                    break
+                if opcode == 0x9:
+                    with client.lock:
+                        sock.sendall(encode_frame(payload, opcode=0xA))
+                elif opcode == 0x1:
+                    self.server.feed.handle_message(client, json.loads(payload.decode('utf-8')))
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            self.server.feed.remove_client(client)
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class FakeFeedServer:
+    """Fake Coinbase Pro websocket feed.
+
+    Args:
+        host (str): Address to bind
+        port (int): Port to bind, 0 picks a free port
+        prices (dict): Initial {product_id: price}
+        interval (float): Seconds between ticker/heartbeat rounds
+    """
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 prices: t.Optional[t.Mapping[str, t.Any]] = None, interval: float = 0.1) -> None:
+        self.prices = {key: str(val) for key, val in (prices or {}).items()}
+        self.interval = interval
+        self.clients = []
+        self.sequence = 0
+        self._lock = threading.Lock()
+        self._running = False
+        self._server = _Server((host, port), _Handler)
+        self._server.feed = self
+        self._threads = []
+
+    @property
+    def url(self) -> str:
+        """ws:// URL of the server"""
+        host, port = self._server.server_address[:2]
+        return 'ws://{}:{}'.format(host, port)
+
+    def start(self) -> None:
+        """Serve clients and publish ticker messages in background threads"""
+        self._running = True
+        for target in (self._server.serve_forever, self._publish_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def close(self) -> None:
+        """Stop the server and disconnect every client"""
+        self._running = False
+        self._server.shutdown()
+        self._server.server_close()
+        for client in list(self.clients):
+            try:
+                client.sock.close()
+            except OSError:
+                pass
+
+    def add_client(self, client: _Client) -> None:
+        with self._lock:
+            self.clients.append(client)
+
+    def remove_client(self, client: _Client) -> None:
+        with self._lock:
+            if client in self.clients:
+                self.clients.remove(client)
+
+    def handle_message(self, client: _Client, message: dict) -> None:
+        """Handle a client request (only subscribe/unsubscribe are supported)"""
+        channels = set()
+        for channel in message.get('channels', []):
+            channels.add(channel['name'] if isinstance(channel, dict) else channel)
+        product_ids = set(message.get('product_ids', []))
+        if message.get('type') == 'subscribe':
+            client.channels |= channels
+            client.product_ids |= product_ids
+        elif message.get('type') == 'unsubscribe':
+            client.channels -= channels
+        client.send({
+            'type': 'subscriptions',
+            'channels': [
+                {'name': name, 'product_ids': sorted(client.product_ids)}
+                for name in sorted(client.channels)
+            ],
+        })
+
+    def set_price(self, product_id: str, price: t.Any) -> None:
+        """Set the price published for product_id on the next ticker round"""
+        self.prices[product_id] = str(price)
+
+    def publish(self, message: dict, channel: t.Optional[str] = None) -> None:
+        """Send message to every client subscribed to channel (and to its product_id)"""
+        with self._lock:
+            clients = list(self.clients)
+        for client in clients:
+            if channel and not channel in client.channels:
+                continue
+            if 'product_id' in message and not message['product_id'] in client.product_ids:
+                continue
+            try:
+                client.send(message)
+            except OSError:
+                self.remove_client(client)
+
+    def _publish_loop(self) -> None:
+        while self._running:
+            now = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+            for product_id, price in list(self.prices.items()):
+                self.sequence += 1
+                self.publish({
+                    'type': 'ticker', 'sequence': self.sequence, 'product_id': product_id,
+                    'price': price, 'time': now,
+                }, channel='ticker')
+                self.publish({
+                    'type': 'heartbeat', 'sequence': self.sequence, 'product_id': product_id,
+                    'time': now,
+                }, channel='heartbeat')
+            time.sleep(self.interval)
+
+def main() -> None:
+    """Run a fake feed: boticfakefeed <port> <product_id>=<price> ..."""
+    if len(sys.argv) < 2:
+        print('{} <port> [PRODUCT-ID=price ...]'.format(sys.argv[0]))
+        sys.exit(1)
+    prices = dict(arg.split('=', 1) for arg in sys.argv[2:])
+    server = FakeFeedServer(port=int(sys.argv[1]), prices=prices)
+    server.start()
+    print('Fake feed listening on {}'.format(server.url))
+    try:
+        while 1:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.close()
+
+if __name__ == '__main__':
+    main()
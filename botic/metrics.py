@@ -0,0 +1,168 @@
+"""Per-endpoint API call metrics
+
+Counts calls, errors and retries per endpoint with a latency histogram, and the time spent waiting
+for rate limit tokens, so slow ticks can be attributed to the exchange, to rate limiting or to
+botic itself. The data is process-wide (METRICS) and can be read with snapshot() or written to a
+file periodically (see the general metrics_file setting).
+"""
+import os
+import json
+import time
+import asyncio
+import functools
+import threading
+import typing as t
+
+# Upper bounds (seconds) of the latency histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class EndpointStats:
+    """Counters and latency histogram of one endpoint"""
+    # pylint: disable=too-few-public-methods
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record(self, seconds: float, error: bool) -> None:
+        self.calls += 1
+        if error:
+            self.errors += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        for idx, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.histogram[idx] += 1
+                return
+        self.histogram[-1] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'seconds': self.seconds,
+            'avg_seconds': self.seconds / self.calls if self.calls else 0.0,
+            'max_seconds': self.max_seconds,
+            'histogram': {
+                str(bound): count for bound, count in zip(LATENCY_BUCKETS + ('inf',),
+                                                          self.histogram)
+            },
+        }
+
+class Metrics:
+    """Thread safe registry of endpoint stats and rate limit waits"""
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.endpoints = {}
+        self.rate_limit = {}
+        self.started = time.time()
+
+    def _endpoint(self, name: str) -> EndpointStats:
+        stats = self.endpoints.get(name)
+        if stats is None:
+            stats = self.endpoints[name] = EndpointStats()
+        return stats
+
+    def record(self, name: str, seconds: float, error: bool = False) -> None:
+        """Record one call of endpoint name that took seconds"""
+        with self._lock:
+            self._endpoint(name).record(seconds, error)
+
+    def retry(self, name: str) -> None:
+        """Count a retry of endpoint name"""
+        with self._lock:
+            self._endpoint(name).retries += 1
+
+    def rate_limited(self, bucket: str, seconds: float) -> None:
+        """Record a rate limit token request on bucket that waited seconds"""
+        with self._lock:
+            stats = self.rate_limit.setdefault(
+                bucket, {'acquires': 0, 'waits': 0, 'seconds': 0.0})
+            stats['acquires'] += 1
+            if seconds > 0:
+                stats['waits'] += 1
+                stats['seconds'] += seconds
+
+    def timed(self, name: str) -> '_Timer':
+        """Context manager that records the duration of a call (an exception counts as an
+        error):
+
+            with METRICS.timed('get_price'):
+                ...
+        """
+        return _Timer(self, name)
+
+    def snapshot(self) -> dict:
+        """Return every metric as a JSON serializable dict"""
+        with self._lock:
+            return {
+                'since': self.started,
+                'endpoints': {name: stats.snapshot() for name, stats in self.endpoints.items()},
+                'rate_limit': {name: dict(stats) for name, stats in self.rate_limit.items()},
+            }
+
+    def reset(self) -> None:
+        """Clear every metric"""
+        with self._lock:
+            self.endpoints = {}
+            self.rate_limit = {}
+            self.started = time.time()
+
+    def dump(self, path: str, extra: t.Optional[dict] = None) -> None:
+        """Atomically write a snapshot (plus extra values) as JSON to path. '{pid}' in path is
+        replaced with the process id, so sharded workers do not overwrite each other.
+        """
+        path = path.replace('{pid}', str(os.getpid()))
+        data = self.snapshot()
+        data['time'] = time.time()
+        data['pid'] = os.getpid()
+        data.update(extra or {})
+        with open(path + '-tmp', 'w') as metrics_fd:
+            json.dump(data, metrics_fd, indent=2, default=str)
+        os.rename(path + '-tmp', path)
+
+class _Timer:
+    # pylint: disable=too-few-public-methods
+    def __init__(self, metrics: Metrics, name: str) -> None:
+        self.metrics = metrics
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> '_Timer':
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.metrics.record(self.name, time.time() - self.start, exc_type is not None)
+
+# Shared by everything in the process
+METRICS = Metrics()
+
+def instrument(func: t.Callable, name: str) -> t.Callable:
+    """Wrap a function or coroutine function so every call is recorded as endpoint name"""
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with METRICS.timed(name):
+                return await func(*args, **kwargs)
+        async_wrapper.instrumented = True
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with METRICS.timed(name):
+            return func(*args, **kwargs)
+    wrapper.instrumented = True
+    return wrapper
+
+def instrument_class(cls: type, names: t.Iterable[str]) -> None:
+    """Instrument the methods in names that cls defines itself, recorded as Class.method"""
+    for name in names:
+        func = cls.__dict__.get(name)
+        if func is None or getattr(func, 'instrumented', False):
+            continue
+        setattr(cls, name, instrument(func, '{}.{}'.format(cls.__name__, name)))
@@ -0,0 +1,216 @@
+"""Deadline scheduler used by Botic to drive many processes from a single loop"""
+import heapq
+import time
+import threading
+import typing as t
+from concurrent.futures import Future
+from .clock import WALL_CLOCK
+
+class Job:
+    """A named, periodic unit of work tracked by the Scheduler.
+
+    Args:
+        name (str): Unique job name (the BoticProcess name for trader ticks)
+        interval (float): Seconds between the start of two runs
+        func (callable): Called as func(job) when the job is due. If it returns a Future, the run
+            is considered in progress until the Future is done.
+
+    Attributes:
+        due (float): Epoch time the job is next due
+        lag (float): How late (in seconds) the current/last run started
+        ticks (int): Number of times the job has run
+        lag_max (float): Largest lag seen
+        lag_total (float): Sum of all lags, used for averages
+        duration (float): Runtime of the last run
+        duration_max (float): Longest runtime seen
+        skipped (int): Deadlines skipped because the previous run was still in progress
+        pending (Future): The Future of the last run when func runs work asynchronously
+    """
+    # pylint: disable=too-many-instance-attributes
+    # pylint: disable=too-few-public-methods
+    def __init__(self, name: str, interval: float, func: t.Callable) -> None:
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.due = 0.0
+        self.lag = 0.0
+        self.ticks = 0
+        self.lag_max = 0.0
+        self.lag_total = 0.0
+        self.duration = 0.0
+        self.duration_max = 0.0
+        self.skipped = 0
+        self.pending = None
+
+    def record_duration(self, duration: float) -> None:
+        """Record how long a run took"""
+        self.duration = duration
+        self.duration_max = max(self.duration_max, duration)
+
+    def stats(self) -> dict:
+        """Return a summary of timing information for this job"""
+        return {
+            'interval': self.interval,
+            'due': self.due,
+            'ticks': self.ticks,
+            'lag': round(self.lag, 4),
+            'lag_max': round(self.lag_max, 4),
+            'lag_avg': round(self.lag_total / self.ticks, 4) if self.ticks else 0.0,
+            'duration': round(self.duration, 4),
+            'duration_max': round(self.duration_max, 4),
+            'skipped': self.skipped,
+        }
+
+class Scheduler:
+    """Min-heap of next due times per job. Sleeps exactly until the earliest deadline instead of
+    polling every job on every pass.
+
+    Jobs run at a fixed rate: the next deadline is computed from the previous deadline, not from
+    when the run finished, so slow runs do not make the schedule drift. Missed slots are skipped
+    rather than run back-to-back. A job never runs twice at once: if the previous run returned a
+    Future that is not done yet, the deadline is skipped.
+
+    Jobs can be added, removed and woken from other threads; sleep() returns early when a new
+    deadline is earlier than the one it was waiting for.
+
+    Deadlines are on the time of clock. With a virtual clock (backtesting), sleep() advances the
+    clock to the next deadline instead of waiting. Run durations are always measured on the wall
+    clock.
+
+    Args:
+        clock (WallClock or VirtualClock): Clock of the deadlines, the wall clock by default
+    """
+    def __init__(self, clock=WALL_CLOCK) -> None:
+        self.clock = clock
+        self.jobs = {}
+        self._heap = []
+        self._seq = 0
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+
+    def add(self, name: str, interval: float, func: t.Callable,
+            first_due: t.Optional[float] = None) -> Job:
+        """Add (or replace) a job. It is due immediately unless first_due is given."""
+        job = Job(name, interval, func)
+        with self._lock:
+            self.jobs[name] = job
+            self._push(job, self.clock.time() if first_due is None else first_due)
+        return job
+
+    def set_clock(self, clock) -> None:
+        """Switch to another clock, keeping every job's time left until it is due"""
+        with self._lock:
+            shift = clock.time() - self.clock.time()
+            self.clock = clock
+            jobs = list(self.jobs.values())
+            self._heap = []
+            for job in jobs:
+                self._push(job, job.due + shift)
+
+    def remove(self, name: str) -> None:
+        """Remove a job. Its heap entry is discarded lazily."""
+        with self._lock:
+            self.jobs.pop(name, None)
+
+    def wake(self, name: str) -> None:
+        """Make a job due now instead of at its next deadline"""
+        with self._lock:
+            job = self.jobs.get(name)
+            now = self.clock.time()
+            if job is not None and job.due > now:
+                self._push(job, now)
+
+    def _push(self, job: Job, due: float) -> None:
+        job.due = due
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, job))
+        if self._heap[0][2] is job:
+            self._wakeup.set()
+
+    def _next_due(self, job: Job, now: float) -> float:
+        due = job.due + job.interval
+        if due <= now and job.interval > 0:
+            # Skip missed slots but keep the original phase
+            due += ((now - due) // job.interval + 1) * job.interval
+        return due
+
+    def _peek(self) -> t.Optional[Job]:
+        """Return the job with the earliest deadline, dropping stale heap entries"""
+        while self._heap:
+            due, _, job = self._heap[0]
+            if self.jobs.get(job.name) is job and job.due == due:
+                return job
+            heapq.heappop(self._heap)
+        return None
+
+    def time_until_due(self) -> t.Optional[float]:
+        """Seconds until the next job is due (<= 0 means overdue), or None if no jobs exist"""
+        with self._lock:
+            job = self._peek()
+            if job is None:
+                return None
+            return job.due - self.clock.time()
+
+    def run_pending(self) -> int:
+        """Run every job whose deadline has passed.
+
+        Returns:
+            int: The number of jobs run
+        """
+        ran = 0
+        now = self.clock.time()
+        while 1:
+            with self._lock:
+                job = self._peek()
+                if job is None or job.due > now:
+                    break
+                heapq.heappop(self._heap)
+                due = job.due
+                self._push(job, self._next_due(job, now))
+                pending = job.pending
+                if pending is not None:
+                    if not pending.done():
+                        job.skipped += 1
+                        continue
+                    job.pending = None
+                job.lag = now - due
+                job.lag_max = max(job.lag_max, job.lag)
+                job.lag_total += job.lag
+                job.ticks += 1
+            if pending is not None:
+                # Surface errors from the previous asynchronous run
+                pending.result()
+            start = time.time()
+            result = job.func(job)
+            if isinstance(result, Future):
+                job.pending = result
+                result.add_done_callback(
+                    lambda _, job=job, start=start: job.record_duration(time.time() - start))
+            else:
+                job.record_duration(time.time() - start)
+            ran += 1
+            now = self.clock.time()
+        return ran
+
+    def sleep(self) -> None:
+        """Sleep until the earliest deadline"""
+        self._wakeup.clear()
+        wait = self.time_until_due()
+        if wait is None:
+            wait = 1.0
+        if wait > 0:
+            if self.clock.virtual:
+                self.clock.sleep(wait)
+            else:
+                self._wakeup.wait(wait)
+
+    def run_forever(self) -> None:
+        """Run jobs as they become due, forever"""
+        while 1:
+            self.run_pending()
+            self.sleep()
+
+    def stats(self) -> t.Dict[str, dict]:
+        """Return timing stats for every job"""
+        with self._lock:
+            return {name: job.stats() for name, job in self.jobs.items()}
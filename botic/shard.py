@@ -0,0 +1,184 @@
+"""Split the sections of one config file across several supervised worker processes"""
+import os
+import time
+import queue
+import typing as t
+import multiprocessing
+from .botic import Botic, load_config
+
+os.environ['TZ'] = 'UTC'
+time.tzset()
+
+def section_weight(config: dict) -> float:
+    """Return the relative load of a config section.
+
+    If general.shard_weight is set (> 0) it is used as-is, otherwise the weight is the number of
+    ticks per minute derived from general.sleep_seconds.
+
+    Args:
+        config (dict): A process config section (with global values inserted)
+
+    Returns:
+        float: The weight of the section
+    """
+    general = config.get('general', {}) or {}
+    weight = float(general.get('shard_weight', 0) or 0)
+    if weight > 0:
+        return weight
+    sleep_seconds = float(general.get('sleep_seconds', 60) or 60)
+    return 60.0 / max(sleep_seconds, 0.001)
+
+def assign_shards(weights: t.Mapping[str, float], workers: int) -> t.List[t.List[str]]:
+    """Assign section names to workers so the total weight per worker is balanced (greedy longest
+    processing time first).
+
+    Args:
+        weights (dict): {section_name: weight}
+        workers (int): Number of workers
+
+    Returns:
+        list: A list of section name lists, one per worker. Empty shards are dropped.
+    """
+    workers = max(1, min(workers, len(weights)))
+    shards = [[] for _ in range(workers)]
+    totals = [0.0] * workers
+    for name, weight in sorted(weights.items(), key=lambda x: x[1], reverse=True):
+        idx = totals.index(min(totals))
+        shards[idx].append(name)
+        totals[idx] += weight
+    return [shard for shard in shards if shard]
+
+def _worker(config_path: str, index: int, names: t.List[str], stats_queue,
+            stats_interval: float) -> None:
+    """Worker process entry point: run a Botic instance for a subset of sections"""
+    bot = Botic(config_path, names=names)
+
+    def report_stats(_job) -> None:
+        stats = bot.scheduler.stats()
+        stats = {name: val for name, val in stats.items() if name in bot.processes}
+        try:
+            stats_queue.put_nowait((index, os.getpid(), time.time(), stats))
+        except queue.Full:
+            pass
+
+    bot.scheduler.add('__stats__', stats_interval, report_stats,
+        first_due=time.time() + stats_interval)
+    try:
+        bot.run()
+    except KeyboardInterrupt:
+        pass
+
+class ShardWorker:
+    """Bookkeeping for one supervised worker process"""
+    # pylint: disable=too-few-public-methods
+    def __init__(self, index: int, names: t.List[str]) -> None:
+        self.index = index
+        self.names = names
+        self.process = None
+        self.started = 0.0
+        self.restarts = 0
+        self.restart_at = 0.0
+        self.backoff = 0.0
+        self.stats = {}
+        self.stats_time = 0.0
+
+class ShardSupervisor:
+    """Run the sections of one config file in N worker processes, restart crashed workers with
+    backoff and collect per-worker tick statistics.
+
+    Args:
+        config_path (str): The path to the yaml configuration file
+        workers (int): Number of worker processes, defaults to the number of CPUs
+        stats_interval (float): How often workers report scheduler stats (seconds)
+        max_backoff (float): Upper bound on the delay before restarting a crashed worker
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, config_path: str, workers: int = 0, stats_interval: float = 60.0,
+                 max_backoff: float = 300.0) -> None:
+        self.config_path = config_path
+        self.stats_interval = stats_interval
+        self.max_backoff = max_backoff
+        _, sections = load_config(config_path, do_print=False)
+        weights = {name: section_weight(config) for name, config in sections.items()}
+        if workers < 1:
+            workers = os.cpu_count() or 1
+        self.workers = [
+            ShardWorker(idx, names) for idx, names in enumerate(assign_shards(weights, workers))
+        ]
+        self.stats_queue = multiprocessing.Queue(maxsize=1000)
+        for worker in self.workers:
+            print('Shard {}: weight:{:.2f} {}'.format(
+                worker.index, sum(weights[name] for name in worker.names),
+                ','.join(worker.names)))
+
+    def _start(self, worker: ShardWorker) -> None:
+        worker.process = multiprocessing.Process(
+            target=_worker,
+            args=(self.config_path, worker.index, worker.names, self.stats_queue,
+                  self.stats_interval),
+            name='botic-shard-{}'.format(worker.index),
+        )
+        worker.process.start()
+        worker.started = time.time()
+        print('Shard {}: started pid:{}'.format(worker.index, worker.process.pid))
+
+    def _check(self, worker: ShardWorker) -> None:
+        """Schedule a restart for a dead worker and start it once the backoff has passed"""
+        now = time.time()
+        if worker.process is not None and worker.process.is_alive():
+            return
+        if worker.process is not None:
+            exitcode = worker.process.exitcode
+            worker.process = None
+            # Reset the backoff if the worker was healthy for a while
+            if now - worker.started > self.max_backoff:
+                worker.backoff = 0.0
+            worker.backoff = min(self.max_backoff, max(1.0, worker.backoff * 2))
+            worker.restart_at = now + worker.backoff
+            worker.restarts += 1
+            print('WARNING: Shard {} exited with code {}, restarting in {:.0f} seconds'.format(
+                worker.index, exitcode, worker.backoff))
+        if now >= worker.restart_at:
+            self._start(worker)
+
+    def _collect_stats(self, timeout: float) -> None:
+        try:
+            index, pid, stamp, stats = self.stats_queue.get(timeout=timeout)
+        except queue.Empty:
+            return
+        worker = self.workers[index]
+        worker.stats = stats
+        worker.stats_time = stamp
+        ticks = sum(val['ticks'] for val in stats.values())
+        lag_max = max([val['lag_max'] for val in stats.values()] or [0.0])
+        lag_avg = sum(val['lag_avg'] for val in stats.values()) / max(len(stats), 1)
+        print('Shard {}: pid:{} processes:{} ticks:{} lag-avg:{:.3f} lag-max:{:.3f} '
+            'restarts:{}'.format(index, pid, len(stats), ticks, lag_avg, lag_max,
+            worker.restarts))
+
+    def stats(self) -> t.Dict[int, dict]:
+        """Return the last reported scheduler stats for every worker"""
+        return {
+            worker.index: {
+                'pid': worker.process.pid if worker.process else None,
+                'names': worker.names,
+                'restarts': worker.restarts,
+                'stats_time': worker.stats_time,
+                'stats': worker.stats,
+            } for worker in self.workers
+        }
+
+    def run(self) -> None:
+        """Start all workers and supervise them forever"""
+        try:
+            while 1:
+                for worker in self.workers:
+                    self._check(worker)
+                self._collect_stats(timeout=1.0)
+        finally:
+            for worker in self.workers:
+                if worker.process is not None and worker.process.is_alive():
+                    worker.process.terminate()
+            for worker in self.workers:
+                if worker.process is not None:
+                    worker.process.join(5)
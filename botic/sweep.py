@@ -0,0 +1,150 @@
+"""Parallel parameter sweep of Simple backtests
+
+Runs the vectorized Simple backtest (see vectorbacktest.py) for every combination of parameter
+grids on a process pool and prints one results table. Each worker loads the candles once and
+reuses them for every run, and nothing is written to the data or log directories.
+
+    boticsweep backtest.yaml --grid sell_target=0.5,1,1.5 --grid buy_barrier=0.5:2:0.5 \\
+        --grid stoploss_strategy=report,either --csv sweep.csv
+"""
+import os
+import sys
+import time
+import argparse
+import itertools
+import typing as t
+from decimal import Decimal
+from concurrent.futures import ProcessPoolExecutor
+from .util import getconf
+from .botic import load_config
+from .exchange.candles import get_candle_store
+from .vectorbacktest import SimpleVectorBacktest
+
+# Simple settings that can be swept
+SWEEP_KEYS = (
+    'max_outstanding_sells', 'max_buys_per_hour', 'sell_target', 'buy_barrier', 'buy_percent',
+    'buy_max', 'buy_min', 'stoploss_enable', 'stoploss_percent', 'stoploss_seconds',
+    'stoploss_strategy',
+)
+RESULT_COLUMNS = ('value', 'wallet', 'profit', 'max_drawdown', 'buys', 'filled', 'stoplosses',
+                  'open')
+
+def parse_grid(spec: str) -> t.Tuple[str, t.List[str]]:
+    """Parse a grid: key=v1,v2,... or key=start:stop:step (stop included)
+
+    Raises:
+        ValueError: Unknown key or bad range
+    """
+    key, _, values = spec.partition('=')
+    key = key.strip()
+    if not key in SWEEP_KEYS:
+        raise ValueError('Unknown sweep key {}, expected one of: {}'.format(
+            key, ', '.join(SWEEP_KEYS)))
+    if values.count(':') == 2:
+        start, stop, step = [Decimal(i) for i in values.split(':')]
+        if step <= 0:
+            raise ValueError('Step must be > 0: {}'.format(spec))
+        grid = []
+        while start <= stop:
+            grid.append(str(start))
+            start += step
+        return key, grid
+    return key, [i.strip() for i in values.split(',') if i.strip()]
+
+def combinations(grids: t.List[t.Tuple[str, t.List[str]]]) -> t.List[t.Dict[str, str]]:
+    """Every combination of the grids as trader overrides"""
+    keys = [key for key, _ in grids]
+    return [dict(zip(keys, values)) for values in itertools.product(*[i for _, i in grids])]
+
+# Per worker process state, set by _init_worker()
+_WORKER = {}
+
+def _init_worker(config: dict, ticks: t.Optional[int]) -> None:
+    """Load the candles once per worker, every run of the worker reuses them"""
+    _WORKER['config'] = config
+    _WORKER['ticks'] = ticks
+    _WORKER['store'] = get_candle_store(
+        getconf(config, 'exchange', 'backtest_candles', str, '') or None)
+
+def _run(overrides: t.Dict[str, str]) -> dict:
+    config = dict(_WORKER['config'])
+    config['trader'] = dict(config['trader'], **overrides)
+    started = time.time()
+    result = SimpleVectorBacktest(config, store=_WORKER['store'], ticks=_WORKER['ticks']).run()
+    row = dict(overrides)
+    row.update({key: result[key] for key in RESULT_COLUMNS})
+    row['seconds'] = time.time() - started
+    return row
+
+def sweep(config: dict, grids: t.List[t.Tuple[str, t.List[str]]], workers: int = 0,
+          ticks: t.Optional[int] = None) -> t.List[dict]:
+    """Backtest every combination of grids on a pool of workers
+
+    Args:
+        config (dict): Process config with a Simple trader section, the base of every run
+        grids (list): (key, values) pairs of trader settings, see parse_grid()
+        workers (int): Worker processes (0 = one per CPU)
+        ticks (int): Max ticks per run (default: the whole candle series)
+
+    Returns:
+        list: One dict per run with the swept settings and the RESULT_COLUMNS
+    """
+    runs = combinations(grids)
+    workers = min(workers or os.cpu_count() or 1, len(runs)) or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(config, ticks)) as executor:
+        return list(executor.map(_run, runs, chunksize=max(1, len(runs) // (workers * 4))))
+
+def _format(value: t.Any) -> str:
+    if isinstance(value, float):
+        return '{:.4f}'.format(value)
+    if isinstance(value, Decimal):
+        return '{:.2f}'.format(value)
+    return str(value)
+
+def main() -> None:
+    """Sweep Simple settings of one config section and print the results table"""
+    parser = argparse.ArgumentParser(description='Parallel parameter sweep of Simple backtests')
+    parser.add_argument('config', help='botic yaml config with a Backtest exchange')
+    parser.add_argument('--section', help='Section to sweep (default: the first Simple section)')
+    parser.add_argument('--grid', action='append', required=True,
+        help='key=v1,v2,... or key=start:stop:step, may be repeated')
+    parser.add_argument('--workers', type=int, default=0, help='Worker processes (0 = CPUs)')
+    parser.add_argument('--ticks', type=int, help='Max ticks (price path points) per run')
+    parser.add_argument('--sort', default='value', choices=RESULT_COLUMNS,
+        help='Sort the table by this column (descending, max_drawdown ascending)')
+    parser.add_argument('--top', type=int, default=0, help='Only print the N best runs')
+    parser.add_argument('--csv', help='Also write every result to this CSV file')
+    args = parser.parse_args()
+    try:
+        grids = [parse_grid(i) for i in args.grid]
+    except ValueError as err:
+        print('ERROR: {}'.format(err))
+        sys.exit(1)
+    _, sections = load_config(args.config, do_print=False)
+    name = args.section
+    if name is None:
+        simple = [key for key, val in sections.items()
+                  if val['trader'].get('trader_module', 'Simple') == 'Simple']
+        if not simple:
+            print('ERROR: No Simple section in {}'.format(args.config))
+            sys.exit(1)
+        name = simple[0]
+    started = time.time()
+    rows = sweep(sections[name], grids, workers=args.workers, ticks=args.ticks)
+    rows.sort(key=lambda row: row[args.sort], reverse=args.sort != 'max_drawdown')
+    columns = [key for key, _ in grids] + list(RESULT_COLUMNS)
+    if args.csv:
+        with open(args.csv, 'w') as csv_fd:
+            csv_fd.write(','.join(columns) + '\n')
+            for row in rows:
+                csv_fd.write(','.join([str(row[key]) for key in columns]) + '\n')
+    table = [columns] + [[_format(row[key]) for key in columns]
+                         for row in rows[:args.top or len(rows)]]
+    widths = [max([len(line[idx]) for line in table]) for idx in range(len(columns))]
+    for line in table:
+        print('  '.join([val.rjust(width) for val, width in zip(line, widths)]))
+    print('{}: {} runs in {:.1f} seconds'.format(name, len(rows), time.time() - started))
+
+if __name__ == '__main__':
+    main()
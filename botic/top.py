@@ -10,7 +10,7 @@ from decimal import Decimal
 from operator import getitem
 import curses
 from curses import endwin
-import cbpro
+from botic.exchange.clients import get_public_client
 
 os.environ['TZ'] = 'UTC'
 time.tzset()
@@ -31,7 +31,7 @@ def get_current_price(pair):
     last_update = time.time()
     current_price = Decimal('0.0')
     if not pair in PRICE_CACHE:
-        public_client = cbpro.PublicClient()
+        public_client = get_public_client()
         ticker = public_client.get_product_ticker(product_id=pair)
         try:
             current_price = Decimal(ticker['price'])
@@ -40,7 +40,7 @@ def get_current_price(pair):
     else:
         # check cache age
         if time.time() - PRICE_CACHE[pair]['last_update'] > PRICE_CACHE_RATE:
-            public_client = cbpro.PublicClient()
+            public_client = get_public_client()
             ticker = public_client.get_product_ticker(product_id=pair)
             current_price = Decimal(ticker['price'])
         else:
@@ -0,0 +1,90 @@
+"""Base class for asyncio traders and an adapter to run sync traders on an event loop"""
+import asyncio
+import importlib
+import typing as t
+from abc import abstractmethod
+from concurrent.futures import Executor
+from ..util import configure
+from ..clock import async_sleep
+from .base import BaseTrader, UnknownExchangeModuleError
+
+class AsyncBaseTrader(BaseTrader):
+    """Base class for traders whose run_trading_algorithm() is a coroutine. The exchange module
+    must be an AsyncBaseExchange (e.g. exchange_module: AsyncCoinbasePro).
+    """
+    # pylint: disable=no-member
+    # pylint: disable=invalid-overridden-method
+    async def _init_async(self, exchange=None) -> None:
+        """Initialize configuration, lock, data and load exchange
+
+        Args:
+            exchange (AsyncBaseExchange): Optional already authenticated exchange to reuse
+        """
+        self.configure()
+        self.init_lock()
+        self.init_data()
+        if exchange is None:
+            await self._load_exchange_async()
+        else:
+            self.exchange = exchange
+        self.clock = self.exchange.clock
+
+    async def _load_exchange_async(self) -> None:
+        """Load and authenticate the exchange module specified in the config"""
+        mod_path = 'botic.exchange.{}'.format(self.exchange_module.lower())
+        mod = importlib.import_module(mod_path)
+        obj = getattr(mod, self.exchange_module, None)
+        if not obj:
+            raise UnknownExchangeModuleError('Unknown exchange module: {}'.format(
+                self.exchange_module))
+        self.exchange = obj(self.config)
+        configure(self.process_name, self.exchange, do_print=False)
+        await self.exchange.authenticate()
+
+    async def sleep(self, seconds: float) -> None:
+        """Sleep on the exchange clock without blocking the event loop"""
+        await async_sleep(self.clock, seconds)
+
+    def send_email(self, subject: str, msg: t.Optional[t.AnyStr] = None) -> None:
+        """Send the email from the event loop's default executor so SMTP can not block the
+        loop. Failures are logged.
+        """
+        future = asyncio.get_running_loop().run_in_executor(
+            None, super().send_email, subject, msg)
+        future.add_done_callback(self._email_done)
+
+    def _email_done(self, future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            self.logit('WARNING: Failed to send email: {}'.format(future.exception()))
+
+    @abstractmethod
+    async def run_trading_algorithm(self) -> None:
+        """Run the traders main algorithim. Exchange calls must be awaited and the trader must
+        never block the event loop (e.g. use asyncio.sleep() instead of time.sleep()).
+        """
+
+class SyncTraderAdapter:
+    """Run a sync BaseTrader under the asyncio runner. Each blocking call runs in a thread of
+    executor (the event loop's default executor when None), so one sync trader can not stall the
+    others. Every other attribute is read from the wrapped trader.
+
+    Args:
+        trader (BaseTrader): The sync trader
+        executor (Executor): Executor for blocking calls
+    """
+    def __init__(self, trader: BaseTrader, executor: t.Optional[Executor] = None) -> None:
+        self.trader = trader
+        self.executor = executor
+
+    def __getattr__(self, name: str) -> t.Any:
+        return getattr(self.trader, name)
+
+    async def _call(self, func: t.Callable, *args) -> t.Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _init_async(self, exchange=None) -> None:
+        # pylint: disable=protected-access
+        await self._call(self.trader._init, exchange)
+
+    async def run_trading_algorithm(self) -> None:
+        await self._call(self.trader.run_trading_algorithm)
@@ -0,0 +1,31 @@
+"""Simple trader on asyncio"""
+import typing as t
+from .asyncbase import AsyncBaseTrader
+from .simple import Simple
+
+class AsyncSimple(AsyncBaseTrader, Simple):
+    """The Simple trader on an AsyncBaseExchange (e.g. exchange_module: AsyncCoinbasePro or
+    AsyncBacktest). It runs Simple's trading flow, only the exchange calls and sleeps are awaited.
+    """
+    # pylint: disable=invalid-overridden-method
+    # pylint: disable=too-many-ancestors
+    async def run_trading_algorithm(self) -> None:
+        await self._run_steps_async(self._tick())
+
+    async def _run_steps_async(self, steps: t.Generator) -> t.Any:
+        """Simple._run_steps() for an asyncio exchange"""
+        # pylint: disable=broad-except
+        result = error = None
+        while 1:
+            try:
+                step = steps.send(result) if error is None else steps.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            result = error = None
+            try:
+                if step[0] == 'sleep':
+                    await self.sleep(step[1])
+                else:
+                    result = await getattr(self.exchange, step[0])(*step[1:])
+            except Exception as err:
+                error = err
@@ -2,10 +2,12 @@
 import os
 import time
 import importlib
+import typing as t
+from decimal import Decimal
 from random import uniform
 from abc import abstractmethod
 from ..basebot import BaseBot
-from ..botic import configure
+from ..util import configure
 
 class UnknownExchangeModuleError(Exception):
     """Unknown trader module"""
@@ -15,12 +17,22 @@ class BaseTrader(BaseBot):
     # pylint: disable=too-many-instance-attributes
     # pylint: disable=no-member
     # pylint: disable=attribute-defined-outside-init
-    def _init(self) -> None:
-        """Initialize configuration, lock, data and load exchange"""
+    def _init(self, exchange=None) -> None:
+        """Initialize configuration, lock, data and load exchange
+
+        Args:
+            exchange (BaseExchange): Optional already authenticated exchange to reuse (e.g. when a
+                process is restarted in place)
+        """
         self.configure()
         self.init_lock()
         self.init_data()
-        self._load_exchange()
+        if exchange is None:
+            self._load_exchange()
+        else:
+            self.exchange = exchange
+        # Backtests run on the virtual time of the exchange
+        self.clock = self.exchange.clock
 
     def _load_exchange(self) -> None:
         """Load the exchange module specified in the config.
@@ -39,8 +51,8 @@ class BaseTrader(BaseBot):
             raise UnknownExchangeModuleError('Unknown exchange module: {}'.format(
                 self.exchange_module))
         self.exchange = obj(self.config)
-        self.exchange.authenticate()
         configure(self.process_name, self.exchange, do_print=False)
+        self.exchange.authenticate()
 
     @abstractmethod
     def configure(self) -> None:
@@ -52,3 +64,27 @@ class BaseTrader(BaseBot):
         to fetch data and place buys/sells.
         """
 
+
+    def price_thresholds(self) -> t.Optional[t.Tuple[t.Optional[Decimal], t.Optional[Decimal],
+                                                     t.Optional[float]]]:
+        """Optional override: Report when the next tick can do something, so idle traders are only
+        woken by the price watcher when needed (sleep_seconds stays the max interval).
+
+        Called after each run_trading_algorithm().
+
+        Returns:
+            tuple: (low, high, not_after). Wake when the price is <= low or >= high, or once the
+                exchange time reaches not_after. Any value can be None. Returning None means
+                thresholds are not supported and the trader ticks every sleep_seconds.
+        """
+        # pylint: disable=no-self-use
+        return None
+
+    def state(self) -> dict:
+        """Optional override: Return in-memory state for inspection (e.g. via the control
+        socket). Values should be JSON serializable or convertible with str().
+        """
+        return {
+            'pair': getattr(self, 'pair', None),
+            'orders': len(getattr(self, 'data', {})),
+        }
@@ -28,6 +28,7 @@ class Simple(BaseTrader):
         self.current_price_increase = None
         self.wallet = None
         self.can_buy = False
+        # Wall time on purpose: limits output, also when backtesting on virtual time
         self._rate_limit_log = time.time()
 
     def configure(self) -> None:
@@ -47,16 +48,50 @@ class Simple(BaseTrader):
         return datetime.datetime.fromtimestamp(self.exchange.get_time())
 
     def run_trading_algorithm(self) -> None:
-        self.product_info = self.exchange.get_product_info()
-        self.current_price = self.exchange.get_price()
-        self.maker_fee, self.taker_fee, self.usd_volume = self.exchange.get_fees()
-        self.size_decimal_places, self.usd_decimal_places = self.exchange.get_precisions()
-        self.wallet = self.exchange.get_usd_wallet()
+        self._run_steps(self._tick())
+
+    def _run_steps(self, steps: t.Generator) -> t.Any:
+        """Run the steps of a trading flow. A flow is written once as a generator that yields
+        its I/O as steps and receives the results, so the same flow runs on a sync exchange here
+        and on an asyncio exchange in AsyncSimple:
+            - (method, *args): call exchange.method(*args). The return value is sent back, an
+              exception it raises is thrown into the flow.
+            - ('sleep', seconds): sleep on the exchange clock
+
+        Returns:
+            any: The return value of the flow
+        """
+        # pylint: disable=broad-except
+        result = error = None
+        while 1:
+            try:
+                step = steps.send(result) if error is None else steps.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            result = error = None
+            try:
+                if step[0] == 'sleep':
+                    self.clock.sleep(step[1])
+                else:
+                    result = getattr(self.exchange, step[0])(*step[1:])
+            except Exception as err:
+                error = err
+
+    def _tick(self) -> t.Generator:
+        """Steps of one tick of the trading algorithm, see _run_steps()"""
+        self.product_info = yield ('get_product_info',)
+        self.current_price = yield ('get_price',)
+        self.maker_fee, self.taker_fee, self.usd_volume = yield ('get_fees',)
+        self.size_decimal_places, self.usd_decimal_places = yield ('get_precisions',)
+        self.wallet = yield ('get_usd_wallet',)
         self._get_current_price_target()
         self.can_buy = self._check_if_can_buy()
-        self._maybe_buy_sell()
-        self._check_sell_orders()
-        hold_value = self.exchange.get_hold_value()
+        yield from self._maybe_buy_sell()
+        yield from self._check_sell_orders()
+        self._log_status((yield ('get_hold_value',)))
+
+    def _log_status(self, hold_value: Decimal) -> None:
+        """Log the wallet and open orders, at most twice per second"""
         if time.time() - self._rate_limit_log > 0.5:
             self._rate_limit_log = time.time()
             total_value = hold_value + self.wallet
@@ -66,6 +101,17 @@ class Simple(BaseTrader):
                 self.can_buy, total_value),
                 custom_datetime=self._time2datetime())
 
+    def state(self) -> dict:
+        state = super().state()
+        state.update({
+            'current_price': self.current_price,
+            'current_price_target': self.current_price_target,
+            'wallet': self.wallet,
+            'can_buy': self.can_buy,
+            'open_orders': self._total_open_orders if hasattr(self, 'data') else None,
+        })
+        return state
+
     @property
     def _total_open_orders(self) -> int:
         total = 0
@@ -135,12 +181,135 @@ class Simple(BaseTrader):
                 break
         return can
 
+    def price_thresholds(self) -> t.Optional[t.Tuple[t.Optional[Decimal], t.Optional[Decimal],
+                                                     t.Optional[float]]]:
+        """Work out which price moves (or times) could make the next tick do anything:
+            - low: the price where the buy barrier stops blocking a buy, or a stoploss price
+            - high: the lowest open sell price (a sell fill)
+            - not_after: when max_buys_per_hour or stoploss_seconds stop/start blocking
+        """
+        # pylint: disable=too-many-locals
+        if self.current_price is None or self.maker_fee is None:
+            return None
+        fees = self.maker_fee + self.taker_fee
+        low = None
+        high = None
+        not_after = None
+        min_adjusted_sell_price = None
+        for _, order in self.data.items():
+            if order['completed']:
+                continue
+            sell_order = order['sell_order']
+            if not sell_order or not 'price' in sell_order:
+                continue
+            if sell_order.get('settled'):
+                # Settled but not marked as completed yet, the next tick has work to do
+                return None
+            sell_price = Decimal(sell_order['price'])
+            if high is None or sell_price < high:
+                high = sell_price
+            adjusted_sell_price = round(
+                sell_price - ((Decimal(self.buy_barrier) + fees) * sell_price),
+                self.usd_decimal_places
+            )
+            if min_adjusted_sell_price is None or adjusted_sell_price < min_adjusted_sell_price:
+                min_adjusted_sell_price = adjusted_sell_price
+            if not self.stoploss_enable or self.stoploss_strategy not in ('both', 'either'):
+                continue
+            stop_time = time.mktime(
+                time.strptime(parse_datetime(sell_order['created_at']), '%Y-%m-%dT%H:%M:%S')
+            ) + self.stoploss_seconds
+            bought_price = round(
+                Decimal(order['last_status']['executed_value']) /
+                Decimal(order['last_status']['filled_size']),
+                4
+            )
+            stop_price = bought_price + bought_price * self.stoploss_percent
+            if self.stoploss_strategy == 'either' or self.exchange.get_time() >= stop_time:
+                low = stop_price if low is None else max(low, stop_price)
+            if self.exchange.get_time() < stop_time:
+                not_after = stop_time if not_after is None else min(not_after, stop_time)
+
+        # A buy can only be unblocked by price if nothing else is blocking it
+        blocked = (
+            self._total_open_orders >= self.max_outstanding_sells or
+            self.wallet < Decimal(self.product_info.min_market_funds) or
+            self.wallet < self.buy_min
+        )
+        recent = sorted([order['time'] for _, order in self.data.items()], reverse=True)
+        if len(recent) > self.max_buys_per_hour:
+            hour_free = recent[self.max_buys_per_hour] + 60 * 60
+            if hour_free >= self.exchange.get_time():
+                blocked = True
+                not_after = hour_free if not_after is None else min(not_after, hour_free)
+        if not blocked and min_adjusted_sell_price is None:
+            # Nothing is blocking a buy, the next tick can act at any price
+            return None
+        if not blocked:
+            buy_price = min_adjusted_sell_price / (1 + fees + self.sell_target)
+            low = buy_price if low is None else max(low, buy_price)
+        return (low, high, not_after)
+
 
-    def _maybe_buy_sell(self) -> None:
+    def _maybe_buy_sell(self) -> t.Generator:
+        """Steps to buy and place the limit sell, see _run_steps()"""
+        buy_amount = self._buy_amount()
+        if buy_amount is None:
+            return
+        response = yield ('buy_market', buy_amount)
+        order_id = self._record_buy(response)
+        if order_id is None:
+            return
+        errors = 0
+        done = False
+        status_errors = 0
+        buy = {}
+        # Wait until order is completely filled
+        while 1:
+            try:
+                buy = yield ('get_order', order_id)
+                if self._buy_status(order_id, buy):
+                    done = True
+                    break
+                if not 'settled' in buy:
+                    yield from self._handle_failed_order_status(order_id, buy)
+                    status_errors += 1
+                if status_errors > 10:
+                    errors += 1
+            except Exception as err:
+                self.logit('WARNING: get_order() failed:' + str(err),
+                    custom_datetime=self._time2datetime())
+                errors += 1
+                yield ('sleep', 1)
+            if errors > 5:
+                self.logit('WARNING: Failed to get order. Manual intervention needed.: {}'.format(
+                    order_id),
+                    custom_datetime=self._time2datetime())
+                break
+
+        # Buy order done, now place sell
+        if done:
+            try:
+                response = yield ('sell_limit', self.current_price_target,
+                                  self.last_buy['filled_size'])
+                self._record_sell(order_id, response)
+            except ExchangeSellLimitError as err:
+                self._record_sell_error(order_id, err)
+            self.write_data()
+            self.last_buy = None
+        else:
+            self._buy_not_confirmed(buy)
+
+    def _buy_amount(self) -> t.Optional[Decimal]:
+        """Work out the amount (USD) to buy with
+
+        Returns:
+            Decimal: The buy amount, or None if no buy should be placed
+        """
         assert self.wallet is not None, 'Wallet must be set.'
         assert self.current_price is not None, 'Current price must be set.'
         if not self.can_buy:
-            return
+            return None
 
         # Check if USD wallet has enough available
         if self.wallet < Decimal(self.product_info.min_market_funds):
@@ -148,7 +317,7 @@ class Simple(BaseTrader):
             #    self.product_info.min_market_funds, self.wallet),
             #    custom_datetime=self._time2datetime()
             #)
-            return
+            return None
 
         # Calculate & check if size is big enough (sometimes its not if wallet is too small)
         buy_amount = round(
@@ -187,7 +356,7 @@ class Simple(BaseTrader):
             buy_amount = self.buy_max
 
         if Decimal(self.wallet) < Decimal(self.buy_min):
-            return
+            return None
 
         # adjust size to fit with fee
         buy_size = round(
@@ -198,15 +367,20 @@ class Simple(BaseTrader):
             self.current_price, buy_amount, buy_size),
             custom_datetime=self._time2datetime()
         )
-        response = self.exchange.buy_market(buy_amount)
+        return buy_amount
+
+    def _record_buy(self, response: dict) -> t.Optional[str]:
+        """Track a placed market buy
+
+        Returns:
+            str: The order id, or None if the buy failed
+        """
         self.logit('BUY-RESPONSE: {}'.format(response), custom_datetime=self._time2datetime())
         if 'message' in response:
             self.logit('WARNING: Failed to buy', custom_datetime=self._time2datetime())
-            return
+            return None
         order_id = response['id']
-        errors = 0
         self.last_buy = None
-        # Wait until order is completely filled
         if order_id in self.data:
             self.logit('ERROR: order_id exists in data. ????: {}'.format(order_id),
                 custom_datetime=self._time2datetime())
@@ -216,75 +390,57 @@ class Simple(BaseTrader):
             'completed': False, 'profit_usd': None
         }
         self.write_data()
-        done = False
-        status_errors = 0
-        buy = {}
-        while 1:
-            try:
-                buy = self.exchange.get_order(order_id)
-                self.data[order_id]['last_status'] = buy
-                self.write_data()
-                if 'settled' in buy:
-                    if buy['settled']:
-                        self.logit('BUY-FILLED: size:{} funds:{}'.format(
-                            buy['filled_size'], buy['funds']),
-                            custom_datetime=self._time2datetime())
-                        self.last_buy = buy
-                        done = True
-                        break
-                else:
-                    self._handle_failed_order_status(order_id, buy, status_errors)
-                    status_errors += 1
-                if status_errors > 10:
-                    errors += 1
-            except Exception as err:
-                self.logit('WARNING: get_order() failed:' + str(err),
-                    custom_datetime=self._time2datetime())
-                errors += 1
-                time.sleep(1)
-            if errors > 5:
-                self.logit('WARNING: Failed to get order. Manual intervention needed.: {}'.format(
-                    order_id),
-                    custom_datetime=self._time2datetime())
-                break
+        return order_id
 
-        # Buy order done, now place sell
-        if done:
-            msg = ''
-            #'BUY-FILLED: size:{} funds:{}\n'.format(buy['filled_size'], buy['funds'])
-            #self.logit(msg, custom_datetime=self._time2datetime())
-            try:
-                response = self.exchange.sell_limit(
-                    self.current_price_target,
-                    self.last_buy['filled_size']
-                )
-                self.logit('SELL-RESPONSE: {}'.format(response),
-                    custom_datetime=self._time2datetime())
-                msg = '{} SELL-PLACED: size:{} price:{}'.format(
-                    msg, self.last_buy['filled_size'], self.current_price_target)
-                for i in msg.split('\n'):
-                    self.logit(i.strip(), custom_datetime=self._time2datetime())
-                if not self.notify_only_sold:
-                    self.send_email('BUY/SELL', msg=msg)
-                self.data[order_id]['sell_order'] = response
-            except ExchangeSellLimitError as err:
-                self.logit('ExchangeSellLimitError: {}'.format(err),
-                    custom_datetime=self._time2datetime())
-                self.data[order_id]['completed'] = True
-                self.data[order_id]['sell_order'] = None
-            self.write_data()
-            self.last_buy = None
+    def _buy_status(self, order_id: str, buy: dict) -> bool:
+        """Track the status of a buy
+
+        Returns:
+            bool: True if the buy is filled
+        """
+        self.data[order_id]['last_status'] = buy
+        self.write_data()
+        if buy.get('settled'):
+            self.logit('BUY-FILLED: size:{} funds:{}'.format(
+                buy['filled_size'], buy['funds']),
+                custom_datetime=self._time2datetime())
+            self.last_buy = buy
+            return True
+        return False
+
+    def _record_sell(self, order_id: str, response: dict) -> None:
+        """Track the limit sell placed for a filled buy"""
+        msg = ''
+        #'BUY-FILLED: size:{} funds:{}\n'.format(buy['filled_size'], buy['funds'])
+        #self.logit(msg, custom_datetime=self._time2datetime())
+        self.logit('SELL-RESPONSE: {}'.format(response),
+            custom_datetime=self._time2datetime())
+        msg = '{} SELL-PLACED: size:{} price:{}'.format(
+            msg, self.last_buy['filled_size'], self.current_price_target)
+        for i in msg.split('\n'):
+            self.logit(i.strip(), custom_datetime=self._time2datetime())
+        if not self.notify_only_sold:
+            self.send_email('BUY/SELL', msg=msg)
+        self.data[order_id]['sell_order'] = response
+
+    def _record_sell_error(self, order_id: str, err: Exception) -> None:
+        self.logit('ExchangeSellLimitError: {}'.format(err),
+            custom_datetime=self._time2datetime())
+        self.data[order_id]['completed'] = True
+        self.data[order_id]['sell_order'] = None
+
+    def _buy_not_confirmed(self, buy: dict) -> None:
+        """The buy was placed but its status could not be fetched"""
+        if 'message' in buy:
+            msg = 'BUY-PLACED-NOSTATUS: {}\n'.format(buy['message'])
         else:
-            # buy was placed but could not get order status
-            if 'message' in buy:
-                msg = 'BUY-PLACED-NOSTATUS: {}\n'.format(buy['message'])
-            else:
-                msg = 'BUY-PLACED-NOSTATUS: size:{} funds:{}\n'.format(
-                    buy['filled_size'], buy['funds'])
-            self.logit(msg, custom_datetime=self._time2datetime())
-            self.send_email('BUY-ERROR', msg=msg)
+            msg = 'BUY-PLACED-NOSTATUS: size:{} funds:{}\n'.format(
+                buy['filled_size'], buy['funds'])
+        self.logit(msg, custom_datetime=self._time2datetime())
+        self.send_email('BUY-ERROR', msg=msg)
 
-    def _handle_failed_order_status(self, order_id: str, status: t.Mapping[str, t.Any]) -> None:
+    def _handle_failed_order_status(self, order_id: str,
+                                    status: t.Mapping[str, t.Any]) -> t.Generator:
         if 'message' in status:
             self.logit('WARNING: Failed to get order status: {}'.format(status['message']),
                 custom_datetime=self._time2datetime())
@@ -296,43 +452,32 @@ class Simple(BaseTrader):
         else:
             self.logit('WARNING: Failed to get order status: {}'.format(order_id),
                 custom_datetime=self._time2datetime())
-        time.sleep(0.5)
+        yield ('sleep', 0.5)
 
-    def _run_stoploss(self, buy_order_id: t.AnyStr) -> None:
-        """ Cancel sell order, place new market sell to fill immediately
+    def _run_stoploss(self, buy_order_id: t.AnyStr) -> t.Generator:
+        """ Steps to cancel sell order, place new market sell to fill immediately
             get response and update data
         """
         info = self.data[buy_order_id]
         sell = info['sell_order']
         # cancel
-        response = self.exchange.cancel(sell['id'])
+        response = yield ('cancel', sell['id'])
         self.logit('STOPLOSS: CANCEL-RESPONSE: {}'.format(response),
             custom_datetime=self._time2datetime())
         # new order
-        response = self.exchange.sell_market(sell['size'])
-        self.data[buy_order_id]['sell_order'] = response
-        self.write_data()
-        self.logit('STOPLOSS: SELL-RESPONSE: {}'.format(response),
-            custom_datetime=self._time2datetime())
-        order_id = response['id']
+        response = yield ('sell_market', sell['size'])
+        order_id = self._record_stoploss_sell(buy_order_id, response)
         done = False
         errors = 0
         status_errors = 0
         while 1:
             try:
-                status = self.exchange.get_order(order_id)
-                self.data[buy_order_id]['sell_order'] = status
-                self.write_data()
-                if 'settled' in status:
-                    if status['settled']:
-                        self.logit('SELL-FILLED: {}'.format(status),
-                            custom_datetime=self._time2datetime())
-                        self.data[buy_order_id]['sell_order_completed'] = status
-                        self.write_data()
-                        done = True
-                        break
-                else:
-                    self.handle_failed_order_status(order_id, status)
+                status = yield ('get_order', order_id)
+                if self._stoploss_status(buy_order_id, status):
+                    done = True
+                    break
+                if not 'settled' in status:
+                    yield from self._handle_failed_order_status(order_id, status)
                     status_errors += 1
                 if status_errors > 10:
                     errors += 1
@@ -340,141 +485,209 @@ class Simple(BaseTrader):
                 self.logit('WARNING: get_order() failed:' + str(err),
                     custom_datetime=self._time2datetime())
                 errors += 1
-                time.sleep(1)
+                yield ('sleep', 1)
             if errors > 5:
                 self.logit('WARNING: Failed to get order. Manual intervention needed.: {}'.format(
                     order_id),
                     custom_datetime=self._time2datetime())
                 break
-            time.sleep(1)
+            yield ('sleep', 1)
 
         if not done:
-            self.logit(
-                'ERROR: Failed to get_order() for stoploss. This is a TODO item on how to handle',
-                custom_datetime=self._time2datetime()
-            )
+            self._stoploss_not_confirmed()
 
-    def _check_sell_orders(self) -> None:
-        """ Check if any sell orders have completed """
-        # pylint: disable=too-many-locals
-        # pylint: disable=bare-except
+    def _record_stoploss_sell(self, buy_order_id: str, response: dict) -> str:
+        """Track the market sell placed by a stoploss
+
+        Returns:
+            str: The order id of the sell
+        """
+        self.data[buy_order_id]['sell_order'] = response
+        self.write_data()
+        self.logit('STOPLOSS: SELL-RESPONSE: {}'.format(response),
+            custom_datetime=self._time2datetime())
+        return response['id']
+
+    def _stoploss_status(self, buy_order_id: str, status: dict) -> bool:
+        """Track the status of a stoploss sell
+
+        Returns:
+            bool: True if the sell is filled
+        """
+        self.data[buy_order_id]['sell_order'] = status
+        self.write_data()
+        if status.get('settled'):
+            self.logit('SELL-FILLED: {}'.format(status),
+                custom_datetime=self._time2datetime())
+            self.data[buy_order_id]['sell_order_completed'] = status
+            self.write_data()
+            return True
+        return False
+
+    def _stoploss_not_confirmed(self) -> None:
+        self.logit(
+            'ERROR: Failed to get_order() for stoploss. This is a TODO item on how to handle',
+            custom_datetime=self._time2datetime()
+        )
+
+    def _check_sell_orders(self) -> t.Generator:
+        """ Steps to check if any sell orders have completed """
+        # pylint: disable=broad-except
+        open_orders = None
+        if self.reconcile_orders:
+            try:
+                open_orders = yield ('get_open_orders',)
+            except Exception as err:
+                self.logit('WARNING: Failed to list open orders, checking each order: {}'.format(
+                    err), custom_datetime=self._time2datetime())
         for buy_order_id, info in self.data.items():
-            if self.data[buy_order_id]['completed']:
-                continue
-            if not info['sell_order']:
-                self.logit('WARNING: No sell_order for buy {}. This should not happen.'.format(
-                    buy_order_id), custom_datetime=self._time2datetime())
-                if self.exchange.get_time() - info['time'] > 60 * 60 * 2:
-                    self.logit('WARNING: Failed to get order status:',
-                        custom_datetime=self._time2datetime())
-                    self.logit('WARNING: Writing as done/error since it has been > 2 hours.',
-                        custom_datetime=self._time2datetime())
-                    self.data[buy_order_id]['completed'] = True
-                    self.write_data()
-                continue
-            if 'message' in info['sell_order']:
-                self.logit(
-                    'WARNING: Corrupted sell order, mark as done: {}'.format(info['sell_order']),
-                    custom_datetime=self._time2datetime())
-                self.data[buy_order_id]['completed'] = True
-                self.data[buy_order_id]['sell_order'] = None
-                self.write_data()
-                self.send_email('SELL-CORRUPTED',
-                    msg='WARNING: Corrupted sell order, mark as done: {}'.format(
-                        info['sell_order'])
-                )
-                time.sleep(1)
+            pause = self._skip_sell_order(buy_order_id, info)
+            if pause is not None:
+                if pause:
+                    yield ('sleep', pause)
                 continue
             order_get_fail = False
             try:
-                sell = self.exchange.get_order(info['sell_order']['id'])
-            except:
-                self.logit('WARNING: Failed to get order by id: {} TODO: FIXME'.format(info['sell_order']['id']))
+                if open_orders is not None and info['sell_order']['id'] in open_orders:
+                    # Still open, only orders that left the open set need their status
+                    sell = open_orders[info['sell_order']['id']]
+                else:
+                    sell = yield ('get_order', info['sell_order']['id'])
+            except Exception:
+                self.logit('WARNING: Failed to get order by id: {} TODO: FIXME'.format(
+                    info['sell_order']['id']))
                 order_get_fail = True
                 sell = None
-            if order_get_fail or (sell and 'message' in sell):
-                if sell and 'message' in sell:
-                    self.logit('WARNING: Failed to get sell order status (retrying later): {}'.format(
-                        sell['message']), custom_datetime=self._time2datetime())
-                else:
-                    self.logit('WARNING: Failed to get sell order status (retrying later): Unknown'.format(
-                        custom_datetime=self._time2datetime()))
-                if self.exchange.get_time() - info['time'] > 60 * 60 * 2:
-                    self.logit('WARNING: Failed to get order status:',
-                        custom_datetime=self._time2datetime())
-                    self.logit('WARNING: Writing as done/error since it has been > 2 hours.',
-                        custom_datetime=self._time2datetime())
-                    self.data[buy_order_id]['completed'] = True
-                    self.write_data()
-                continue
+            if self._sell_status(buy_order_id, info, sell, order_get_fail):
+                yield from self._run_stoploss(buy_order_id)
+
+    def _skip_sell_order(self, buy_order_id: str, info: dict) -> t.Optional[float]:
+        """Check that the sell order of a buy can be looked up
 
-            if sell and 'status' in sell and sell['status'] != 'open':
-                # calculate profit from buy to sell
-                # done, remove buy/sell
+        Returns:
+            float: None if the sell order should be checked, otherwise the seconds to pause
+                before the next order
+        """
+        if self.data[buy_order_id]['completed']:
+            return 0
+        if not info['sell_order']:
+            self.logit('WARNING: No sell_order for buy {}. This should not happen.'.format(
+                buy_order_id), custom_datetime=self._time2datetime())
+            if self.exchange.get_time() - info['time'] > 60 * 60 * 2:
+                self.logit('WARNING: Failed to get order status:',
+                    custom_datetime=self._time2datetime())
+                self.logit('WARNING: Writing as done/error since it has been > 2 hours.',
+                    custom_datetime=self._time2datetime())
                 self.data[buy_order_id]['completed'] = True
-                self.data[buy_order_id]['sell_order_completed'] = sell
-                if sell['status'] == 'done':
-                    try:
-                        first_time = self.data[buy_order_id]['first_status']['created_at']
-                    except:
-                        first_time = None
-                    sell_value = Decimal(sell['executed_value'])
-                    #sell_filled_size = Decimal(sell['filled_size'])
-                    #buy_filled_size = Decimal(info['last_status']['filled_size'])
-                    buy_value = Decimal(info['last_status']['executed_value'])
-                    buy_sell_diff = round(sell_value - buy_value, 2)
-                    if first_time:
-                        done_at = time.mktime(
-                            time.strptime(parse_datetime(first_time), '%Y-%m-%dT%H:%M:%S'))
-                    else:
-                        done_at = time.mktime(
-                            time.strptime(parse_datetime(sell['done_at']), '%Y-%m-%dT%H:%M:%S'))
-                    self.data[buy_order_id]['profit_usd'] = buy_sell_diff
-                    msg = 'SOLD: duration:{:.2f} bought:{} sold:{} profit:{}'.format(
-                        self.exchange.get_time() - done_at,
-                        round(buy_value, 2),
-                        round(sell_value, 2),
-                        buy_sell_diff
-                    )
-                    self.logit(msg, custom_datetime=self._time2datetime())
-                    self.send_email('SOLD', msg=msg)
-                else:
-                    self.logit('SOLD-WITH-OTHER-STATUS: {}'.format(sell['status']),
-                        custom_datetime=self._time2datetime())
                 self.write_data()
+            return 0
+        if 'message' in info['sell_order']:
+            self.logit(
+                'WARNING: Corrupted sell order, mark as done: {}'.format(info['sell_order']),
+                custom_datetime=self._time2datetime())
+            self.data[buy_order_id]['completed'] = True
+            self.data[buy_order_id]['sell_order'] = None
+            self.write_data()
+            self.send_email('SELL-CORRUPTED',
+                msg='WARNING: Corrupted sell order, mark as done: {}'.format(
+                    info['sell_order'])
+            )
+            return 1
+        return None
+
+    def _sell_status(self, buy_order_id: str, info: dict, sell: t.Optional[dict],
+                     order_get_fail: bool) -> bool:
+        """Track the status of a limit sell: record a fill, or check the stoploss
+
+        Returns:
+            bool: True if the stoploss must run
+        """
+        # pylint: disable=too-many-locals
+        # pylint: disable=bare-except
+        if order_get_fail or (sell and 'message' in sell):
+            if sell and 'message' in sell:
+                self.logit('WARNING: Failed to get sell order status (retrying later): {}'.format(
+                    sell['message']), custom_datetime=self._time2datetime())
             else:
-                # check for stoploss if enabled
-                if self.stoploss_enable and sell:
-                    created_at = time.mktime(
-                        time.strptime(parse_datetime(sell['created_at']), '%Y-%m-%dT%H:%M:%S'))
-                    duration = self.exchange.get_time() - created_at
-                    bought_price = round(
-                        Decimal(info['last_status']['executed_value']) /
-                        Decimal(info['last_status']['filled_size']),
-                        4
-                    )
-                    # This was backwards! oops:
-                    #percent_change = (bought_price-self.current_price) / bought_price
-                    percent_change = (self.current_price-bought_price) / bought_price
-                    stop_seconds = False
-                    stop_percent = False
-                    if duration >= self.stoploss_seconds:
-                        stop_seconds = True
-                    if percent_change <= self.stoploss_percent:
-                        stop_percent = True
-                    if (stop_seconds or stop_percent) and self.stoploss_strategy == 'report':
-                        self.logit('STOPLOSS: percent:{} duration:{}'.format(
-                            percent_change, duration), custom_datetime=self._time2datetime())
-
-                    if self.stoploss_strategy == 'both' and stop_percent and stop_seconds:
-                        self.logit('STOPLOSS: strategy:{} percent:{} duration:{}'.format(
-                            self.stoploss_strategy,
-                            percent_change, duration
-                        ), custom_datetime=self._time2datetime())
-                        self._run_stoploss(buy_order_id)
-                    elif self.stoploss_strategy == 'either' and (stop_percent or stop_seconds):
-                        self.logit('STOPLOSS: strategy:{} percent:{} duration:{}'.format(
-                            self.stoploss_strategy,
-                            percent_change, duration,
-                        ), custom_datetime=self._time2datetime())
-                        self._run_stoploss(buy_order_id)
+                self.logit('WARNING: Failed to get sell order status (retrying later): Unknown'.format(
+                    custom_datetime=self._time2datetime()))
+            if self.exchange.get_time() - info['time'] > 60 * 60 * 2:
+                self.logit('WARNING: Failed to get order status:',
+                    custom_datetime=self._time2datetime())
+                self.logit('WARNING: Writing as done/error since it has been > 2 hours.',
+                    custom_datetime=self._time2datetime())
+                self.data[buy_order_id]['completed'] = True
+                self.write_data()
+            return False
+
+        if sell and 'status' in sell and sell['status'] != 'open':
+            # calculate profit from buy to sell
+            # done, remove buy/sell
+            self.data[buy_order_id]['completed'] = True
+            self.data[buy_order_id]['sell_order_completed'] = sell
+            if sell['status'] == 'done':
+                try:
+                    first_time = self.data[buy_order_id]['first_status']['created_at']
+                except:
+                    first_time = None
+                sell_value = Decimal(sell['executed_value'])
+                #sell_filled_size = Decimal(sell['filled_size'])
+                #buy_filled_size = Decimal(info['last_status']['filled_size'])
+                buy_value = Decimal(info['last_status']['executed_value'])
+                buy_sell_diff = round(sell_value - buy_value, 2)
+                if first_time:
+                    done_at = time.mktime(
+                        time.strptime(parse_datetime(first_time), '%Y-%m-%dT%H:%M:%S'))
+                else:
+                    done_at = time.mktime(
+                        time.strptime(parse_datetime(sell['done_at']), '%Y-%m-%dT%H:%M:%S'))
+                self.data[buy_order_id]['profit_usd'] = buy_sell_diff
+                msg = 'SOLD: duration:{:.2f} bought:{} sold:{} profit:{}'.format(
+                    self.exchange.get_time() - done_at,
+                    round(buy_value, 2),
+                    round(sell_value, 2),
+                    buy_sell_diff
+                )
+                self.logit(msg, custom_datetime=self._time2datetime())
+                self.send_email('SOLD', msg=msg)
+            else:
+                self.logit('SOLD-WITH-OTHER-STATUS: {}'.format(sell['status']),
+                    custom_datetime=self._time2datetime())
+            self.write_data()
+        else:
+            # check for stoploss if enabled
+            if self.stoploss_enable and sell:
+                created_at = time.mktime(
+                    time.strptime(parse_datetime(sell['created_at']), '%Y-%m-%dT%H:%M:%S'))
+                duration = self.exchange.get_time() - created_at
+                bought_price = round(
+                    Decimal(info['last_status']['executed_value']) /
+                    Decimal(info['last_status']['filled_size']),
+                    4
+                )
+                # This was backwards! oops:
+                #percent_change = (bought_price-self.current_price) / bought_price
+                percent_change = (self.current_price-bought_price) / bought_price
+                stop_seconds = False
+                stop_percent = False
+                if duration >= self.stoploss_seconds:
+                    stop_seconds = True
+                if percent_change <= self.stoploss_percent:
+                    stop_percent = True
+                if (stop_seconds or stop_percent) and self.stoploss_strategy == 'report':
+                    self.logit('STOPLOSS: percent:{} duration:{}'.format(
+                        percent_change, duration), custom_datetime=self._time2datetime())
+
+                if self.stoploss_strategy == 'both' and stop_percent and stop_seconds:
+                    self.logit('STOPLOSS: strategy:{} percent:{} duration:{}'.format(
+                        self.stoploss_strategy,
+                        percent_change, duration
+                    ), custom_datetime=self._time2datetime())
+                    return True
+                elif self.stoploss_strategy == 'either' and (stop_percent or stop_seconds):
+                    self.logit('STOPLOSS: strategy:{} percent:{} duration:{}'.format(
+                        self.stoploss_strategy,
+                        percent_change, duration,
+                    ), custom_datetime=self._time2datetime())
+                    return True
+        return False
@@ -65,6 +65,23 @@ def configure(process_name, obj, do_print=False) -> None:
     for key, val in obj.config['trader'].items():
         setattr(obj, key, val)
 
+def getsetting(config: dict, section: str, key: str) -> t.Any:
+    """Read a single CONFIG_DEFAULTS setting from config, using its default cast and value.
+    Unlike getconf(), a missing section is not an error.
+
+    Args:
+        config (dict): A config dict (e.g. the global section)
+        section (str): The configuration section of config (e.g. 'general')
+        key (str): The section's key to get()
+
+    Returns:
+        any: The value of the configuration section->key
+    """
+    for item_key, cast, default in CONFIG_DEFAULTS[section]:
+        if item_key == key:
+            return getconf({section: config.get(section) or {}}, section, key, cast, default)
+    raise KeyError('Unknown setting: [{}][{}]'.format(section, key))
+
 def getconf(config, section: str, key: str, cast: t.Type, default: t.Any) -> t.Any:
     """Converts configuration values to Python types
 
@@ -0,0 +1,426 @@
+"""Vectorized backtest of the Simple trader
+
+Replays the Simple rules (buy barrier, sell target, max outstanding sells, max buys per hour and
+stoploss) over a whole candle series without running a trader tick per price point. Ticks where
+nothing can change are never visited: the next buy, sell fill or stoploss is found with array
+searches over the precomputed Backtest price path, and only the ticks that act are computed, with
+the same Decimal arithmetic as Simple and Backtest. One trader tick is one price path point, like
+running Simple against the Backtest exchange.
+
+compare_tick_path() runs both engines over the same ticks and reports where they diverge:
+
+    boticvec backtest.yaml --ticks 50000 --parity
+"""
+import os
+import sys
+import math
+import heapq
+import argparse
+import tempfile
+import contextlib
+import typing as t
+from copy import deepcopy
+from decimal import Decimal
+import numpy as np
+from .util import str2bool, getconf
+from .exchange.base import ProductInfo
+from .exchange.backtest import MAKER_FEE, TAKER_FEE, START_WALLET, PRODUCT_INFO_CONFIG
+from .exchange.candles import CandleStore, get_candle_store
+
+# Tick of an event that does not happen
+NEVER = sys.maxsize
+
+def _first(start: int, end: int, mask: t.Callable[[int, int], np.ndarray],
+           exact: t.Optional[t.Callable[[int], bool]] = None) -> int:
+    """First tick in [start, end) where mask(lo, hi) (a bool array over ticks lo..hi) is True and
+    exact(tick) agrees. Searches growing chunks, so nearby events are found without scanning the
+    rest of the series.
+
+    Returns:
+        int: The tick or NEVER
+    """
+    pos = start
+    size = 1024
+    while pos < end:
+        stop = min(end, pos + size)
+        for hit in np.flatnonzero(mask(pos, stop)):
+            if exact is None or exact(pos + int(hit)):
+                return pos + int(hit)
+        pos = stop
+        size = min(size * 4, 1 << 22)
+    return NEVER
+
+class SimpleVectorBacktest:
+    """Backtest the Simple trader config of one process
+
+    Args:
+        config (dict): Process config (see botic.botic.load_config), the trader section holds the
+            Simple settings
+        store (CandleStore): Candles to replay. Defaults to the backtest_candles setting.
+        ticks (int): Max number of trader ticks (price path points) to run. Default: all.
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, config: dict, store: t.Optional[CandleStore] = None,
+                 ticks: t.Optional[int] = None) -> None:
+        trader = config['trader']
+        self.max_outstanding_sells = int(trader['max_outstanding_sells'])
+        self.max_buys_per_hour = int(trader['max_buys_per_hour'])
+        self.sell_target = Decimal(trader['sell_target'])/100
+        self.buy_barrier = Decimal(trader['buy_barrier'])/100
+        self.buy_percent = Decimal(trader['buy_percent'])/100
+        self.buy_max = Decimal(trader['buy_max'])
+        self.buy_min = Decimal(trader['buy_min'])
+        self.stoploss_enable = str2bool(trader['stoploss_enable'])
+        self.stoploss_percent = Decimal(trader['stoploss_percent'])/100
+        self.stoploss_seconds = int(trader['stoploss_seconds'])
+        self.stoploss_strategy = str(trader['stoploss_strategy'])
+        if store is None:
+            store = get_candle_store(
+                getconf(config, 'exchange', 'backtest_candles', str, '') or None)
+        self.store = store
+        self.product_info = ProductInfo(PRODUCT_INFO_CONFIG)
+        self.usd_decimal_places = self.product_info.usd_decimal_places
+        self.size_decimal_places = self.product_info.size_decimal_places
+        self.maker_fee = MAKER_FEE
+        self.taker_fee = TAKER_FEE
+        self.fees = self.maker_fee + self.taker_fee
+        # The last path point ends the backtest before it is returned
+        self.ticks = max(0, len(store.path) - 1)
+        if ticks is not None:
+            self.ticks = min(self.ticks, ticks)
+        self.path = store.path
+        # Exchange time during tick i: the candle of the next path point (see Backtest.get_price)
+        self.tick_time = store.timestamp[store.path_candle[1:self.ticks + 1]].astype(np.float64)
+        self._scale = 10 ** store.decimals
+
+    def _target(self, price: Decimal) -> Decimal:
+        """Simple._get_current_price_target()"""
+        return round(price * (self.fees + self.sell_target) + price, self.usd_decimal_places)
+
+    def _adjusted(self, sell_price: Decimal) -> Decimal:
+        """Sell price lowered by the buy barrier, see Simple._check_if_can_buy()"""
+        return round(sell_price - ((self.buy_barrier + self.fees) * sell_price),
+                     self.usd_decimal_places)
+
+    def _first_buy_tick(self, start: int, end: int, min_adjusted: t.Optional[Decimal]) -> int:
+        """First tick in [start, end) where the buy barrier of every open sell allows a buy"""
+        if min_adjusted is None:
+            return start if start < end else NEVER
+        rate = float(1 + self.fees + self.sell_target)
+        limit = float(min_adjusted) * self._scale + 1
+        store = self.store
+        return _first(start, end,
+            lambda lo, hi: self.path[lo:hi] * rate < limit,
+            lambda tick: self._target(store.price(tick)) < min_adjusted)
+
+    def _buy(self, tick: int, wallet: Decimal) -> t.Optional[dict]:
+        """Simple._maybe_buy_sell() and Backtest.buy_market()/sell_limit() at tick. Returns None
+        when the exchange refuses the buy.
+        """
+        # pylint: disable=too-many-locals
+        price = self.store.price(tick)
+        buy_amount = round(self.buy_percent * wallet, self.usd_decimal_places)
+        buy_size = round(buy_amount / price, self.size_decimal_places)
+        if buy_size <= self.product_info.base_min_size:
+            buy_amount = self.buy_min
+        if buy_amount < Decimal(self.product_info.min_market_funds):
+            buy_amount = self.buy_min
+        if buy_amount < self.buy_min:
+            buy_amount = self.buy_min
+        elif buy_amount > self.buy_max:
+            buy_amount = self.buy_max
+        if buy_amount > wallet:
+            return None
+        funds = round(Decimal(buy_amount), self.usd_decimal_places)
+        fees = round(funds * self.taker_fee, 12)
+        executed_value = round(funds - fees, 12)
+        size = round(executed_value / price, 8)
+        sell_price = round(self._target(price), self.usd_decimal_places)
+        order = {
+            'buy_tick': tick,
+            'buy_time': float(self.tick_time[tick]),
+            'buy_price': price,
+            'funds': buy_amount,
+            'executed_value': executed_value,
+            'size': size,
+            'sell_price': sell_price,
+            'adjusted': self._adjusted(sell_price),
+            'exit': None,
+            'exit_tick': NEVER,
+            'end_tick': NEVER,
+            'sell_value': None,
+            'profit': None,
+        }
+        self._plan_exit(order)
+        return order
+
+    def _plan_exit(self, order: dict) -> None:
+        """Find the tick where the sell of order fills or is stopped out"""
+        start = order['buy_tick']
+        sell_cents = math.ceil(order['sell_price'].scaleb(self.store.decimals))
+        fill_tick = self.store.find_cross(start + 1, -1, sell_cents, end=self.ticks)
+        if fill_tick is None:
+            fill_tick = NEVER
+        stop_tick = NEVER
+        if self.stoploss_enable and self.stoploss_strategy in ('both', 'either'):
+            bought_price = round(order['executed_value'] / order['size'], 4)
+            stoploss_percent = self.stoploss_percent
+            store = self.store
+            limit = float(bought_price * (1 + stoploss_percent)) * self._scale * (1 + 1e-9) + 1
+            time_tick = int(np.searchsorted(
+                self.tick_time, self.tick_time[start] + self.stoploss_seconds, side='left'))
+            price_start = start if self.stoploss_strategy == 'either' else max(start, time_tick)
+            stop_tick = _first(price_start, min(fill_tick, self.ticks),
+                lambda lo, hi: self.path[lo:hi] <= limit,
+                lambda tick: (store.price(tick) - bought_price) / bought_price <=
+                stoploss_percent)
+            if self.stoploss_strategy == 'either' and time_tick < min(fill_tick, self.ticks):
+                stop_tick = min(stop_tick, max(start, time_tick))
+        if stop_tick != NEVER:
+            price = self.store.price(stop_tick)
+            usd_used = order['size'] * price
+            order.update({
+                'exit': 'stoploss', 'exit_tick': stop_tick, 'end_tick': stop_tick + 1,
+                'sell_value': usd_used - round(usd_used * self.taker_fee, 12),
+                # The market sell replaces the limit sell until the next tick completes it
+                'stop_adjusted': self._adjusted(price),
+            })
+        elif fill_tick != NEVER:
+            usd_used = order['size'] * order['sell_price']
+            order.update({
+                'exit': 'filled', 'exit_tick': fill_tick, 'end_tick': fill_tick,
+                'sell_value': usd_used - round(usd_used * self.maker_fee, 12),
+            })
+        if order['end_tick'] < self.ticks:
+            order['profit'] = round(order['sell_value'] - order['executed_value'], 2)
+
+    def run(self) -> dict:
+        """Run the backtest
+
+        Returns:
+            dict: Final wallet, coins and value, trade counts and the list of trades
+        """
+        # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+        wallet = START_WALLET
+        coins = Decimal('0.0')
+        orders = []
+        live = []
+        buy_times = []
+        # (tick, seq, usd, coins) applied before the buy decision of tick
+        credits = []
+        tick = 0
+        while tick < self.ticks:
+            while credits and credits[0][0] <= tick:
+                _, _, usd, size = heapq.heappop(credits)
+                wallet += usd
+                coins -= size
+            # Open sells at this tick and the next tick anything changes
+            change = self.ticks
+            open_sells = 0
+            min_adjusted = None
+            still_live = []
+            for order in live:
+                if order['end_tick'] < tick:
+                    continue
+                still_live.append(order)
+                open_sells += 1
+                adjusted = order['adjusted']
+                if order['exit'] == 'stoploss':
+                    if tick == order['end_tick']:
+                        adjusted = order['stop_adjusted']
+                    else:
+                        change = min(change, order['end_tick'])
+                change = min(change, order['end_tick'] + 1)
+                if order['exit'] == 'filled' and order['exit_tick'] > tick:
+                    change = min(change, order['exit_tick'])
+                if min_adjusted is None or adjusted < min_adjusted:
+                    min_adjusted = adjusted
+            live = still_live
+
+            if open_sells >= self.max_outstanding_sells or \
+                    wallet < Decimal(self.product_info.min_market_funds) or \
+                    wallet < self.buy_min:
+                tick = change
+                continue
+            start = tick
+            if len(buy_times) > self.max_buys_per_hour:
+                hour_free = buy_times[-(self.max_buys_per_hour + 1)] + 60 * 60
+                start = max(start, int(np.searchsorted(self.tick_time, hour_free, side='right')))
+            buy_tick = self._first_buy_tick(start, change, min_adjusted)
+            if buy_tick == NEVER:
+                tick = change
+                continue
+            order = self._buy(buy_tick, wallet)
+            tick = buy_tick + 1
+            if order is None:
+                continue
+            wallet -= order['funds']
+            coins += order['size']
+            orders.append(order)
+            live.append(order)
+            buy_times.append(order['buy_time'])
+            if order['exit'] == 'filled':
+                heapq.heappush(credits, (order['exit_tick'], len(orders),
+                                         order['sell_value'], order['size']))
+            elif order['exit'] == 'stoploss':
+                heapq.heappush(credits, (order['exit_tick'] + 1, len(orders),
+                                         order['sell_value'], order['size']))
+        for _, _, usd, size in credits:
+            wallet += usd
+            coins -= size
+
+        last_price = self.store.price(self.ticks - 1) if self.ticks else None
+        return {
+            'max_drawdown': self.max_drawdown(orders),
+            'ticks': self.ticks,
+            'start': float(self.tick_time[0]) if self.ticks else None,
+            'end': float(self.tick_time[-1]) if self.ticks else None,
+            'wallet': wallet,
+            'coins': coins,
+            'last_price': last_price,
+            'value': wallet + coins * last_price if self.ticks else wallet,
+            'buys': len(orders),
+            'filled': len([i for i in orders if i['exit'] == 'filled']),
+            'stoplosses': len([i for i in orders if i['exit'] == 'stoploss']),
+            'open': len([i for i in orders if i['exit'] is None]),
+            'profit': sum([i['profit'] for i in orders if i['profit'] is not None], Decimal(0)),
+            'trades': orders,
+        }
+
+    def equity(self, orders: t.List[dict]) -> np.ndarray:
+        """Wallet plus coins at the tick's price after every tick (float64)"""
+        usd = np.zeros(self.ticks + 1)
+        size = np.zeros(self.ticks + 1)
+        for order in orders:
+            usd[order['buy_tick']] -= float(order['funds'])
+            size[order['buy_tick']] += float(order['size'])
+            if order['exit'] is not None:
+                usd[order['exit_tick']] += float(order['sell_value'])
+                size[order['exit_tick']] -= float(order['size'])
+        usd = float(START_WALLET) + np.cumsum(usd[:self.ticks])
+        size = np.cumsum(size[:self.ticks])
+        return usd + size * self.path[:self.ticks] / self._scale
+
+    def max_drawdown(self, orders: t.List[dict]) -> float:
+        """Largest drop of the equity from its running peak, as a fraction of the peak"""
+        if not self.ticks:
+            return 0.0
+        equity = self.equity(orders)
+        peak = np.maximum.accumulate(equity)
+        return float(np.max((peak - equity) / peak))
+
+def run_tick_path(name: str, config: dict, ticks: t.Optional[int] = None) -> dict:
+    """Run the Simple trader of config against the Backtest exchange one tick at a time, in a
+    temporary data directory and with output suppressed.
+
+    Returns:
+        dict: Same summary as SimpleVectorBacktest.run(), trades are built from the trader data
+    """
+    # pylint: disable=import-outside-toplevel,protected-access
+    from .botic import BoticProcess
+    config = deepcopy(config)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config['general'] = dict(config.get('general') or {}, data_dir=tmpdir, log_dir=tmpdir,
+                                 log_disabled=True)
+        config['notify'] = {}
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            process = BoticProcess(name, config, do_print=False)
+            trader = process.trader
+            trader._init()
+            try:
+                count = 0
+                while ticks is None or count < ticks:
+                    trader.run_trading_algorithm()
+                    count += 1
+            except SystemExit:
+                pass
+            finally:
+                trader.lock.release()
+    exchange = trader.exchange
+    trades = []
+    for info in trader.data.values():
+        sell = info['sell_order'] or {}
+        if sell.get('type') == 'market':
+            exit_type = 'stoploss'
+        elif sell.get('status') == 'done':
+            exit_type = 'filled'
+        else:
+            exit_type = None
+        trades.append({
+            'buy_time': info['time'],
+            'executed_value': Decimal(info['last_status']['executed_value']),
+            'exit': exit_type,
+            'profit': info['profit_usd'],
+        })
+    return {
+        'ticks': count,
+        'wallet': exchange._wallet,
+        'coins': exchange._coins,
+        'last_price': exchange._last_price,
+        'value': exchange._wallet + exchange._coins * exchange._last_price,
+        'buys': len(trades),
+        'filled': len([i for i in trades if i['exit'] == 'filled']),
+        'stoplosses': len([i for i in trades if i['exit'] == 'stoploss']),
+        'open': len([i for i in trades if i['exit'] is None]),
+        'profit': sum([i['profit'] for i in trades if i['profit'] is not None], Decimal(0)),
+        'trades': trades,
+    }
+
+def compare_tick_path(name: str, config: dict, ticks: t.Optional[int] = None) -> t.List[str]:
+    """Run both engines over the same ticks
+
+    Returns:
+        list: Differences, empty when the results match
+    """
+    vector = SimpleVectorBacktest(config, ticks=ticks).run()
+    tick = run_tick_path(name, config, ticks=vector['ticks'])
+    diffs = []
+    for key in ('ticks', 'wallet', 'coins', 'buys', 'filled', 'stoplosses', 'open', 'profit'):
+        if vector[key] != tick[key]:
+            diffs.append('{}: vector:{} tick:{}'.format(key, vector[key], tick[key]))
+    for idx, (vec, tck) in enumerate(zip(vector['trades'], tick['trades'])):
+        for key in ('buy_time', 'executed_value', 'exit', 'profit'):
+            if vec[key] != tck[key]:
+                diffs.append('trade {} {}: vector:{} tick:{} (first divergence)'.format(
+                    idx, key, vec[key], tck[key]))
+                return diffs
+    return diffs
+
+def main() -> None:
+    """Run the vectorized backtest of every Simple section of a config"""
+    # pylint: disable=import-outside-toplevel
+    from .botic import load_config
+    parser = argparse.ArgumentParser(description='Vectorized backtest of the Simple trader')
+    parser.add_argument('config', help='botic yaml config')
+    parser.add_argument('--section', action='append', help='Only run these sections')
+    parser.add_argument('--ticks', type=int, help='Max number of ticks (price path points)')
+    parser.add_argument('--trades', action='store_true', help='Print every trade')
+    parser.add_argument('--parity', action='store_true',
+        help='Also run the tick-by-tick Backtest and report differences (slow)')
+    args = parser.parse_args()
+    _, sections = load_config(args.config, do_print=False)
+    failed = False
+    for name, config in sections.items():
+        if args.section and not name in args.section:
+            continue
+        if config['trader'].get('trader_module', 'Simple') != 'Simple':
+            continue
+        result = SimpleVectorBacktest(config, ticks=args.ticks).run()
+        print('{}: ticks:{} wallet:{:.2f} coins:{} value:{:.2f} profit:{} drawdown:{:.2%} buys:{} '
+              'filled:{} stoplosses:{} open:{}'.format(name, result['ticks'], result['wallet'],
+              result['coins'], result['value'], result['profit'], result['max_drawdown'],
+              result['buys'], result['filled'], result['stoplosses'], result['open']))
+        if args.trades:
+            for trade in result['trades']:
+                print('  buy tick:{buy_tick} price:{buy_price} funds:{funds} sell:{sell_price} '
+                      'exit:{exit} exit_tick:{exit_tick} profit:{profit}'.format(**trade))
+        if args.parity:
+            diffs = compare_tick_path(name, config, ticks=args.ticks)
+            for diff in diffs:
+                print('  DIFF {}'.format(diff))
+            print('  parity: {}'.format('FAILED' if diffs else 'OK'))
+            failed = failed or bool(diffs)
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
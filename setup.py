@@ -15,15 +15,28 @@ setup(
     install_requires=[
         'filelock>=3.0.12',
         'cbpro>=1.1.4',
+        'websocket-client',
+        'numpy',
         'pyyaml',
     ],
+    extras_require={
+        'async': ['aiohttp>=3.6'],
+    },
     entry_points={
         'console_scripts': [
             'botic=botic.cli:main',
             'boticp=botic.cli:main_persist',
+            'boticw=botic.cli:main_sharded',
             'boticperf=botic.cli:main_profile',
             'botictop=botic.top:main',
             'boticdump=botic.dumpdata:main',
+            'boticctl=botic.control:main',
+            'botica=botic.cli:main_async',
+            'boticfakeapi=botic.fakeapi:main',
+            'boticfakefeed=botic.fakefeed:main',
+            'boticcandles=botic.exchange.candles:main',
+            'boticvec=botic.vectorbacktest:main',
+            'boticsweep=botic.sweep:main',
         ],
     },
     package_data={'botic': ['data/historical-btc.csv.gz']},
@@ -0,0 +1,20 @@
+"""Shared fixtures"""
+import random
+import pytest
+
+@pytest.fixture
+def candles_csv(tmp_path):
+    """A small random walk of one minute candles, written as a candle CSV"""
+    rnd = random.Random(7)
+    price = 30000.0
+    lines = ['"timestamp","low","high","open","close","volume"']
+    for i in range(1500):
+        close = round(price * (1 + rnd.gauss(0, 0.002)), 2)
+        low = round(min(price, close) * (1 - abs(rnd.gauss(0, 0.001))), 2)
+        high = round(max(price, close) * (1 + abs(rnd.gauss(0, 0.001))), 2)
+        lines.append('"{}","{:.2f}","{:.2f}","{:.2f}","{:.2f}","1.0"'.format(
+            1600000000 + i * 60, low, high, price, close))
+        price = close
+    path = tmp_path / 'candles.csv'
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
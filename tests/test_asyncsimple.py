@@ -0,0 +1,107 @@
+"""AsyncSimple must trade exactly like Simple"""
+import asyncio
+import contextlib
+import io
+from decimal import Decimal
+import pytest
+from botic.botic import Botic
+from botic.asyncbotic import AsyncBotic
+from botic.fakeapi import FakeExchange, FakeApiServer, random_walk
+
+TRADER = '''
+---
+a:
+  trader:
+    pair: BTC-USD
+    trader_module: {trader}
+    buy_barrier: 0.1
+    buy_max: 500
+    buy_min: 60
+    buy_percent: 10
+    max_buys_per_hour: 3
+    max_outstanding_sells: 3
+    sell_target: 0.2
+    stoploss_enable: true
+    stoploss_percent: -0.5
+    stoploss_seconds: 1800
+    stoploss_strategy: either
+'''
+
+BACKTEST = '''global:
+  exchange:
+    exchange_module: {exchange}
+    backtest_candles: {candles}
+  general:
+    sleep_seconds: 60
+    log_disabled: true
+  notify: {{}}
+  debug: {{}}
+''' + TRADER
+
+FAKEAPI = '''global:
+  exchange:
+    exchange_module: AsyncCoinbasePro
+    key: asyncsimple
+    b64secret: c2VjcmV0
+    passphrase: p
+    api_url: {url}
+  general:
+    sleep_seconds: 0.1
+    log_disabled: true
+  notify: {{}}
+  debug: {{}}
+''' + TRADER
+
+def _backtest(runner, path) -> tuple:
+    botic = runner(str(path), do_print=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        with pytest.raises(SystemExit):
+            botic.run()
+    exchange = botic.processes['a'].trader.exchange
+    exchange = getattr(exchange, 'backtest', exchange)
+    orders = sorted((i['side'], i['type'], i['status'], i['filled_size'], i['executed_value'])
+                    for i in exchange._orders.values())
+    return exchange._wallet, exchange._coins, orders
+
+def test_backtest_matches_simple(tmp_path, monkeypatch, candles_csv):
+    # pylint: disable=protected-access
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'sync').mkdir()
+    (tmp_path / 'async').mkdir()
+    sync_path = tmp_path / 'sync' / 'c.yaml'
+    sync_path.write_text(BACKTEST.format(
+        exchange='Backtest', candles=candles_csv, trader='Simple'))
+    async_path = tmp_path / 'async' / 'c.yaml'
+    async_path.write_text(BACKTEST.format(
+        exchange='AsyncBacktest', candles=candles_csv, trader='AsyncSimple'))
+    monkeypatch.chdir(tmp_path / 'sync')
+    expected = _backtest(Botic, sync_path)
+    monkeypatch.chdir(tmp_path / 'async')
+    result = _backtest(AsyncBotic, async_path)
+    assert any(i[0] == 'sell' and i[2] == 'done' for i in expected[2])
+    assert result == expected
+
+def test_fakeapi(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    exchange = FakeExchange(random_walk(Decimal('30000'), 100000), step_seconds=0.01)
+    server = FakeApiServer(exchange, latency=0.001)
+    server.start()
+    try:
+        path = tmp_path / 'c.yaml'
+        path.write_text(FAKEAPI.format(url=server.url, trader='AsyncSimple'))
+        botic = AsyncBotic(str(path), do_print=False)
+
+        async def run():
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(botic.run_async(), 2)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(run())
+    finally:
+        server.close()
+    assert botic.executor is None
+    assert botic.ticks['a'] > 1
+    data = botic.processes['a'].trader.data
+    assert data
+    assert all(i['last_status']['settled'] for i in data.values())
+    assert any(i['sell_order'] for i in data.values())
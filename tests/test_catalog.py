@@ -0,0 +1,51 @@
+"""Process-wide product catalogs"""
+from decimal import Decimal
+import pytest
+from botic.exchange import catalog
+from botic.exchange.catalog import get_catalog
+from botic.exchange.coinbasepro import CoinbasePro
+from botic.fakeapi import FakeExchange, FakeApiServer, random_walk
+from botic.util import configure
+
+@pytest.fixture
+def catalogs(monkeypatch):
+    monkeypatch.setattr(catalog, '_CATALOGS', {})
+    return catalog._CATALOGS # pylint: disable=protected-access
+
+def test_get_catalog(catalogs):
+    fetch = lambda: []
+    first = get_catalog(('coinbasepro', 'https://a'), fetch, 0)
+    assert get_catalog(('coinbasepro', 'https://a'), fetch, 0) is first
+    assert get_catalog(('coinbasepro', 'https://b'), fetch, 0) is not first
+    assert len(catalogs) == 2
+
+def _exchange(url, pair) -> CoinbasePro:
+    config = {
+        'exchange': {
+            'exchange_module': 'CoinbasePro', 'key': 'catalog', 'b64secret': 'c2VjcmV0',
+            'passphrase': 'p', 'api_url': url, 'catalog_refresh_seconds': 0,
+        },
+        'trader': {'pair': pair},
+        'general': {'log_disabled': True},
+        'notify': {},
+        'debug': {},
+    }
+    exchange = CoinbasePro(config)
+    configure('test', exchange, do_print=False)
+    exchange.authenticate()
+    return exchange
+
+def test_catalog_per_api_url(catalogs):
+    # pylint: disable=unused-argument
+    servers = [FakeApiServer(FakeExchange(random_walk(Decimal('30000'), 100),
+                                          products=(product,)))
+               for product in ('BTC-USD', 'ETH-USD')]
+    for server in servers:
+        server.start()
+    try:
+        # Same exchange module, different product lists (e.g. sandbox and production)
+        assert _exchange(servers[0].url, 'BTC-USD').get_product_info().id == 'BTC-USD'
+        assert _exchange(servers[1].url, 'ETH-USD').get_product_info().id == 'ETH-USD'
+    finally:
+        for server in servers:
+            server.close()
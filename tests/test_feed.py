@@ -0,0 +1,121 @@
+"""User channel order-state cache"""
+import contextlib
+import io
+from decimal import Decimal
+import pytest
+from botic.botic import BoticProcess, load_config
+from botic.exchange import coinbasepro
+from botic.exchange.feed import UserFeed
+from botic.fakeapi import FakeExchange, FakeApiServer, random_walk
+
+CONFIG = '''global:
+  exchange:
+    exchange_module: CoinbasePro
+    key: feed
+    b64secret: c2VjcmV0
+    passphrase: p
+    api_url: {url}
+    ws_user_channel: true
+    ws_order_wait: 0
+  general:
+    log_disabled: true
+  notify: {{}}
+  debug: {{}}
+---
+a:
+  trader:
+    pair: BTC-USD
+    trader_module: Simple
+    buy_barrier: 0.1
+    buy_max: 500
+    buy_min: 60
+    buy_percent: 10
+    max_buys_per_hour: 3
+    max_outstanding_sells: 3
+    sell_target: 0.2
+    stoploss_enable: true
+    stoploss_percent: 100
+    stoploss_seconds: 0
+    stoploss_strategy: either
+'''
+
+def _feed() -> UserFeed:
+    feed = UserFeed('ws://127.0.0.1:1', 'feed', 'c2VjcmV0', 'p')
+    # Never connect: the test plays the messages
+    feed._running = True # pylint: disable=protected-access
+    feed.connected = True
+    feed._handle({'type': 'subscriptions', # pylint: disable=protected-access
+                  'channels': [{'name': 'user', 'product_ids': ['BTC-USD']}]})
+    return feed
+
+def _play(feed: UserFeed, order: dict) -> None:
+    # pylint: disable=protected-access
+    feed._handle({'type': 'received', 'order_id': order['id'], 'product_id': 'BTC-USD',
+                  'side': order['side'], 'price': order['price'], 'size': order['size'],
+                  'order_type': 'limit', 'time': order['created_at']})
+    feed._handle({'type': 'open', 'order_id': order['id'], 'product_id': 'BTC-USD',
+                  'side': order['side'], 'price': order['price'],
+                  'remaining_size': order['size'], 'time': order['created_at']})
+
+def test_created_at_from_received():
+    feed = _feed()
+    _play(feed, {'id': 'a', 'side': 'sell', 'price': '1', 'size': '1',
+                 'created_at': '2021-01-01T00:00:00.123Z'})
+    status = feed.get_order('a')
+    assert status['status'] == 'open'
+    assert status['created_at'] == '2021-01-01T00:00:00.123Z'
+
+def test_missing_created_at_falls_back_to_rest():
+    feed = _feed()
+    # The received message was missed
+    feed._handle({'type': 'open', 'order_id': 'a', # pylint: disable=protected-access
+                  'product_id': 'BTC-USD', 'side': 'sell'})
+    assert feed.get_order('a') is None
+    feed.track({'id': 'a', 'product_id': 'BTC-USD', 'side': 'sell', 'status': 'open',
+                'settled': False, 'created_at': '2021-01-01T00:00:00Z'})
+    assert feed.get_order('a')['created_at'] == '2021-01-01T00:00:00Z'
+    feed.track({'id': 'b', 'product_id': 'BTC-USD', 'side': 'sell', 'status': 'open',
+                'settled': False, 'created_at': '2021-01-01T00:00:01Z'})
+    assert feed.get_order('b')['created_at'] == '2021-01-01T00:00:01Z'
+
+@pytest.fixture
+def server():
+    api = FakeApiServer(FakeExchange(random_walk(Decimal('30000'), 100)))
+    api.start()
+    yield api
+    api.close()
+
+def test_stoploss_on_feed_status(tmp_path, monkeypatch, server):
+    # pylint: disable=protected-access
+    monkeypatch.chdir(tmp_path)
+    feed = _feed()
+    feed.connected = False
+    monkeypatch.setattr(coinbasepro, 'get_user_feed', lambda *args: feed)
+    path = tmp_path / 'c.yaml'
+    path.write_text(CONFIG.format(url=server.url))
+    _, sections = load_config(str(path), do_print=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        trader = BoticProcess('a', sections['a'], do_print=False).trader
+        trader._init()
+        exchange = trader.exchange
+        trader.current_price = exchange.get_price()
+        # Orders placed while the feed is down are not tracked, only the messages below are
+        buy = exchange.get_order(exchange.buy_market(Decimal('100'))['id'])
+        sell = exchange.sell_limit(trader.current_price * 2, Decimal(buy['filled_size']))
+        trader.data[buy['id']] = {
+            'first_status': buy, 'last_status': buy, 'time': exchange.get_time(),
+            'sell_order': sell, 'sell_order_completed': None, 'completed': False,
+            'profit_usd': None,
+        }
+        feed.connected = True
+        _play(feed, sell)
+        requests = server.requests
+        assert trader._sell_status(buy['id'], trader.data[buy['id']],
+            exchange.get_order(sell['id']), False)
+        # Answered from the feed
+        assert server.requests == requests
+        trader._run_steps(trader._check_sell_orders())
+        trader.lock.release()
+    info = trader.data[buy['id']]
+    assert info['sell_order']['type'] == 'market'
+    assert info['sell_order_completed']['settled']
@@ -0,0 +1,140 @@
+"""MarketDataHub caching and request coalescing"""
+import asyncio
+import threading
+import time
+import pytest
+from botic.exchange.hub import MarketDataHub, AsyncMarketDataHub
+
+class Stop(BaseException):
+    """Not an Exception, like KeyboardInterrupt"""
+
+def test_ttl_cache():
+    hub = MarketDataHub()
+    calls = []
+    fetch = lambda: calls.append(1) or len(calls)
+    assert hub.fetch('a', 60, fetch) == 1
+    assert hub.fetch('a', 60, fetch) == 1
+    assert hub.fetch('a', 0, fetch) == 2
+    hub.invalidate('a')
+    assert hub.fetch('a', 60, fetch) == 3
+    assert hub.fetch('b', 60, fetch) == 4
+    hub.invalidate()
+    assert hub.fetch('b', 60, fetch) == 5
+    assert hub.stats() == {'entries': 1, 'hits': 1, 'misses': 5, 'coalesced': 0}
+
+def test_coalesce_threads():
+    hub = MarketDataHub()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'value'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(hub.fetch('a', 0, fetch)))
+    leader.start()
+    started.wait(5)
+    waiters = [threading.Thread(target=lambda: results.append(hub.fetch('a', 0, fetch)))
+               for _ in range(4)]
+    for thread in waiters:
+        thread.start()
+    while hub.coalesced < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader] + waiters:
+        thread.join(5)
+    assert results == ['value'] * 5
+    assert len(calls) == 1
+
+@pytest.mark.parametrize('error', [ValueError('failed'), Stop()])
+def test_errors_are_shared_and_not_cached(error):
+    hub = MarketDataHub()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise error
+
+    raised = []
+
+    def leader():
+        try:
+            hub.fetch('a', 60, fail)
+        except BaseException as err: # pylint: disable=broad-except
+            raised.append(err)
+
+    def waiter():
+        try:
+            raised.append(hub.fetch('a', 60, lambda: 'unused'))
+        except BaseException as err: # pylint: disable=broad-except
+            raised.append(err)
+
+    threads = [threading.Thread(target=leader)]
+    threads[0].start()
+    started.wait(5)
+    threads.append(threading.Thread(target=waiter))
+    threads[1].start()
+    while hub.coalesced < 1:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert raised == [error, error]
+    assert hub.fetch('a', 60, lambda: 'ok') == 'ok'
+
+def test_async_coalesce():
+    hub = AsyncMarketDataHub()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def run():
+        results = await asyncio.gather(*[hub.fetch('a', 60, fetch) for _ in range(5)])
+        return results + [await hub.fetch('a', 60, fetch)]
+
+    assert asyncio.run(run()) == [1] * 6
+    assert hub.stats() == {'entries': 1, 'hits': 1, 'misses': 1, 'coalesced': 4}
+
+def test_async_errors_are_not_cached():
+    hub = AsyncMarketDataHub()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError('failed')
+
+    async def run():
+        results = await asyncio.gather(hub.fetch('a', 60, fail), hub.fetch('a', 60, fail),
+            return_exceptions=True)
+        assert [type(i) for i in results] == [ValueError, ValueError]
+
+        async def value():
+            return 'ok'
+        return await hub.fetch('a', 60, value)
+
+    assert asyncio.run(run()) == 'ok'
+
+def test_async_cancelled_waiter_keeps_request():
+    hub = AsyncMarketDataHub()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return 'value'
+
+    async def run():
+        leader = asyncio.ensure_future(hub.fetch('a', 60, fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(hub.fetch('a', 60, fetch))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        return await leader
+
+    assert asyncio.run(run()) == 'value'
@@ -0,0 +1,62 @@
+"""Host-wide token bucket"""
+import asyncio
+import time
+import pytest
+from botic.exchange.ratelimit import TokenBucket, get_bucket, key_bucket_name
+
+def test_burst_then_rate(tmp_path):
+    bucket = TokenBucket(str(tmp_path / 'a.bucket'), rate=20, burst=5)
+    start = time.time()
+    for _ in range(5):
+        assert bucket.acquire() == 0
+    assert time.time() - start < 0.2
+    waited = bucket.acquire()
+    assert waited == pytest.approx(0.05, abs=0.04)
+    start = time.time()
+    for _ in range(4):
+        bucket.acquire()
+    # Refilled at 20 tokens/second
+    assert time.time() - start == pytest.approx(0.2, abs=0.1)
+
+def test_state_is_shared_through_the_file(tmp_path):
+    # Two instances on one path stand in for two processes
+    first = TokenBucket(str(tmp_path / 'a.bucket'), rate=1, burst=2)
+    second = TokenBucket(str(tmp_path / 'a.bucket'), rate=1, burst=2)
+    assert first._take(1) == 0 # pylint: disable=protected-access
+    assert second._take(1) == 0 # pylint: disable=protected-access
+    assert first._take(1) > 0.9 # pylint: disable=protected-access
+
+def test_acquire_async(tmp_path):
+    bucket = TokenBucket(str(tmp_path / 'a.bucket'), rate=20, burst=1)
+
+    async def run():
+        ticks = []
+
+        async def tick():
+            while 1:
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.ensure_future(tick())
+        waited = [await bucket.acquire_async() for _ in range(3)]
+        ticker.cancel()
+        return waited, len(ticks)
+
+    waited, ticks = asyncio.run(run())
+    assert waited[0] == 0
+    assert sum(waited) == pytest.approx(0.1, abs=0.06)
+    # The event loop kept running while waiting
+    assert ticks > 3
+
+def test_get_bucket(tmp_path):
+    bucket = get_bucket('test', 5, 10, str(tmp_path))
+    assert get_bucket('test', 5, 10, str(tmp_path)) is bucket
+    assert bucket.path == str(tmp_path / 'botic-test.bucket')
+    assert get_bucket('other', 5, 10, str(tmp_path)) is not bucket
+
+def test_key_bucket_name():
+    name = key_bucket_name('secret-api-key', 'private')
+    assert name.startswith('private-')
+    assert not 'secret' in name
+    assert name == key_bucket_name('secret-api-key', 'private')
+    assert name != key_bucket_name('other-api-key', 'private')
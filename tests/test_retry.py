@@ -0,0 +1,162 @@
+"""Retries of transient API errors and circuit breakers"""
+import random
+from decimal import Decimal
+import pytest
+import requests
+from botic.exchange import retry
+from botic.exchange.retry import (CircuitBreaker, RetryPolicy, get_breaker, is_transient_error,
+    is_transient_response)
+from botic.exchange.coinbasepro import CoinbasePro
+from botic.exchange.exceptions import ExchangeCircuitOpenError
+from botic.fakeapi import FakeExchange, FakeApiServer, random_walk
+from botic.util import configure
+
+class Clock:
+    """Stands in for the time module in the retry module"""
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(retry, 'time', fake)
+    return fake
+
+@pytest.fixture
+def breakers(monkeypatch):
+    monkeypatch.setattr(retry, '_BREAKERS', {})
+    return retry._BREAKERS # pylint: disable=protected-access
+
+def test_transient_errors():
+    assert is_transient_error(requests.exceptions.ConnectTimeout())
+    assert is_transient_error(requests.exceptions.ConnectTimeout(), idempotent=False)
+    assert is_transient_error(requests.exceptions.ReadTimeout())
+    assert not is_transient_error(requests.exceptions.ReadTimeout(), idempotent=False)
+    assert is_transient_error(requests.exceptions.ConnectionError())
+    assert not is_transient_error(ValueError('bad value'))
+    assert not is_transient_error(KeyError('id'))
+
+def test_transient_responses():
+    assert is_transient_response({'message': 'Internal server error'})
+    assert is_transient_response({'message': 'Rate limit exceeded'}, idempotent=False)
+    assert not is_transient_response({'message': 'Internal server error'}, idempotent=False)
+    assert not is_transient_response({'message': 'Insufficient funds'})
+    assert not is_transient_response({'id': 'abc'})
+    assert not is_transient_response([{'message': 'Internal server error'}])
+
+def test_retry_policy_delay():
+    policy = RetryPolicy(attempts=0, backoff=0.5, backoff_max=3)
+    assert policy.attempts == 1
+    random.seed(0)
+    for attempt, limit in enumerate((0.5, 1, 2, 3, 3)):
+        delays = [policy.delay(attempt) for _ in range(200)]
+        assert 0 <= min(delays)
+        assert max(delays) <= limit
+        assert max(delays) > limit / 2
+
+def test_breaker_opens_and_resets(clock):
+    breaker = CircuitBreaker('get_order', threshold=3, reset_seconds=30)
+    for _ in range(2):
+        breaker.allow()
+        breaker.failure()
+    assert breaker.state == 'closed'
+    breaker.failure()
+    assert breaker.state == 'open'
+    with pytest.raises(ExchangeCircuitOpenError):
+        breaker.allow()
+    clock.now += 30
+    assert breaker.state == 'half-open'
+    # A single trial call
+    breaker.allow()
+    with pytest.raises(ExchangeCircuitOpenError):
+        breaker.allow()
+    breaker.failure()
+    assert breaker.state == 'open'
+    assert breaker.trips == 2
+    clock.now += 30
+    breaker.allow()
+    breaker.success()
+    assert breaker.stats() == {'state': 'closed', 'failures': 0, 'trips': 2}
+    breaker.allow()
+
+def test_breaker_success_resets_failures():
+    breaker = CircuitBreaker('get_order', threshold=2, reset_seconds=30)
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    assert breaker.state == 'closed'
+
+def test_breaker_disabled():
+    breaker = CircuitBreaker('get_order', threshold=0, reset_seconds=30)
+    for _ in range(100):
+        breaker.failure()
+    breaker.allow()
+    assert breaker.state == 'closed'
+
+def test_get_breaker(breakers):
+    breaker = get_breaker('get_order', 3, 30)
+    assert get_breaker('get_order', 3, 30) is breaker
+    assert get_breaker('get_fills', 3, 30) is not breaker
+    assert set(breakers) == {'get_order', 'get_fills'}
+
+def _exchange(server, key, **exchange_config) -> CoinbasePro:
+    config = {
+        'exchange': dict({
+            'exchange_module': 'CoinbasePro', 'key': key, 'b64secret': 'c2VjcmV0',
+            'passphrase': 'p', 'api_url': server.url, 'retry_backoff': 0.001,
+            'retry_backoff_max': 0.001, 'rate_limit_private': 1000,
+            'rate_limit_private_burst': 1000,
+        }, **exchange_config),
+        'trader': {'pair': 'BTC-USD'},
+        'general': {'log_disabled': True},
+        'notify': {},
+        'debug': {},
+    }
+    exchange = CoinbasePro(config)
+    configure('test', exchange, do_print=False)
+    exchange.authenticate()
+    return exchange
+
+@pytest.fixture
+def server():
+    api = FakeApiServer(FakeExchange(random_walk(Decimal('30000'), 100)))
+    api.start()
+    yield api
+    api.close()
+
+def test_retries_against_fakeapi(server, breakers, capsys):
+    # pylint: disable=protected-access,unused-argument
+    exchange = _exchange(server, 'retry', retry_attempts=30, circuit_threshold=0)
+    server.error_rate = 0.5
+    random.seed(1)
+    for _ in range(10):
+        accounts = exchange._wrap_client('get_accounts')
+        assert [i['currency'] for i in accounts] == ['USD', 'BTC']
+    assert server.errors > 0
+    assert capsys.readouterr().out.count('WARNING: exchange client get_accounts error') == \
+        server.errors
+
+def test_orders_are_not_retried(server, breakers):
+    # pylint: disable=protected-access,unused-argument
+    exchange = _exchange(server, 'orders', retry_attempts=5, circuit_threshold=0)
+    server.error_rate = 1.0
+    response = exchange._wrap_client('place_market_order', product_id='BTC-USD', side='buy',
+        funds='100')
+    assert response == {'message': 'Internal server error'}
+    assert server.errors == 1
+
+def test_breaker_against_fakeapi(server, breakers):
+    # pylint: disable=protected-access,unused-argument
+    exchange = _exchange(server, 'breaker', retry_attempts=1, circuit_threshold=3,
+        circuit_reset_seconds=0.2)
+    server.error_rate = 1.0
+    for _ in range(3):
+        assert 'message' in exchange._wrap_client('get_accounts')
+    requests_made = server.requests
+    with pytest.raises(ExchangeCircuitOpenError):
+        exchange._wrap_client('get_accounts')
+    assert server.requests == requests_made
+    assert get_breaker('get_accounts', 3, 0.2).state == 'open'
@@ -0,0 +1,109 @@
+"""Scheduler deadlines, skipped slots and in-progress runs"""
+import threading
+import time
+from concurrent.futures import Future
+from botic.clock import VirtualClock
+from botic.scheduler import Scheduler
+
+def _recorder(clock, runs):
+    def run(job):
+        runs.append((job.name, clock.time()))
+    return run
+
+def test_runs_in_deadline_order():
+    clock = VirtualClock()
+    scheduler = Scheduler(clock)
+    runs = []
+    scheduler.add('slow', 30, _recorder(clock, runs))
+    scheduler.add('fast', 10, _recorder(clock, runs))
+    while clock.time() < 60:
+        scheduler.run_pending()
+        scheduler.sleep()
+    assert [i for i in runs if i[0] == 'fast'] == [('fast', i * 10.0) for i in range(6)]
+    assert [i for i in runs if i[0] == 'slow'] == [('slow', 0.0), ('slow', 30.0)]
+    assert [i[1] for i in runs] == sorted(i[1] for i in runs)
+
+def test_first_due():
+    clock = VirtualClock()
+    scheduler = Scheduler(clock)
+    runs = []
+    scheduler.add('a', 10, _recorder(clock, runs), first_due=25)
+    assert scheduler.time_until_due() == 25
+    assert scheduler.run_pending() == 0
+    scheduler.sleep()
+    assert scheduler.run_pending() == 1
+    assert runs == [('a', 25.0)]
+
+def test_missed_slots_are_skipped_keeping_the_phase():
+    clock = VirtualClock()
+    scheduler = Scheduler(clock)
+    runs = []
+    job = scheduler.add('a', 10, _recorder(clock, runs))
+    scheduler.run_pending()
+    clock.sleep(35)
+    assert scheduler.run_pending() == 1
+    assert job.lag == 25
+    assert job.due == 40
+    assert scheduler.stats()['a']['lag_max'] == 25
+
+def test_remove_and_replace():
+    clock = VirtualClock()
+    scheduler = Scheduler(clock)
+    runs = []
+    scheduler.add('a', 10, _recorder(clock, runs))
+    scheduler.remove('a')
+    assert scheduler.time_until_due() is None
+    assert scheduler.run_pending() == 0
+    scheduler.add('b', 10, _recorder(clock, runs))
+    # Replacing a job drops the heap entry of the old one
+    scheduler.add('b', 10, _recorder(clock, runs), first_due=5)
+    assert scheduler.run_pending() == 0
+    clock.sleep(5)
+    assert scheduler.run_pending() == 1
+    assert runs == [('b', 5.0)]
+
+def test_wake():
+    clock = VirtualClock()
+    scheduler = Scheduler(clock)
+    runs = []
+    scheduler.add('a', 60, _recorder(clock, runs))
+    scheduler.run_pending()
+    clock.sleep(5)
+    scheduler.wake('a')
+    assert scheduler.run_pending() == 1
+    # The schedule continues from the early run
+    assert scheduler.jobs['a'].due == 65
+    assert runs == [('a', 0.0), ('a', 5.0)]
+
+def test_pending_future_skips_deadline():
+    clock = VirtualClock()
+    scheduler = Scheduler(clock)
+    futures = []
+
+    def run(_):
+        future = Future()
+        futures.append(future)
+        return future
+
+    job = scheduler.add('a', 10, run)
+    scheduler.run_pending()
+    clock.sleep(10)
+    assert scheduler.run_pending() == 0
+    assert job.skipped == 1
+    futures[0].set_result(None)
+    clock.sleep(10)
+    assert scheduler.run_pending() == 1
+    assert job.ticks == 2
+    assert len(futures) == 2
+
+def test_sleep_wakes_up_for_earlier_job():
+    scheduler = Scheduler()
+    scheduler.add('a', 60, lambda job: None)
+    scheduler.run_pending()
+    timer = threading.Timer(0.1, scheduler.add, ('b', 60, lambda job: None))
+    timer.start()
+    start = time.time()
+    scheduler.sleep()
+    timer.join()
+    assert time.time() - start < 5
+    assert scheduler.run_pending() == 1
@@ -0,0 +1,45 @@
+"""The vectorized backtest must match the tick-by-tick Backtest"""
+import pytest
+from botic.botic import load_config
+from botic.vectorbacktest import SimpleVectorBacktest, compare_tick_path
+
+CONFIG = '''global:
+  exchange:
+    exchange_module: Backtest
+    backtest_candles: {candles}
+  general:
+    sleep_seconds: 60
+    log_disabled: true
+  notify: {{}}
+  debug: {{}}
+---
+a:
+  trader:
+    pair: BTC-USD
+    trader_module: Simple
+    buy_barrier: 0.1
+    buy_max: 500
+    buy_min: 60
+    buy_percent: 10
+    max_buys_per_hour: 3
+    max_outstanding_sells: 3
+    sell_target: 0.2
+    stoploss_enable: {stoploss}
+    stoploss_percent: -0.5
+    stoploss_seconds: 1800
+    stoploss_strategy: {strategy}
+'''
+
+@pytest.mark.parametrize('stoploss,strategy', [
+    ('false', 'report'),
+    ('true', 'either'),
+    ('true', 'both'),
+])
+def test_parity(tmp_path, candles_csv, stoploss, strategy):
+    path = tmp_path / 'c.yaml'
+    path.write_text(CONFIG.format(candles=candles_csv, stoploss=stoploss, strategy=strategy))
+    _, sections = load_config(str(path), do_print=False)
+    result = SimpleVectorBacktest(sections['a']).run()
+    assert result['filled'] > 0
+    assert (result['stoplosses'] > 0) == (stoploss == 'true')
+    assert compare_tick_path('a', sections['a']) == []